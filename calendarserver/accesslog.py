@@ -48,7 +48,11 @@ from txweb2.log import LogWrapperResource
 from twisted.internet import protocol, task
 from twisted.protocols import amp
 
+from twistedcaldav import memcachepool
 from twistedcaldav.config import config
+from twistedcaldav.memcacher import Memcacher
+
+from txdav.caldav.datastore.util import componentCache
 
 log = Logger()
 
@@ -180,6 +184,23 @@ class CommonAccessLoggingObserverExtensions(BaseCommonAccessLoggingObserver):
                     format += " fwd=%(fwd)s"
                     formatArgs["fwd"] = forwardedFor
 
+            # Parsed component cache activity in this process since the last
+            # request - only used for stats, not written to the log
+            cache = componentCache()
+            if cache is not None:
+                formatArgs["cc-hits"], formatArgs["cc-misses"], formatArgs["cc-bytes"] = cache.statsSinceLast()
+
+            # In-process memcache (Memcacher local cache) activity in this process
+            # since the last request - only used for stats, not written to the log
+            if config.Memcached.LocalCache.Enabled:
+                formatArgs["lc-hits"], formatArgs["lc-misses"], formatArgs["lc-size"] = Memcacher.localCacheStatsSinceLast()
+
+            # Per-node activity of sharded memcache pools in this process since
+            # the last request - only used for stats, not written to the log
+            nodeStats = memcachepool.nodeStatsSinceLast()
+            if nodeStats:
+                formatArgs["mc-nodes"] = nodeStats
+
             if formatArgs["host"] == "0.0.0.0":
                 fwdHeaders = request.headers.getRawHeaders("x-forwarded-for", "")
                 if fwdHeaders:
@@ -496,6 +517,13 @@ class RotatingFileAccessLoggingObserver(CommonAccessLoggingObserverExtensions):
             "T-RESP-WR": initTimeHistogram(),
             "T-MAX": 0.0,
             "cpu": self.systemStats.items["cpu use"],
+            "cc-hits": 0,
+            "cc-misses": 0,
+            "cc-bytes": 0,
+            "lc-hits": 0,
+            "lc-misses": 0,
+            "lc-size": 0,
+            "mc-nodes": {},
         }
 
     def updateStats(self, current, stats):
@@ -516,6 +544,15 @@ class RotatingFileAccessLoggingObserver(CommonAccessLoggingObserverExtensions):
         current["slots"] += stats.get("outstandingRequests", 0)
         current["max-slots"] = max(current["max-slots"], self.limiter.maxOutstandingRequests if hasattr(self, "limiter") else 0)
         current["cpu"] += self.systemStats.items["cpu use"]
+        current["cc-hits"] += stats.get("cc-hits", 0)
+        current["cc-misses"] += stats.get("cc-misses", 0)
+        # Largest per-process component cache size seen
+        current["cc-bytes"] = max(current["cc-bytes"], stats.get("cc-bytes", 0))
+        current["lc-hits"] += stats.get("lc-hits", 0)
+        current["lc-misses"] += stats.get("lc-misses", 0)
+        # Largest per-process local memcache size seen
+        current["lc-size"] = max(current["lc-size"], stats.get("lc-size", 0))
+        self.updateNodeStats(current, stats.get("mc-nodes", {}))
 
         def histogramUpdate(t, key):
             if t >= 60000.0:
@@ -545,6 +582,15 @@ class RotatingFileAccessLoggingObserver(CommonAccessLoggingObserverExtensions):
         if t is not None:
             histogramUpdate(t, "T-RESP-WR")
 
+    def updateNodeStats(self, current, nodeStats):
+        # Aggregate the per-node memcache statistics
+        for name, stats in nodeStats.items():
+            node = current["mc-nodes"].setdefault(name, {"requests": 0, "errors": 0, "t": 0.0, "dead": False})
+            node["requests"] += stats["requests"]
+            node["errors"] += stats["errors"]
+            node["t"] += stats["t"]
+            node["dead"] = stats["dead"]
+
     def mergeStats(self, current, stats):
         # Gather specific information and aggregate into our persistent stats
         if current["requests"] == 0:
@@ -561,6 +607,13 @@ class RotatingFileAccessLoggingObserver(CommonAccessLoggingObserverExtensions):
         current["slots"] += stats["slots"]
         current["max-slots"] = max(current["max-slots"], stats["max-slots"])
         current["cpu"] += stats["cpu"]
+        current["cc-hits"] += stats["cc-hits"]
+        current["cc-misses"] += stats["cc-misses"]
+        current["cc-bytes"] = max(current["cc-bytes"], stats["cc-bytes"])
+        current["lc-hits"] += stats["lc-hits"]
+        current["lc-misses"] += stats["lc-misses"]
+        current["lc-size"] = max(current["lc-size"], stats["lc-size"])
+        self.updateNodeStats(current, stats["mc-nodes"])
 
         def histogramUpdate(t, key):
             if t >= 60000.0:
@@ -38,6 +38,7 @@ from twistedcaldav.directory.principal import DirectoryPrincipalResource
 from twistedcaldav.extensions import DAVFile, CachingPropertyStore
 from twistedcaldav.extensions import DirectoryPrincipalPropertySearchMixIn
 from twistedcaldav.extensions import ReadOnlyResourceMixIn
+from twistedcaldav.memcacher import Memcacher
 from twistedcaldav.resource import CalDAVComplianceMixIn
 from txdav.who.delegates import CachingDelegates
 from txdav.who.wiki import DirectoryService as WikiDirectoryService
@@ -193,6 +194,12 @@ class RootResource(
         for filter in self.contentFilters:
             request.addResponseFilter(filter[0], atEnd=filter[1])
 
+        if not hasattr(request, "checkedLocalCaches"):
+            # Values cached in-process in front of memcached are checked against
+            # changes made by other processes once per request
+            request.checkedLocalCaches = True
+            Memcacher.revalidateLocalCaches()
+
         # Examine cookies for wiki auth token; if there, ask the paired wiki
         # server for the corresponding record name.  If that maps to a
         # principal, assign that to authnuser.
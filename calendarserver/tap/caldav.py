@@ -93,6 +93,7 @@ from txdav.common.datastore.upgrade.sql.upgrade import (
     UpgradeDatabaseNotificationDataStep
 )
 from txdav.common.datastore.work.inbox_cleanup import InboxCleanupWork
+from txdav.common.datastore.work.index_expansion import IndexExpansionWork
 from txdav.common.datastore.work.revision_cleanup import FindMinValidRevisionWork
 from txdav.who.groups import GroupCacher
 
@@ -632,6 +633,10 @@ class WorkSchedulingService(Service):
             self.store,
             int(config.LogID) if config.LogID else 5
         )
+        yield IndexExpansionWork.initialSchedule(
+            self.store,
+            int(config.LogID) if config.LogID else 5
+        )
         yield APNPurgingWork.initialSchedule(
             self.store,
             int(config.LogID) if config.LogID else 5
@@ -817,6 +822,8 @@ class CalDAVServiceMaker (object):
             memcachepool.installPools(
                 config.Memcached.Pools,
                 config.Memcached.MaxClients,
+                pipelineDepth=config.Memcached.PipelineDepth,
+                sharding=config.Memcached.Sharding,
             )
 
             if config.ProcessType in ("Combined", "Single"):
@@ -174,3 +174,28 @@ class AccessLog(TestCase):
         observer.stop()
         self.assertTrue("uid" not in stats)
         self.assertTrue("user-agent" not in stats)
+
+    def test_memcacheNodeStats(self):
+        """
+        Make sure per-node memcache statistics from each request are
+        aggregated in the L{RotatingFileAccessLoggingObserver} stats data.
+        """
+
+        logpath = self.mktemp()
+        observer = RotatingFileAccessLoggingObserver(logpath)
+        observer.systemStats = SystemMonitor()
+        observer.start()
+        stats = observer.initStats()
+        observer.stop()
+
+        for dead in (False, True,):
+            observer.updateStats(stats, {
+                "method": "GET",
+                "uri": "/calendars/users/user01/calendar/1.ics",
+                "statusCode": 200,
+                "mc-nodes": {"Default/host1:11211": {"requests": 2, "errors": 1, "t": 1.5, "dead": dead}},
+            })
+        self.assertEqual(
+            stats["mc-nodes"],
+            {"Default/host1:11211": {"requests": 4, "errors": 2, "t": 3.0, "dead": True}},
+        )
@@ -114,7 +114,9 @@ def setupMemcached(config):
     #
     memcachepool.installPools(
         config.Memcached.Pools,
-        config.Memcached.MaxClients
+        config.Memcached.MaxClients,
+        pipelineDepth=config.Memcached.PipelineDepth,
+        sharding=config.Memcached.Sharding,
     )
     autoDisableMemcached(config)
 
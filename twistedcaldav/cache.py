@@ -20,17 +20,22 @@ from txweb2.http import Response
 from txweb2.iweb import IResource
 from txweb2.stream import MemoryStream
 
-from twisted.internet.defer import succeed, inlineCallbacks, returnValue
+from twisted.internet.defer import succeed, inlineCallbacks, returnValue, \
+    gatherResults
 
 from twistedcaldav.config import config
 from twistedcaldav.memcachepool import CachePoolUserMixIn, defaultCachePool
 
 from txdav.idav import IStoreNotifierFactory, IStoreNotifier
+from txdav.xml import element
 
 from zope.interface import implements
 
+from collections import OrderedDict
+
 import cPickle
 import hashlib
+import time
 import urllib
 import uuid
 
@@ -275,21 +280,6 @@ class MemcacheResponseCache(BaseResponseCache, CachePoolUserMixIn):
         self._docroot = docroot
         self._cachePool = cachePool
 
-    @inlineCallbacks
-    def _tokenForURI(self, uri, cachePoolHandle=None):
-        """
-        Get the current token for a particular URI.
-        """
-        if isinstance(uri, unicode):
-            uri = uri.encode("utf-8")
-        if cachePoolHandle:
-            result = (yield defaultCachePool(cachePoolHandle).get('cacheToken:%s' % (uri,)))
-        else:
-            result = (yield self.getCachePool().get('cacheToken:%s' % (uri,)))
-        if result is not None:
-            _ignore_flags, result = result
-        returnValue(result)
-
     @inlineCallbacks
     def _tokenForRecord(self, uri, request):
         """
@@ -300,29 +290,74 @@ class MemcacheResponseCache(BaseResponseCache, CachePoolUserMixIn):
         returnValue(record.cacheToken())
 
     @inlineCallbacks
-    def _tokensForChildren(self, rURI, request):
+    def _tokensForURIs(self, uris, cachePoolHandle=None):
         """
-        Create a dict of child resource tokens for any "recorded" during this request in the childCacheURIs attribute.
+        Get the current tokens for a set of URIs using a single multi-get on the cache pool.
+
+        @param uris: the URIs to get tokens for
+        @type uris: L{list} of L{str}
+        @param cachePoolHandle: name of the cache pool to use, or C{None} for the default
+        @type cachePoolHandle: L{str}
+
+        @return: a L{dict} mapping each URI to its token, or C{None} when there is no token
+        @rtype: L{dict}
         """
+        keys = {}
+        for uri in uris:
+            key = uri.encode("utf-8") if isinstance(uri, unicode) else uri
+            keys['cacheToken:%s' % (key,)] = uri
+        if not keys:
+            returnValue({})
 
-        if hasattr(request, "childCacheURIs"):
-            tokens = dict([(uri, (yield self._tokenForURI(uri)),) for uri in request.childCacheURIs])
-            returnValue(tokens)
+        if cachePoolHandle:
+            results = (yield defaultCachePool(cachePoolHandle).getMultiple(keys.keys()))
         else:
-            returnValue({})
+            results = (yield self.getCachePool().getMultiple(keys.keys()))
+
+        tokens = {}
+        for key, uri in keys.items():
+            result = results.get(key)
+            tokens[uri] = result[1] if result is not None else None
+        returnValue(tokens)
 
     @inlineCallbacks
-    def _getTokens(self, request):
+    def _getTokens(self, request, childURIs=None):
         """
-        Tokens are a principal token, directory record token, resource token and list
+        Tokens are a principal token, directory record token, resource token and dict
         of child resource tokens. A change to any one of those will cause cache invalidation.
+
+        The principal, resource and child tokens are fetched with one multi-get per cache
+        pool (issued in parallel) and remembered on the request in the cacheTokens attribute,
+        so any token is only fetched once per request.
+
+        @param childURIs: the child URIs to get tokens for, or C{None} to use any "recorded"
+            during this request in the childCacheURIs attribute
+        @type childURIs: L{list} of L{str}
         """
-        tokens = []
         pURI, rURI = (yield self._getURIs(request))
-        tokens.append((yield self._tokenForURI(pURI, "PrincipalToken")))
+        if childURIs is None:
+            childURIs = getattr(request, "childCacheURIs", ())
+
+        if not hasattr(request, "cacheTokens"):
+            request.cacheTokens = {}
+        memo = request.cacheTokens
+
+        missing = {}
+        for handle, uri in [("PrincipalToken", pURI), (None, rURI)] + [(None, childURI) for childURI in childURIs]:
+            if (handle, uri) not in memo:
+                missing.setdefault(handle, set()).add(uri)
+        if missing:
+            handles = missing.keys()
+            results = (yield gatherResults([self._tokensForURIs(list(missing[handle]), handle) for handle in handles]))
+            for handle, tokens in zip(handles, results):
+                for uri, token in tokens.items():
+                    memo[(handle, uri)] = token
+
+        tokens = []
+        tokens.append(memo[("PrincipalToken", pURI)])
         tokens.append((yield self._tokenForRecord(pURI, request)))
-        tokens.append((yield self._tokenForURI(rURI)))
-        tokens.append((yield self._tokensForChildren(rURI, request)))
+        tokens.append(memo[(None, rURI)])
+        tokens.append(dict([(childURI, memo[(None, childURI)]) for childURI in childURIs]))
         returnValue(tokens)
 
     @inlineCallbacks
@@ -366,7 +401,7 @@ class MemcacheResponseCache(BaseResponseCache, CachePoolUserMixIn):
                 )
             )
 
-            currentTokens = (yield self._getTokens(request))
+            currentTokens = (yield self._getTokens(request, childTokens.keys()))
 
             if currentTokens[0] != principalToken:
                 self.log.debug(
@@ -396,7 +431,7 @@ class MemcacheResponseCache(BaseResponseCache, CachePoolUserMixIn):
                 returnValue(None)
 
             for childuri, token in childTokens.items():
-                currentToken = (yield self._tokenForURI(childuri))
+                currentToken = currentTokens[3][childuri]
                 if currentToken != token:
                     self.log.debug(
                         "Child {uri} token doesn't match for {key!r}: {currentToken!r} != {token!r}",
@@ -505,6 +540,145 @@ class PropfindCacheMixin(object):
         returnValue(response)
 
 
+class PrincipalMatchCache(object):
+    """
+    A bounded, per-process LRU cache of which ACE principals in an ACL match a principal.
+    Keys include the cache tokens of the principal and of the principals in the ACL, which
+    are changed by the group membership and delegate cache notifiers, so a change in group
+    membership or delegates means a new key. Entries
+    are also only used for a limited time, which bounds how stale a result can be should
+    a token be lost.
+    """
+
+    def __init__(self, size, ttl):
+        self._size = size
+        self._ttl = ttl
+        self._entries = OrderedDict()  # key -> (matches, expires)
+
+    def get(self, key):
+        try:
+            matches, expires = self._entries.pop(key)
+        except KeyError:
+            return None
+        if time.time() >= expires:
+            return None
+
+        # Re-insert to make this the most recently used entry
+        self._entries[key] = (matches, expires,)
+        return matches
+
+    def set(self, key, matches):
+        self._entries.pop(key, None)
+        self._entries[key] = (matches, time.time() + self._ttl,)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class PrincipalMatchCacheMixin(object):
+    """
+    A mixin that lets resources use the L{PrincipalMatchCache} when checking privileges,
+    so that group membership tests for the same principal and ACL are not repeated in every
+    request. Only used when the response cache is enabled, as that is what turns on the
+    cache notifiers that change principal tokens.
+    """
+
+    _principalMatchCache = None
+
+    @property
+    def principalMatchCache(self):
+        if not (config.PrincipalMatchCache.Enabled and config.EnableResponseCache):
+            return None
+        if PrincipalMatchCacheMixin._principalMatchCache is None:
+            PrincipalMatchCacheMixin._principalMatchCache = PrincipalMatchCache(
+                config.PrincipalMatchCache.Size,
+                config.PrincipalMatchCache.TTL,
+            )
+        return PrincipalMatchCacheMixin._principalMatchCache
+
+    # Proxy group principals are children of the principal they are proxies for
+    _proxyPrincipalNames = (
+        "calendar-proxy-read",
+        "calendar-proxy-write",
+        "calendar-proxy-read-for",
+        "calendar-proxy-write-for",
+    )
+
+    @inlineCallbacks
+    def principalMatchCacheKey(self, request, principal, acl, aclKey):
+        """
+        Key on the principal, its current cache token, the ACL and the current cache
+        tokens of the principals in the ACL. The ACL principals' tokens are needed
+        because a change to a group or to someone's delegates changes which principals
+        are members of them, and only some of those members have their own token changed.
+        A proxy group principal uses the token of the principal it is a proxy for, which
+        is what the delegate cache notifiers change. ACLs using DAV:self are also keyed on
+        this resource, and ACLs using DAV:property are not cached at all, as those depend
+        on more than the ACL itself.
+        """
+        resourceURL = None
+        acePrincipalURLs = set()
+        for ace in acl.children:
+            acePrincipal = ace.principal.children[0]
+            if isinstance(acePrincipal, element.Property):
+                returnValue(None)
+            elif isinstance(acePrincipal, element.Self):
+                resourceURL = request.urlForResource(self)
+            elif isinstance(acePrincipal, element.HRef):
+                acePrincipalURLs.add(self._principalTokenURL(str(acePrincipal)))
+
+        principal = principal.children[0]
+        if isinstance(principal, element.HRef):
+            principalURL = str(principal)
+            acePrincipalURLs.add(principalURL)
+        else:
+            principalURL = principal.sname()
+
+        tokens = []
+        for tokenURL in sorted(acePrincipalURLs):
+            token = (yield self._principalToken(request, tokenURL))
+            if token is None:
+                returnValue(None)
+            tokens.append(token)
+
+        returnValue((principalURL, tuple(tokens), hashlib.md5(aclKey).hexdigest(), resourceURL,))
+
+    def _principalTokenURL(self, principalURL):
+        """
+        The URL of the principal whose cache token covers the membership of the given
+        principal.
+        """
+        segments = principalURL.rstrip("/").split("/")
+        if len(segments) > 1 and segments[-1] in self._proxyPrincipalNames:
+            return "/".join(segments[:-1]) + "/"
+        return principalURL
+
+    @inlineCallbacks
+    def _principalToken(self, request, principalURL):
+        """
+        Get the cache token for a principal, sharing the per-request memo of the response
+        cache. A principal without a token is given one, so that any later change, or the
+        loss of the token, results in a different token.
+        """
+        if not hasattr(request, "cacheTokens"):
+            request.cacheTokens = {}
+        memo = request.cacheTokens
+
+        if ("PrincipalToken", principalURL) not in memo:
+            pool = defaultCachePool("PrincipalToken")
+            key = "cacheToken:%s" % (principalURL,)
+            _ignore_flags, token = (yield pool.get(key))
+            if token is None:
+                token = str(uuid.uuid4())
+                yield pool.add(key, token, expireTime=config.ResponseCacheTimeout * 60)
+                _ignore_flags, token = (yield pool.get(key))
+            memo[("PrincipalToken", principalURL)] = token
+
+        returnValue(memo[("PrincipalToken", principalURL)])
+
+
 class CacheStoreNotifierFactory(CachePoolUserMixIn):
     """
     A notifier factory specifically for store object notifications. This is handed of to
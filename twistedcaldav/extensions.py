@@ -62,6 +62,7 @@ from txweb2.dav.method import prop_common
 from twext.python.log import Logger
 
 from twistedcaldav import customxml
+from twistedcaldav.cache import PrincipalMatchCacheMixin
 from twistedcaldav.customxml import calendarserver_namespace
 
 from twistedcaldav.method.report import http_REPORT
@@ -596,6 +597,7 @@ class DirectoryRenderingMixIn(object):
 class DAVResource (
     WebDAVServerInfoMixIn,
     DirectoryPrincipalPropertySearchMixIn,
+    PrincipalMatchCacheMixin,
     SuperDAVResource,
     DirectoryRenderingMixIn,
     StaticRenderMixin
@@ -715,6 +717,7 @@ class DAVResourceWithoutChildrenMixin (object):
 class DAVPrincipalResource (
     WebDAVServerInfoMixIn,
     DirectoryPrincipalPropertySearchMixIn,
+    PrincipalMatchCacheMixin,
     SuperDAVPrincipalResource,
     DirectoryRenderingMixIn
 ):
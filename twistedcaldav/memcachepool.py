@@ -14,9 +14,11 @@
 # limitations under the License.
 ##
 
+from bisect import bisect_left
+
 from twisted.python.failure import Failure
 
-from twisted.internet.defer import Deferred, fail
+from twisted.internet.defer import Deferred, fail, succeed, gatherResults
 from twisted.internet.protocol import ReconnectingClientFactory
 from twisted.protocols.memcache import MemCacheProtocol, NoSuchCommand
 
@@ -25,6 +27,8 @@ from twext.internet.gaiendpoint import GAIEndpoint
 from twext.internet.adaptendpoint import connect
 from twisted.internet.endpoints import UNIXClientEndpoint
 
+import hashlib
+
 
 class PooledMemCacheProtocol(MemCacheProtocol):
     """
@@ -130,6 +134,12 @@ class MemCachePool(object):
 
     @ivar _pendingConnects: A C{int} indicating how many connections are in
         progress.
+
+    @ivar _pipelineDepth: A C{int} indicating the maximum number of requests
+        outstanding on a single client at once.
+
+    @ivar _outstanding: A C{dict} mapping busy clients to the number of
+        requests outstanding on them.
     """
     log = Logger()
 
@@ -137,7 +147,7 @@ class MemCachePool(object):
 
     REQUEST_LOGGING_SIZE = 1024
 
-    def __init__(self, endpoint, maxClients=5, reactor=None):
+    def __init__(self, endpoint, maxClients=5, reactor=None, pipelineDepth=1):
         """
         @param endpoint: An L{IStreamClientEndpoint} indicating the server to
             connect to.
@@ -146,9 +156,14 @@ class MemCachePool(object):
 
         @param reactor: An L{IReactorTCP} provider used to initiate new
             connections.
+
+        @param pipelineDepth: A C{int} indicating how many requests may be
+            sent on a client before earlier ones have completed, once the
+            maximum number of clients are busy.
         """
         self._endpoint = endpoint
         self._maxClients = maxClients
+        self._pipelineDepth = pipelineDepth
 
         if reactor is None:
             from twisted.internet import reactor
@@ -162,6 +177,7 @@ class MemCachePool(object):
 
         self._busyClients = set([])
         self._freeClients = set([])
+        self._outstanding = {}
         self._pendingConnects = 0
         self._commands = []
 
@@ -225,7 +241,7 @@ class MemCachePool(object):
         @return: A L{Deferred} that fires with the result of the given command.
         """
         def _freeClientAfterRequest(result):
-            self.clientFree(client)
+            self._requestDone(client)
             return result
 
         def _reportError(failure):
@@ -237,11 +253,12 @@ class MemCachePool(object):
                 "Memcache error: {ex}; request: {cmd} {args}",
                 ex=failure.value,
                 cmd=command,
-                args=" ".join(args)[:self.REQUEST_LOGGING_SIZE],
+                args=" ".join([str(arg) for arg in args])[:self.REQUEST_LOGGING_SIZE],
             )
-            self.clientFree(client)
+            self._requestDone(client)
 
         self.clientBusy(client)
+        self._outstanding[client] = self._outstanding.get(client, 0) + 1
         method = getattr(client, command, None)
         if method is not None:
             d = method(*args, **kwargs)
@@ -252,6 +269,33 @@ class MemCachePool(object):
 
         return d
 
+    def _requestDone(self, client):
+        """
+        A request on the given client has completed: free the client once it
+        has no more requests outstanding.
+
+        @param client: A L{PooledMemCacheProtocol}.
+        """
+        outstanding = self._outstanding.pop(client, 1) - 1
+        if outstanding > 0:
+            self._outstanding[client] = outstanding
+        else:
+            self.clientFree(client)
+
+    def _pipelineClient(self):
+        """
+        Find a busy client that can have another request pipelined on it.
+
+        @return: the busy client with the fewest outstanding requests, or
+            C{None} if there is none with fewer than C{self._pipelineDepth}.
+        """
+        candidates = [
+            (outstanding, client)
+            for client, outstanding in self._outstanding.items()
+            if outstanding < self._pipelineDepth and client in self._busyClients
+        ]
+        return min(candidates)[1] if candidates else None
+
     def performRequest(self, command, *args, **kwargs):
         """
         Select an available client and perform the given request on it.
@@ -272,6 +316,14 @@ class MemCachePool(object):
             d = self._performRequestOnClient(
                 client, command, *args, **kwargs)
 
+        elif (
+            len(self._busyClients) + self._pendingConnects >= self._maxClients and
+            self._pipelineDepth > 1 and
+            self._pipelineClient() is not None
+        ):
+            d = self._performRequestOnClient(
+                self._pipelineClient(), command, *args, **kwargs)
+
         elif (
             len(self._busyClients) + self._pendingConnects >= self._maxClients
         ):
@@ -310,6 +362,8 @@ class MemCachePool(object):
         elif client in self._freeClients:
             self._freeClients.remove(client)
 
+        self._outstanding.pop(client, None)
+
         self.log.debug("Removed client: {c!r}", c=client)
         self._logClientStats()
 
@@ -371,6 +425,9 @@ class MemCachePool(object):
     def get(self, *args, **kwargs):
         return self.performRequest('get', *args, **kwargs)
 
+    def getMultiple(self, *args, **kwargs):
+        return self.performRequest('getMultiple', *args, **kwargs)
+
     def set(self, *args, **kwargs):
         return self.performRequest('set', *args, **kwargs)
 
@@ -393,6 +450,285 @@ class MemCachePool(object):
         return self.performRequest('flushAll', *args, **kwargs)
 
 
+class _MemCacheNode(object):
+    """
+    A memcached node in a L{ShardedMemCachePool}, with its health and request
+    statistics.
+
+    @ivar name: A C{str} identifying the node.
+    @ivar pool: The L{MemCachePool} used to talk to the node.
+    @ivar failures: A C{int} count of consecutive failed requests.
+    @ivar deadUntil: The time until which the node is not used, or C{None} if
+        it is in use.
+    @ivar reviving: C{True} while a dead node is being flushed before it is
+        used again.
+    """
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.failures = 0
+        self.deadUntil = None
+        self.reviving = False
+        self.requests = 0
+        self.errors = 0
+        self.totalTime = 0.0
+        self._last = (0, 0, 0.0,)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency": (self.totalTime / self.requests * 1000.0) if self.requests else 0.0,
+            "dead": self.deadUntil is not None,
+        }
+
+    def statsSinceLast(self):
+        """
+        Get the number of requests and errors, and the total request time
+        (milliseconds), since the last call.
+        """
+        lastRequests, lastErrors, lastTotalTime = self._last
+        self._last = (self.requests, self.errors, self.totalTime,)
+        return {
+            "requests": self.requests - lastRequests,
+            "errors": self.errors - lastErrors,
+            "t": (self.totalTime - lastTotalTime) * 1000.0,
+            "dead": self.deadUntil is not None,
+        }
+
+
+class ShardedMemCachePool(object):
+    """
+    A memcache pool that spreads keys across several memcached nodes using
+    consistent hashing, so that adding or losing a node only moves the keys
+    that node was responsible for.
+
+    A node whose requests fail or time out C{failureLimit} times in a row is
+    marked dead for C{retryInterval} seconds, during which its keys are hashed
+    to the next live node on the ring. Requests to a failed node return the
+    same results as a cache miss or failed update, so callers see a cold cache
+    rather than an error. Once the retry interval has passed the node is
+    flushed before being used again, since changes to its keys were made on
+    other nodes while it was dead.
+
+    @ivar _nodes: A C{list} of L{_MemCacheNode}.
+    @ivar _ring: A sorted C{list} of C{(hash, node)} points on the ring.
+    """
+    log = Logger()
+
+    VIRTUAL_NODES = 160
+
+    def __init__(self, nodes, reactor=None, failureLimit=3, retryInterval=30, requestTimeout=2):
+        """
+        @param nodes: A C{list} of C{(name, pool)} for each memcached node,
+            where C{pool} is a L{MemCachePool} for that node.
+
+        @param reactor: An L{IReactorTime} provider.
+
+        @param failureLimit: A C{int} number of consecutive failures after
+            which a node is marked dead.
+
+        @param retryInterval: A C{float} number of seconds a dead node is not
+            used for.
+
+        @param requestTimeout: A C{float} number of seconds after which a
+            request is treated as failed.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+
+        self._nodes = [_MemCacheNode(name, pool) for name, pool in nodes]
+        self._failureLimit = failureLimit
+        self._retryInterval = retryInterval
+        self._requestTimeout = requestTimeout
+
+        self._ring = []
+        for node in self._nodes:
+            for i in range(self.VIRTUAL_NODES):
+                self._ring.append((self._hash("%s-%d" % (node.name, i,)), node,))
+        self._ring.sort(key=lambda x: x[0])
+        self._ringKeys = [point for point, _ignore_node in self._ring]
+
+    @staticmethod
+    def _hash(key):
+        return long(hashlib.md5(key).hexdigest()[:8], 16)
+
+    def _isAlive(self, node):
+        if node.deadUntil is not None and not node.reviving and self._reactor.seconds() >= node.deadUntil:
+            self._reviveNode(node)
+        return node.deadUntil is None
+
+    def _reviveNode(self, node):
+        """
+        Give a dead node another chance. Values it still has may have been
+        changed or deleted on other nodes while it was dead, so it is flushed
+        first and only used again once that succeeds.
+        """
+        self.log.info("Flushing and retrying memcache node: {n}", n=node.name)
+        node.reviving = True
+
+        def _flushed(result):
+            node.reviving = False
+            if result:
+                node.deadUntil = None
+                node.failures = 0
+            else:
+                node.deadUntil = self._reactor.seconds() + self._retryInterval
+
+        self._performRequestOnNode(node, False, "flushAll").addCallback(_flushed)
+
+    def nodeForKey(self, key):
+        """
+        Find the live node responsible for a key.
+
+        @param key: A C{str} memcache key.
+
+        @return: the L{_MemCacheNode}, or C{None} if all nodes are dead.
+        """
+        start = bisect_left(self._ringKeys, self._hash(key))
+        seen = set()
+        for offset in range(len(self._ring)):
+            node = self._ring[(start + offset) % len(self._ring)][1]
+            if node in seen:
+                continue
+            if self._isAlive(node):
+                return node
+            seen.add(node)
+            if len(seen) == len(self._nodes):
+                break
+        return None
+
+    def _nodeFailed(self, node, reason):
+        node.errors += 1
+        node.failures += 1
+        if node.failures >= self._failureLimit and node.deadUntil is None:
+            self.log.error(
+                "Marking memcache node {n} dead for {i} seconds: {r}",
+                n=node.name, i=self._retryInterval, r=reason,
+            )
+            node.deadUntil = self._reactor.seconds() + self._retryInterval
+
+    def _performRequestOnNode(self, node, missing, command, *args, **kwargs):
+        """
+        Perform a request on a node, recording its latency and health.
+
+        L{MemCachePool} logs errors and returns C{None} in place of a result,
+        so a C{None} result is treated as a failure.
+
+        @param missing: the result to return if the request fails.
+
+        @return: A L{Deferred} that fires with the result of the command.
+        """
+        if node is None:
+            return succeed(missing)
+
+        result = Deferred()
+        start = self._reactor.seconds()
+
+        def _timedOut():
+            self._nodeFailed(node, "timed out")
+            result.callback(missing)
+        timeout = self._reactor.callLater(self._requestTimeout, _timedOut)
+
+        def _done(value):
+            if not timeout.active():
+                # Already timed out
+                return
+            timeout.cancel()
+            node.requests += 1
+            node.totalTime += self._reactor.seconds() - start
+            if value is None or isinstance(value, Failure):
+                self._nodeFailed(node, "request failed")
+                value = missing
+            else:
+                node.failures = 0
+            result.callback(value)
+
+        getattr(node.pool, command)(*args, **kwargs).addBoth(_done)
+        return result
+
+    def _performKeyRequest(self, command, missing, key, *args, **kwargs):
+        return self._performRequestOnNode(
+            self.nodeForKey(key), missing, command, key, *args, **kwargs
+        )
+
+    def suggestMaxClients(self, maxClients):
+        for node in self._nodes:
+            node.pool.suggestMaxClients(maxClients)
+
+    def nodeStats(self):
+        """
+        Get the request, error and latency (milliseconds) statistics for
+        each node.
+
+        @return: A C{dict} mapping each node name to its statistics.
+        """
+        return dict([(node.name, node.stats()) for node in self._nodes])
+
+    def nodeStatsSinceLast(self):
+        """
+        Get the request, error and total request time (milliseconds) statistics
+        for each node since the last call.
+
+        @return: A C{dict} mapping each node name to its statistics.
+        """
+        return dict([(node.name, node.statsSinceLast()) for node in self._nodes])
+
+    def get(self, key, withIdentifier=False):
+        return self._performKeyRequest(
+            "get", (0, "", None) if withIdentifier else (0, None), key, withIdentifier=withIdentifier
+        )
+
+    def getMultiple(self, keys, withIdentifier=False):
+        missing = (0, "", None) if withIdentifier else (0, None)
+        byNode = {}
+        for key in keys:
+            byNode.setdefault(self.nodeForKey(key), []).append(key)
+
+        def _merge(results):
+            merged = {}
+            for result in results:
+                merged.update(result)
+            return merged
+
+        return gatherResults([
+            self._performRequestOnNode(
+                node, dict([(key, missing) for key in nodeKeys]),
+                "getMultiple", nodeKeys, withIdentifier=withIdentifier
+            )
+            for node, nodeKeys in byNode.items()
+        ]).addCallback(_merge)
+
+    def set(self, key, *args, **kwargs):
+        return self._performKeyRequest("set", False, key, *args, **kwargs)
+
+    def checkAndSet(self, key, *args, **kwargs):
+        return self._performKeyRequest("checkAndSet", False, key, *args, **kwargs)
+
+    def delete(self, key, *args, **kwargs):
+        return self._performKeyRequest("delete", False, key, *args, **kwargs)
+
+    def add(self, key, *args, **kwargs):
+        return self._performKeyRequest("add", False, key, *args, **kwargs)
+
+    def incr(self, key, *args, **kwargs):
+        return self._performKeyRequest("incr", False, key, *args, **kwargs)
+
+    def decr(self, key, *args, **kwargs):
+        return self._performKeyRequest("decr", False, key, *args, **kwargs)
+
+    def flushAll(self, *args, **kwargs):
+        def _allFlushed(results):
+            return all(results)
+
+        return gatherResults([
+            self._performRequestOnNode(node, False, "flushAll", *args, **kwargs)
+            for node in self._nodes if self._isAlive(node)
+        ]).addCallback(_allFlushed)
+
+
 class CachePoolUserMixIn(object):
     """
     A mixin that returns a saved cache pool or fetches the default cache pool.
@@ -413,11 +749,34 @@ _memCachePools = {}         # Maps a name to a pool object
 _memCachePoolHandler = {}   # Maps a handler id to a named pool
 
 
-def installPools(pools, maxClients=5, reactor=None):
+def installPools(pools, maxClients=5, reactor=None, pipelineDepth=1, sharding=None):
+    """
+    Install a pool for each enabled memcache pool configuration. A pool with a
+    list of C{Servers} is sharded across those memcached nodes, otherwise it
+    uses the single node given by C{MemcacheSocket} or C{BindAddress}/C{Port}.
+
+    @param pools: A C{dict} of pool configurations, keyed by pool name.
+    @param pipelineDepth: A C{int} maximum number of requests pipelined on
+        each connection.
+    @param sharding: A C{dict} of C{FailureLimit}, C{RetryInterval} and
+        C{RequestTimeout} options for sharded pools.
+    """
     if reactor is None:
         from twisted.internet import reactor
     for name, pool in pools.items():
         if pool["ClientEnabled"]:
+            if pool.get("Servers"):
+                _installShardedPool(
+                    name,
+                    pool["HandleCacheTypes"],
+                    pool["Servers"],
+                    maxClients,
+                    reactor,
+                    pipelineDepth,
+                    sharding,
+                )
+                continue
+
             if pool.get("MemcacheSocket"):
                 ep = UNIXClientEndpoint(reactor, pool["MemcacheSocket"])
             else:
@@ -429,19 +788,67 @@ def installPools(pools, maxClients=5, reactor=None):
                 ep,
                 maxClients,
                 reactor,
+                pipelineDepth,
             )
 
 
 def _installPool(
-    name, handleTypes, serverEndpoint, maxClients=5, reactor=None
+    name, handleTypes, serverEndpoint, maxClients=5, reactor=None, pipelineDepth=1,
+):
+    pool = MemCachePool(serverEndpoint, maxClients=maxClients, reactor=None, pipelineDepth=pipelineDepth)
+    _memCachePools[name] = pool
+
+    for handle in handleTypes:
+        _memCachePoolHandler[handle] = pool
+
+
+def _installShardedPool(
+    name, handleTypes, servers, maxClients=5, reactor=None, pipelineDepth=1, sharding=None,
 ):
-    pool = MemCachePool(serverEndpoint, maxClients=maxClients, reactor=None)
+    """
+    Install a L{ShardedMemCachePool} for the given servers, each of which is
+    either C{"host:port"} or C{"unix:/path/to/socket"}.
+    """
+    nodes = []
+    for server in servers:
+        if server.startswith("unix:"):
+            ep = UNIXClientEndpoint(reactor, server[len("unix:"):])
+        else:
+            host, port = server.rsplit(":", 1)
+            ep = GAIEndpoint(reactor, host, int(port))
+        nodes.append((server, MemCachePool(ep, maxClients=maxClients, reactor=None, pipelineDepth=pipelineDepth),))
+
+    if sharding is None:
+        sharding = {}
+    pool = ShardedMemCachePool(
+        nodes,
+        reactor=reactor,
+        failureLimit=sharding.get("FailureLimit", 3),
+        retryInterval=sharding.get("RetryInterval", 30),
+        requestTimeout=sharding.get("RequestTimeout", 2),
+    )
     _memCachePools[name] = pool
 
     for handle in handleTypes:
         _memCachePoolHandler[handle] = pool
 
 
+def nodeStatsSinceLast():
+    """
+    Get the statistics since the last call for each node of the installed
+    sharded pools. Used to feed memcache node activity into the per-request
+    access log stats.
+
+    @return: A C{dict} mapping C{"pool/node"} names to statistics.
+    """
+    results = {}
+    for name, pool in _memCachePools.items():
+        if isinstance(pool, ShardedMemCachePool):
+            for nodeName, stats in pool.nodeStatsSinceLast().items():
+                results["%s/%s" % (name, nodeName,)] = stats
+    return results
+
+
 def defaultCachePool(name):
     if name not in _memCachePoolHandler:
         name = "Default"
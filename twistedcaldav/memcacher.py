@@ -14,11 +14,15 @@
 # limitations under the License.
 ##
 
+from collections import OrderedDict
+
 import hashlib
 import cPickle
 import string
+import time
+import uuid
 
-from twisted.internet.defer import succeed
+from twisted.internet.defer import succeed, gatherResults
 
 from twext.python.log import Logger
 
@@ -34,6 +38,7 @@ class Memcacher(CachePoolUserMixIn):
     HASH_LENGTH = 32              # length of hash we will generate
     TRUNCATED_KEY_LENGTH = MEMCACHE_KEY_LIMIT - NAMESPACE_MAX_LENGTH - HASH_LENGTH - 2  # 2 accounts for delimiters
     MEMCACHE_VALUE_LIMIT = 1024 * 1024  # the memcached default value length limit
+    GENERATION_KEY = "__generation__"   # key of the per-namespace token used to validate local caches
 
     # Translation table: all ctrls (0x00 - 0x1F) and space and 0x7F mapped to _
     keyNormalizeTranslateTable = string.maketrans("".join([chr(i) for i in range(33)]) + chr(0x7F), "_" * 33 + "_")
@@ -43,6 +48,9 @@ class Memcacher(CachePoolUserMixIn):
         True: None,
         False: None,
     }
+    localCacheInstances = {}
+    _lastLocalCacheHits = 0
+    _lastLocalCacheMisses = 0
 
     class memoryCacher():
         """
@@ -129,6 +137,12 @@ class Memcacher(CachePoolUserMixIn):
             else:
                 return succeed((0, value,))
 
+        def getMultiple(self, keys, withIdentifier=False):
+            results = {}
+            for key in keys:
+                results[key] = self.get(key, withIdentifier=withIdentifier).result
+            return succeed(results)
+
         def delete(self, key):
             self._check_key(key)
 
@@ -206,6 +220,9 @@ class Memcacher(CachePoolUserMixIn):
         def get(self, key, withIdentifier=False):
             return succeed((0, None,))
 
+        def getMultiple(self, keys, withIdentifier=False):
+            return succeed(dict([(key, (0, "", None,) if withIdentifier else (0, None,)) for key in keys]))
+
         def delete(self, key):
             return succeed(True)
 
@@ -218,6 +235,106 @@ class Memcacher(CachePoolUserMixIn):
         def flushAll(self):
             return succeed(True)
 
+    class localCacher(object):
+        """
+        A bounded, in-process LRU cache of raw memcache values used in front of
+        memcached. Every delete made via a L{Memcacher} for the namespace, and
+        every other change to an existing value (checkAndSet, incr and decr), also
+        changes a generation token for the namespace in memcached. Locally cached
+        values are only used once the token has been checked since the start of
+        the current request (or within the TTL when outside of a request), and all
+        of them are discarded when the token has changed, so values changed by
+        another process are never served once a new request has started.
+
+        A set or add is taken to be filling the cache with the current value after a
+        miss, so it only updates the local entry, without the cost of changing the
+        token and discarding every process's cached values. A namespace with a local
+        cache must therefore delete a value when the data it was derived from changes,
+        rather than set a new one.
+        """
+
+        def __init__(self, size, ttl):
+            self._size = size
+            self._ttl = ttl
+            self._entries = OrderedDict()  # key -> value
+            self.generation = 0
+            self.token = None
+            self._validUntil = 0
+            self.hits = 0
+            self.misses = 0
+
+        def isValid(self):
+            """
+            Whether the cached values can currently be used without first checking the
+            namespace generation token in memcached.
+            """
+            return time.time() < self._validUntil
+
+        def invalidate(self):
+            """
+            Require the namespace generation token to be checked before the cached
+            values are used again.
+            """
+            self._validUntil = 0
+
+        def validate(self, token):
+            """
+            Record the current namespace generation token read from memcached, discarding
+            all the cached values if it has changed.
+
+            @param token: the generation token, or C{None} if there is none
+            @type token: C{str}
+            """
+            if token != self.token:
+                self.clear()
+                self.token = token
+            self._validUntil = time.time() + self._ttl
+
+        def get(self, key):
+            """
+            Get a value from the local cache.
+
+            @return: a tuple of whether the key was found, and the value
+            @rtype: C{tuple}
+            """
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return (False, None,)
+
+            # Re-insert to make this the most recently used entry
+            self._entries[key] = value
+            self.hits += 1
+            return (True, value,)
+
+        def set(self, key, value, generation=None):
+            """
+            Store a value in the local cache, unless an invalidation has occurred since
+            C{generation} was read.
+            """
+            if generation is not None and generation != self.generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+        def delete(self, key):
+            self.generation += 1
+            self._entries.pop(key, None)
+
+        def clear(self):
+            self.generation += 1
+            self._entries.clear()
+
+        def stats(self):
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
     def __init__(self, namespace, pickle=False, no_invalidation=False, key_normalization=True):
         """
         @param namespace: a unique namespace for this cache's keys
@@ -242,6 +359,7 @@ class Memcacher(CachePoolUserMixIn):
         self._pickle = pickle
         self._noInvalidation = no_invalidation
         self._key_normalization = key_normalization
+        self._localCache = None
 
     def _getMemcacheProtocol(self):
         if self._memcacheProtocol is not None:
@@ -264,6 +382,67 @@ class Memcacher(CachePoolUserMixIn):
 
         return self._memcacheProtocol
 
+    def _getLocalCache(self):
+        """
+        Get the in-process cache to use in front of memcached for this namespace. That is only
+        used when enabled for the namespace in config.Memcached.LocalCache and memcached itself
+        is in use.
+
+        @return: the local cache or C{None}
+        @rtype: L{Memcacher.localCacher}
+        """
+        if self._localCache is None:
+            self._localCache = False
+            options = config.Memcached.LocalCache
+            if options.Enabled and config.Memcached.Pools.Default.ClientEnabled and self._namespace in options.Namespaces:
+                if self._namespace not in Memcacher.localCacheInstances:
+                    limits = options.Namespaces[self._namespace]
+                    Memcacher.localCacheInstances[self._namespace] = Memcacher.localCacher(
+                        limits.get("Size", 1000), limits.get("TTL", 5)
+                    )
+                self._localCache = Memcacher.localCacheInstances[self._namespace]
+        return self._localCache if self._localCache else None
+
+    def _generationKey(self):
+        return "%s:%s" % (self._namespace, Memcacher.GENERATION_KEY,)
+
+    def _validateLocal(self, localCache):
+        """
+        Check the namespace generation token in memcached before the locally cached values
+        are used, if that has not been done since the start of the current request.
+
+        @return: a L{Deferred} that fires when the local cache can be used
+        """
+        if localCache.isValid():
+            return succeed(None)
+        d = self._getMemcacheProtocol().get(self._generationKey())
+        d.addCallback(lambda result: localCache.validate(result[-1]))
+        return d
+
+    def _changedLocal(self, d, memcacheKey):
+        """
+        Invalidate the locally cached value for a key that is being changed, and once the
+        change has been made in memcached also change the namespace generation token, so
+        that other processes discard their locally cached values.
+
+        @param d: the L{Deferred} for the change being made in memcached
+        @type d: L{Deferred}
+
+        @return: a L{Deferred} that fires with the result of C{d} once the generation
+            token has been changed
+        """
+        localCache = self._getLocalCache()
+        if localCache is None:
+            return d
+        localCache.delete(memcacheKey)
+        d.addBoth(self._changeGeneration)
+        return d
+
+    def _changeGeneration(self, result):
+        d = self._getMemcacheProtocol().set(self._generationKey(), str(uuid.uuid4()))
+        d.addBoth(lambda _ignore: result)
+        return d
+
     def _normalizeKey(self, key):
 
         if isinstance(key, unicode):
@@ -285,7 +464,12 @@ class Memcacher(CachePoolUserMixIn):
         if self._pickle:
             my_value = cPickle.dumps(value)
         self.log.debug("Adding Cache Token for {k!r}", k=key)
-        return proto.add('%s:%s' % (self._namespace, self._normalizeKey(key)), my_value, expireTime=expireTime)
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        d = proto.add(memcacheKey, my_value, expireTime=expireTime)
+        localCache = self._getLocalCache()
+        if localCache is not None:
+            d.addCallback(self._setLocal, localCache, memcacheKey, my_value, localCache.generation)
+        return d
 
     def set(self, key, value, expireTime=0):
 
@@ -295,7 +479,28 @@ class Memcacher(CachePoolUserMixIn):
         if self._pickle:
             my_value = cPickle.dumps(value)
         self.log.debug("Setting Cache Token for {k!r}", k=key)
-        return proto.set('%s:%s' % (self._namespace, self._normalizeKey(key)), my_value, expireTime=expireTime)
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        d = proto.set(memcacheKey, my_value, expireTime=expireTime)
+        localCache = self._getLocalCache()
+        if localCache is not None:
+            d.addCallback(self._setLocal, localCache, memcacheKey, my_value, localCache.generation)
+        return d
+
+    def setMultiple(self, values, expireTime=0):
+        """
+        Set the values for a set of keys. The individual requests are all issued
+        before waiting for any of the results, so this costs one round trip.
+
+        @param values: the values to set
+        @type values: C{dict} mapping C{str} keys to values
+
+        @return: a L{Deferred} firing with C{True} if all the values were set
+        """
+        if not values:
+            return succeed(True)
+        d = gatherResults([self.set(key, value, expireTime=expireTime) for key, value in values.items()])
+        d.addCallback(all)
+        return d
 
     def checkAndSet(self, key, value, cas, flags=0, expireTime=0):
 
@@ -305,7 +510,8 @@ class Memcacher(CachePoolUserMixIn):
         if self._pickle:
             my_value = cPickle.dumps(value)
         self.log.debug("Setting Cache Token for {k!r}", k=key)
-        return proto.checkAndSet('%s:%s' % (self._namespace, self._normalizeKey(key)), my_value, cas, expireTime=expireTime)
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        return self._changedLocal(proto.checkAndSet(memcacheKey, my_value, cas, expireTime=expireTime), memcacheKey)
 
     def get(self, key, withIdentifier=False):
         def _gotit(result, withIdentifier):
@@ -320,29 +526,173 @@ class Memcacher(CachePoolUserMixIn):
             return value
 
         self.log.debug("Getting Cache Token for {k!r}", k=key)
-        d = self._getMemcacheProtocol().get('%s:%s' % (self._namespace, self._normalizeKey(key)), withIdentifier=withIdentifier)
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        localCache = self._getLocalCache() if not withIdentifier else None
+        if localCache is not None:
+            d = self._validateLocal(localCache)
+            d.addCallback(self._getLocal, localCache, memcacheKey)
+        else:
+            d = self._getMemcacheProtocol().get(memcacheKey, withIdentifier=withIdentifier)
         d.addCallback(_gotit, withIdentifier)
         return d
 
+    def getMultiple(self, keys):
+        """
+        Get the values for a set of keys using a single memcache request.
+
+        @param keys: the keys to look up
+        @type keys: C{list} of C{str}
+
+        @return: a L{Deferred} firing with a C{dict} mapping each key to its
+            value, or C{None} if there is no value cached
+        """
+        def _gotit(result, keymap):
+            values = {}
+            for memcacheKey, key in keymap.items():
+                value = result.get(memcacheKey, (0, None,))[-1]
+                if self._pickle and value is not None:
+                    value = cPickle.loads(value)
+                values[key] = value
+            return values
+
+        keymap = dict([('%s:%s' % (self._namespace, self._normalizeKey(key)), key) for key in keys])
+        if not keymap:
+            return succeed({})
+        self.log.debug("Getting Cache Tokens for {k!r}", k=keys)
+
+        localCache = self._getLocalCache()
+        if localCache is not None:
+            d = self._validateLocal(localCache)
+            d.addCallback(self._getMultipleLocal, localCache, keymap.keys())
+        else:
+            d = self._getMemcacheProtocol().getMultiple(keymap.keys())
+        d.addCallback(_gotit, keymap)
+        return d
+
+    def _getLocal(self, _ignore, localCache, memcacheKey):
+        """
+        Callback to get a value from the validated local cache, or from memcached if it is
+        not cached locally.
+        """
+        found, value = localCache.get(memcacheKey)
+        if found:
+            return (0, value,)
+        d = self._getMemcacheProtocol().get(memcacheKey)
+        d.addCallback(self._gotLocal, localCache, memcacheKey, localCache.generation)
+        return d
+
+    def _getMultipleLocal(self, _ignore, localCache, memcacheKeys):
+        """
+        Callback to get values from the validated local cache, and only ask memcached for
+        the ones not cached locally.
+        """
+        localResults = {}
+        for memcacheKey in memcacheKeys:
+            found, value = localCache.get(memcacheKey)
+            if found:
+                localResults[memcacheKey] = (0, value,)
+        if len(localResults) == len(memcacheKeys):
+            return localResults
+
+        d = self._getMemcacheProtocol().getMultiple([memcacheKey for memcacheKey in memcacheKeys if memcacheKey not in localResults])
+        d.addCallback(self._gotMultipleLocal, localCache, localResults, localCache.generation)
+        return d
+
+    def _setLocal(self, result, localCache, memcacheKey, value, generation):
+        """
+        Callback to store a value written to memcached in the local cache.
+        """
+        if result:
+            localCache.set(memcacheKey, value, generation)
+        return result
+
+    def _gotLocal(self, result, localCache, memcacheKey, generation):
+        """
+        Callback to store a value read from memcached in the local cache.
+        """
+        value = result[-1]
+        if value is not None:
+            localCache.set(memcacheKey, value, generation)
+        return result
+
+    def _gotMultipleLocal(self, result, localCache, localResults, generation):
+        """
+        Callback to store values read from memcached in the local cache, and merge in
+        the values that were already cached locally.
+        """
+        for memcacheKey, value in result.items():
+            if value[-1] is not None:
+                localCache.set(memcacheKey, value[-1], generation)
+        result.update(localResults)
+        return result
+
     def delete(self, key):
         self.log.debug("Deleting Cache Token for {k!r}", k=key)
-        return self._getMemcacheProtocol().delete('%s:%s' % (self._namespace, self._normalizeKey(key)))
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        return self._changedLocal(self._getMemcacheProtocol().delete(memcacheKey), memcacheKey)
 
     def incr(self, key, delta=1):
         self.log.debug("Incrementing Cache Token for {k!r}", k=key)
-        return self._getMemcacheProtocol().incr('%s:%s' % (self._namespace, self._normalizeKey(key)), delta)
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        return self._changedLocal(self._getMemcacheProtocol().incr(memcacheKey, delta), memcacheKey)
 
     def decr(self, key, delta=1):
         self.log.debug("Decrementing Cache Token for {k!r}", k=key)
-        return self._getMemcacheProtocol().incr('%s:%s' % (self._namespace, self._normalizeKey(key)), delta)
+        memcacheKey = '%s:%s' % (self._namespace, self._normalizeKey(key))
+        return self._changedLocal(self._getMemcacheProtocol().incr(memcacheKey, delta), memcacheKey)
 
     def flushAll(self):
         self.log.debug("Flushing All Cache Tokens")
+        localCache = self._getLocalCache()
+        if localCache is not None:
+            localCache.clear()
         return self._getMemcacheProtocol().flushAll()
 
+    @classmethod
+    def localCacheStats(cls):
+        """
+        Get the statistics for each namespace's in-process cache.
+
+        @return: a C{dict} mapping each namespace to a C{dict} of size, hits and misses
+        @rtype: C{dict}
+        """
+        return dict([(namespace, localCache.stats()) for namespace, localCache in cls.localCacheInstances.items()])
+
+    @classmethod
+    def localCacheStatsSinceLast(cls):
+        """
+        Get the number of hits and misses across all namespaces' in-process caches since
+        the last call, together with their current total size. Used to feed local cache
+        activity into the per-request access log stats.
+
+        @rtype: C{tuple} of (C{int}, C{int}, C{int})
+        """
+        hits = misses = size = 0
+        for localCache in cls.localCacheInstances.values():
+            stats = localCache.stats()
+            hits += stats["hits"]
+            misses += stats["misses"]
+            size += stats["size"]
+        result = (hits - cls._lastLocalCacheHits, misses - cls._lastLocalCacheMisses, size,)
+        cls._lastLocalCacheHits = hits
+        cls._lastLocalCacheMisses = misses
+        return result
+
+    @classmethod
+    def revalidateLocalCaches(cls):
+        """
+        Require each namespace's in-process cache to check its generation token in
+        memcached before its values are used again. Called at the start of each request.
+        """
+        for localCache in cls.localCacheInstances.values():
+            localCache.invalidate()
+
     @classmethod
     def reset(cls):
         """
         Reset the memory cachers
         """
         cls.memoryCacheInstance = {True: None, False: None}
+        cls.localCacheInstances = {}
+        cls._lastLocalCacheHits = 0
+        cls._lastLocalCacheMisses = 0
@@ -30,10 +30,7 @@ from txweb2.http import Response
 from txweb2.http_headers import MimeType
 from txweb2.stream import MemoryStream
 
-from twistedcaldav.config import config
 from twistedcaldav.customxml import calendarserver_namespace
-from twistedcaldav.datafilters.hiddeninstance import HiddenInstanceFilter
-from twistedcaldav.datafilters.privateevents import PrivateEventFilter
 from twistedcaldav.ical import Component
 from twistedcaldav.resource import isPseudoCalendarCollectionResource, \
     CalDAVResource
@@ -88,21 +85,14 @@ def http_GET(self, request):
                 if accepted_type is None:
                     raise HTTPError(StatusResponse(responsecode.NOT_ACCEPTABLE, "Cannot generate requested data type"))
 
-                caldata = (yield self.componentForUser())
+                # Non DAV:owner's have limited access to the data
+                isowner = (yield self.isOwner(request)) if self.accessMode else True
 
-                # Filter any attendee hidden instances
-                caldata = HiddenInstanceFilter().filter(caldata)
-
-                if self.accessMode:
-
-                    # Non DAV:owner's have limited access to the data
-                    isowner = (yield self.isOwner(request))
-
-                    # Now "filter" the resource calendar data
-                    caldata = PrivateEventFilter(self.accessMode, isowner).filter(caldata)
+                # Get the per-user, hidden instance and private event filtered data
+                caldata = (yield self.iCalendarTextFiltered(isowner, format=accepted_type))
 
                 response = Response()
-                response.stream = MemoryStream(caldata.getTextWithTimezones(includeTimezones=not config.EnableTimezonesByReference, format=accepted_type))
+                response.stream = MemoryStream(caldata)
                 response.headers.setHeader("content-type", MimeType.fromString("%s; charset=utf-8" % (accepted_type,)))
 
                 # Add Schedule-Tag header if property is present
@@ -33,7 +33,7 @@ from txweb2.http import HTTPError
 from txweb2 import responsecode
 from txweb2.http import StatusResponse
 from txdav.xml import element as davxml
-from txweb2.dav.http import MultiStatusResponse, statusForFailure, \
+from txweb2.dav.http import IncrementalMultiStatusResponse, statusForFailure, \
     ErrorResponse
 from txweb2.dav.util import normalizeURL, davXMLFromStream, parentForURL
 
@@ -121,7 +121,7 @@ def http_PROPFIND(self, request):
     if not returnMinimal:
         returnMinimal = request.headers.getHeader("brief", False)
 
-    xml_responses = []
+    xml_responses = IncrementalMultiStatusResponse()
 
     # FIXME: take advantage of the new generative properties of findChildren
 
@@ -238,7 +238,7 @@ def http_PROPFIND(self, request):
     #
     # Return response
     #
-    returnValue(MultiStatusResponse(xml_responses))
+    returnValue(xml_responses.finish())
 
 
 ##
@@ -26,7 +26,7 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 
 from twext.python.log import Logger
 from txweb2 import responsecode
-from txweb2.dav.http import MultiStatusResponse
+from txweb2.dav.http import IncrementalMultiStatusResponse
 from txweb2.dav.http import ErrorResponse
 from txweb2.dav.method.report import NumberOfMatchesWithinLimits
 from txweb2.dav.util import joinURL
@@ -47,6 +47,9 @@ from txdav.xml import element as davxml
 
 log = Logger()
 
+# Number of matching resources whose data is loaded with one batched query
+PREFETCH_BATCH_SIZE = 50
+
 
 @inlineCallbacks
 def report_urn_ietf_params_xml_ns_caldav_calendar_query(self, request, calendar_query):
@@ -65,7 +68,7 @@ def report_urn_ietf_params_xml_ns_caldav_calendar_query(self, request, calendar_
             log.error("calendar-query report is not allowed on a resource outside of a calendar collection {s!r}", s=self)
             raise HTTPError(StatusResponse(responsecode.FORBIDDEN, "Must be calendar collection or calendar resource"))
 
-    responses = []
+    responses = IncrementalMultiStatusResponse()
 
     xmlfilter = calendar_query.filter
     filter = Filter(xmlfilter)
@@ -134,6 +137,7 @@ def report_urn_ietf_params_xml_ns_caldav_calendar_query(self, request, calendar_
         ))
 
     matchcount = [0]
+    fallbackcount = [0]
     max_number_of_results = [config.MaxQueryWithDataResults if generate_calendar_data else None, ]
 
     @inlineCallbacks
@@ -208,8 +212,13 @@ def report_urn_ietf_params_xml_ns_caldav_calendar_query(self, request, calendar_
                     # Get list of children that match the search and have read access
                     names = [name for name, ignore_uid, ignore_type in (yield calresource.search(filter))]
                 except IndexedSearchException:
-                    names = yield calresource.listChildren()
+                    # Let the index narrow down the children that need to be matched against the filter
                     index_query_ok = False
+                    try:
+                        names = [name for name, ignore_uid, ignore_type in (yield calresource.search(filter, superset=True))]
+                    except IndexedSearchException:
+                        names = yield calresource.listChildren()
+                    fallbackcount[0] += 1
 
                 if not names:
                     returnValue(True)
@@ -228,9 +237,15 @@ def report_urn_ietf_params_xml_ns_caldav_calendar_query(self, request, calendar_
                     inherited_aces=filteredaces
                 )
 
-                for child, child_uri in ok_resources:
+                for ctr, (child, child_uri) in enumerate(ok_resources):
                     child_uri_name = child_uri[child_uri.rfind("/") + 1:]
 
+                    # Load the data for the next batch of children in one go
+                    if (generate_calendar_data or not index_query_ok) and ctr % PREFETCH_BATCH_SIZE == 0:
+                        yield calresource.prefetchChildData([
+                            batch_child for batch_child, ignore_uri in ok_resources[ctr:ctr + PREFETCH_BATCH_SIZE]
+                        ])
+
                     if generate_calendar_data or not index_query_ok:
                         calendar = (yield child.componentForUser())
                         assert calendar is not None, "Calendar %s is missing from calendar collection %r" % (child_uri_name, self)
@@ -295,5 +310,7 @@ def report_urn_ietf_params_xml_ns_caldav_calendar_query(self, request, calendar_
     if not hasattr(request, "extendedLogItems"):
         request.extendedLogItems = {}
     request.extendedLogItems["responses"] = len(responses)
+    if fallbackcount[0]:
+        request.extendedLogItems["fallback"] = fallbackcount[0]
 
-    returnValue(MultiStatusResponse(responses))
+    returnValue(responses.finish())
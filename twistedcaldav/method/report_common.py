@@ -346,12 +346,17 @@ def _namedPropertiesForResource(request, props, resource, calendar=None, timezon
 
         if isinstance(property, caldavxml.CalendarData):
             if dataAllowed:
-                # Handle private events access restrictions
-                if calendar is None:
-                    calendar = (yield resource.componentForUser())
-                filtered = HiddenInstanceFilter().filter(calendar)
-                filtered = PrivateEventFilter(resource.accessMode, isowner).filter(filtered)
-                filtered = CalendarDataFilter(property, timezone).filter(filtered)
+                if calendar is None and not property.children:
+                    # All the data is wanted, so the store can hand back
+                    # pre-serialized data without any parsing
+                    filtered = (yield resource.iCalendarTextFiltered(isowner, format=property.content_type))
+                else:
+                    # Handle private events access restrictions
+                    if calendar is None:
+                        calendar = (yield resource.componentForUser())
+                    filtered = HiddenInstanceFilter().filter(calendar)
+                    filtered = PrivateEventFilter(resource.accessMode, isowner).filter(filtered)
+                    filtered = CalendarDataFilter(property, timezone).filter(filtered)
                 propvalue = CalendarData.fromCalendar(filtered, format=property.content_type)
                 properties_by_status[responsecode.OK].append(propvalue)
             else:
@@ -34,7 +34,7 @@ from txdav.common.icommondatastore import ConcurrentModification
 from txdav.xml import element as davxml
 from txdav.xml.base import dav_namespace
 from txweb2 import responsecode
-from txweb2.dav.http import ErrorResponse, MultiStatusResponse
+from txweb2.dav.http import ErrorResponse, IncrementalMultiStatusResponse
 from txweb2.dav.resource import AccessDeniedError
 from txweb2.http import HTTPError, StatusResponse
 from urllib import unquote
@@ -61,7 +61,7 @@ def multiget_common(self, request, multiget, collection_type):
                 log.error("addressbook-multiget report is not allowed on a resource outside of an address book collection {res}", res=self)
                 raise HTTPError(StatusResponse(responsecode.FORBIDDEN, "Must be address book resource"))
 
-    responses = []
+    responses = IncrementalMultiStatusResponse()
 
     propertyreq = multiget.property
     resources = multiget.resources
@@ -201,6 +201,10 @@ def multiget_common(self, request, multiget, collection_type):
                 inherited_aces=filteredaces
             )
 
+            # Load the data for all valid readable resources in one go
+            if hasData:
+                yield self.prefetchChildData([resource for resource, ignore_href in ok_resources])
+
             # Get properties for all valid readable resources
             for resource, href in ok_resources:
                 try:
@@ -380,4 +384,4 @@ def multiget_common(self, request, multiget, collection_type):
 
                 yield report_common.responseForHref(request, responses, href, child, propertiesForResource, propertyreq, isowner=isowner)
 
-    returnValue(MultiStatusResponse(responses))
+    returnValue(responses.finish())
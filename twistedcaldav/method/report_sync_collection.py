@@ -34,7 +34,7 @@ from txdav.xml import element
 
 from txweb2 import responsecode
 from txweb2.dav.http import ErrorResponse
-from txweb2.dav.http import MultiStatusResponse
+from txweb2.dav.http import IncrementalMultiStatusResponse
 from txweb2.dav.util import joinURL
 from txweb2.http import HTTPError, StatusResponse
 
@@ -58,15 +58,7 @@ def report_DAV__sync_collection(self, request, sync_collection):
             "Report not supported on this resource",
         ))
 
-    responses = []
-
-    # Do not support limit
-    if sync_collection.sync_limit is not None:
-        raise HTTPError(ErrorResponse(
-            responsecode.INSUFFICIENT_STORAGE_SPACE,
-            element.NumberOfMatchesWithinLimits(),
-            "Report limit not supported",
-        ))
+    responses = IncrementalMultiStatusResponse()
 
     # Process Depth and sync-level for backwards compatibility
     # Use sync-level if present and ignore Depth, else use Depth
@@ -89,7 +81,17 @@ def report_DAV__sync_collection(self, request, sync_collection):
     # the child resource loop and supply those to the checkPrivileges on each child.
     filteredaces = (yield self.inheritedACEsforChildren(request))
 
-    changed, removed, notallowed, newtoken, resourceChanged = yield self.whatchanged(sync_collection.sync_token, depth)
+    changed, removed, notallowed, newtoken, resourceChanged, truncated = yield self.whatchanged(
+        sync_collection.sync_token, depth, sync_collection.sync_limit
+    )
+
+    # Only an initial sync can be truncated - anything else must fit within the limit
+    if sync_collection.sync_limit is not None and len(changed) + len(removed) + len(notallowed) > sync_collection.sync_limit:
+        raise HTTPError(ErrorResponse(
+            responsecode.INSUFFICIENT_STORAGE_SPACE,
+            element.NumberOfMatchesWithinLimits(),
+            "Report limit exceeded",
+        ))
 
     # Now determine which valid resources are readable and which are not
     ok_resources = []
@@ -160,10 +162,18 @@ def report_DAV__sync_collection(self, request, sync_collection):
         href = element.HRef.fromString(joinURL(request.uri, name))
         responses.append(element.StatusResponse(element.HRef.fromString(href), element.Status.fromResponseCode(responsecode.NOT_ALLOWED)))
 
+    if truncated:
+        # RFC 6578 section 3.6 - the client continues from the returned sync token
+        responses.append(element.StatusResponse(
+            element.HRef.fromString(request.uri),
+            element.Status.fromResponseCode(responsecode.INSUFFICIENT_STORAGE_SPACE),
+            element.Error(element.NumberOfMatchesWithinLimits()),
+        ))
+
     if not hasattr(request, "extendedLogItems"):
         request.extendedLogItems = {}
     request.extendedLogItems["responses"] = len(responses)
 
     responses.append(element.SyncToken.fromString(newtoken))
 
-    returnValue(MultiStatusResponse(responses))
+    returnValue(responses.finish())
@@ -1201,10 +1201,29 @@ class CalDAVResource (
     # Collection sync stuff
 
     @inlineCallbacks
-    def whatchanged(self, client_token, depth):
+    def whatchanged(self, client_token, depth, limit=None):
+        """
+        Determine what changed since the client's sync token. An initial sync of a
+        collection is returned in pages when the client (or the server config) limits
+        the number of results: the token for a truncated page records the revision at
+        the start of the sync together with the last name returned, so that the next
+        request continues from there.
+
+        @param client_token: the client's sync token, or C{None} for an initial sync
+        @type client_token: C{str}
+        @param depth: depth for determine what changed
+        @type depth: C{str}
+        @param limit: maximum number of results requested by the client, or C{None}
+        @type limit: C{int}
+
+        @return: a tuple of changed, removed and not-allowed names, the new sync token,
+            whether the resource itself changed, and whether the results were truncated
+        @rtype: C{tuple}
+        """
 
         client_data_token = None
         client_config_token = None
+        cursor = None
 
         if client_token:
             if "/" in client_token:
@@ -1223,14 +1242,24 @@ class CalDAVResource (
                 if not client_data_token.startswith("data:,"):
                     raise ValueError
                 caluuid, revision = client_data_token[6:].split("_", 1)
+                if "_" in revision:
+                    # Continuation of a truncated initial sync
+                    revision, cursor = revision.split("_", 1)
+                    cursor = cursor.decode("hex")
                 revision = int(revision)
 
                 # Check client token validity
                 if caluuid != current_uuid:
                     raise ValueError
                 if revision > current_revision:
-                    raise ValueError
-            except ValueError:
+                    # The current revision may have come from a cache that has not yet seen
+                    # the latest change, so check the actual revision before rejecting the token
+                    current_token = (yield self.refreshInternalSyncToken())
+                    current_revision = int(current_token.split("_", 1)[1])
+                    current_token = "data:,%s" % (current_token,)
+                    if revision > current_revision:
+                        raise ValueError
+            except (ValueError, TypeError):
                 raise HTTPError(ErrorResponse(
                     responsecode.FORBIDDEN,
                     (dav_namespace, "valid-sync-token"),
@@ -1239,14 +1268,45 @@ class CalDAVResource (
         else:
             revision = 0
 
-        try:
-            changed, removed, notallowed = yield self._indexWhatChanged(revision, depth)
-        except SyncTokenValidException:
-            raise HTTPError(ErrorResponse(
-                responsecode.FORBIDDEN,
-                (dav_namespace, "valid-sync-token"),
-                "Sync token not recognized",
-            ))
+        # Initial syncs are paged if a limit applies, and continuations are always paged
+        page = None
+        page_size = None
+        truncated = False
+        if revision == 0 or cursor is not None:
+            page_size = limit
+            if config.MaxInitialSyncResults:
+                page_size = min(page_size or config.MaxInitialSyncResults, config.MaxInitialSyncResults)
+            if page_size or cursor is not None:
+                # Fetch one extra name to see whether there is another page
+                page = yield self._indexWhatChangedPage(
+                    cursor if cursor is not None else "",
+                    page_size + 1 if page_size else None,
+                )
+
+        if page is not None:
+            # Every page reports the revision at the start of the sync, so that changes
+            # made while paging are picked up by the next incremental sync
+            if cursor is not None:
+                current_revision = revision
+            changed, removed, notallowed = page, [], []
+            if page_size and len(changed) > page_size:
+                changed = changed[:page_size]
+                truncated = True
+                current_token = "data:,{}_{}_{}".format(current_uuid, current_revision, changed[-1].encode("hex"))
+            else:
+                current_token = "data:,{}_{}".format(current_uuid, current_revision)
+        elif revision == current_revision:
+            # Client is already up to date - no need to query the revisions
+            changed, removed, notallowed = [], [], []
+        else:
+            try:
+                changed, removed, notallowed = yield self._indexWhatChanged(revision, depth)
+            except SyncTokenValidException:
+                raise HTTPError(ErrorResponse(
+                    responsecode.FORBIDDEN,
+                    (dav_namespace, "valid-sync-token"),
+                    "Sync token not recognized",
+                ))
 
         if config.EnableConfigSyncToken:
             # Append the app-level portion of sync token (e.g. derived from config)
@@ -1258,12 +1318,19 @@ class CalDAVResource (
         else:
             resourceChanged = False
 
-        returnValue((changed, removed, notallowed, current_token, resourceChanged))
+        returnValue((changed, removed, notallowed, current_token, resourceChanged, truncated))
 
     def _indexWhatChanged(self, revision, depth):
         # Now handled directly by newstore
         raise NotImplementedError
 
+    def _indexWhatChangedPage(self, after, limit):
+        """
+        Return a sorted page of the names of all child resources, or C{None} if this
+        resource does not support paging.
+        """
+        return succeed(None)
+
     @inlineCallbacks
     def getSyncToken(self):
         """
@@ -1281,6 +1348,12 @@ class CalDAVResource (
         """
         raise HTTPError(StatusResponse(responsecode.NOT_FOUND, "Property not supported"))
 
+    def refreshInternalSyncToken(self):
+        """
+        Return current internal sync-token value, bypassing any cached value.
+        """
+        return self.getInternalSyncToken()
+
     #
     # Stuff from CalDAVFile
     #
@@ -1409,6 +1482,15 @@ class CalDAVResource (
         caldata = PrivateEventFilter(self.accessMode, isowner).filter(caldata)
         returnValue(caldata)
 
+    @inlineCallbacks
+    def iCalendarTextFiltered(self, isowner, format=None):
+        """
+        Serialized version of L{iCalendarFiltered}. The store may be able to
+        return this without parsing any calendar data; see storebridge.
+        """
+        caldata = (yield self.iCalendarFiltered(isowner))
+        returnValue(caldata.getTextWithTimezones(includeTimezones=not config.EnableTimezonesByReference, format=format))
+
     def component(self):
         # storebridge handles this method
         raise NotImplementedError()
@@ -2087,7 +2169,7 @@ class CommonHomeResource(PropfindCacheMixin, SharedHomeMixin, CalDAVResource):
         """
 
         if depth == "1":
-            yield self._newStoreHome.loadChildren()
+            yield self._newStoreHome.loadSnapshot()
 
         result = (yield super(CommonHomeResource, self).findChildrenFaster(
             depth, request, okcallback, badcallback, missingcallback, unavailablecallback, names, privileges, inherited_aces
@@ -2114,7 +2196,10 @@ class CommonHomeResource(PropfindCacheMixin, SharedHomeMixin, CalDAVResource):
             self.putChild(name, child)
             returnValue(child)
 
-        # get regular or shared child
+        # get regular or shared child - optionally loading all of them at once, which is
+        # cheaper than loading each one separately when most of them will be used
+        if config.EnableHomeSnapshot:
+            yield self._newStoreHome.loadSnapshot()
         child = yield self.makeRegularChild(name)
 
         # add _share attribute if child is shared; verify that child should
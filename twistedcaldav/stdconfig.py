@@ -536,6 +536,7 @@ DEFAULT_CONFIG = {
     "EnableSyncReport": True,  # REPORT collection-sync
     "EnableSyncReportHome": True,  # REPORT collection-sync on home collections
     "EnableConfigSyncToken": True,  # Sync token includes config component
+    "MaxInitialSyncResults": 0,  # Page initial collection-sync reports with this many results (0 - no paging)
     "EnableWellKnown": True,  # /.well-known resource
     "EnableCalendarQueryExtended": True,  # Extended calendar-query REPORT
 
@@ -801,6 +802,7 @@ DEFAULT_CONFIG = {
             "UIDLockExpirySeconds": 300,  # Expiration time for UID lock,
             "PrincipalHostAliases": [],  # Host names matched in http(s) CUAs
             "TimestampAttendeePartStatChanges": True,  # Add a time stamp when an Attendee changes their PARTSTAT
+            "AggregateRequests": False,  # Send one iTIP REQUEST to all local attendees receiving identical messages
 
             "DelegeteRichFreeBusy": True,  # Delegates can get extra info in a freebusy request
             "RoomResourceRichFreeBusy": True,  # Any user can get extra info for rooms/resources in a freebusy request
@@ -819,6 +821,13 @@ DEFAULT_CONFIG = {
                 "FutureFreeBusyDays": 3 * 365,     # How far into the future to check for booking conflicts
             },
 
+            "ParallelDelivery": {
+                "Enabled": False,  # Deliver an organizer's message to each local attendee in its own transaction, in parallel
+                "Concurrency": 10,  # Maximum number of attendees delivered to at once. Each uses its own database
+                                    # connection while the organizer's transaction holds another, so this is capped
+                                    # at MaxDBConnectionsPerPool - 1.
+            },
+
             "WorkQueues": {
                 "Enabled": True,       # Work queues for scheduling enabled
                 "RequestDelaySeconds": 5,          # Number of seconds delay for a queued scheduling request/cancel
@@ -1018,6 +1027,17 @@ DEFAULT_CONFIG = {
 
     "Memcached": {
         "MaxClients": 5,
+        # Maximum number of requests sent on a connection before earlier ones
+        # complete, once MaxClients connections are busy.
+        "PipelineDepth": 1,
+        # Health checking for pools with multiple Servers: a node is not used for
+        # RetryInterval seconds after FailureLimit consecutive failed requests, a
+        # request failing if it takes more than RequestTimeout seconds.
+        "Sharding": {
+            "FailureLimit": 3,
+            "RetryInterval": 30,
+            "RequestTimeout": 2,
+        },
         "Pools": {
             "Default": {
                 # A unix socket used for communication with memcached.
@@ -1027,6 +1047,10 @@ DEFAULT_CONFIG = {
                 "ServerEnabled": True,
                 "BindAddress": "127.0.0.1",
                 "Port": 11311,
+                # A list of "host:port" or "unix:/path" memcached nodes to spread
+                # keys across using consistent hashing, used instead of
+                # MemcacheSocket/BindAddress/Port when not empty.
+                "Servers": [],
                 "HandleCacheTypes": [  # Possible types:
                     # "OpenDirectoryBacker",
                     # "ImplicitUIDLock",
@@ -1058,6 +1082,21 @@ DEFAULT_CONFIG = {
         "MaxMemory": 0,  # Megabytes
         "Options": [],
         "ProxyDBKeyNormalization": True,
+
+        # An in-process LRU cache in front of memcached for the listed Memcacher
+        # namespaces. Deletes made in any process change a generation token for
+        # the namespace, which is checked once per request before locally cached
+        # values are used. Sets only fill the cache, so these namespaces must
+        # delete values when their data changes. Each namespace has a maximum
+        # number of entries and a time (seconds) after which the token is
+        # checked again when outside of a request.
+        "LocalCache": {
+            "Enabled": False,
+            "Namespaces": {
+                "FBCache": {"Size": 1000, "TTL": 5},
+                "SQL.props": {"Size": 5000, "TTL": 5},
+            },
+        },
     },
 
     "Postgres": {
@@ -1093,6 +1132,29 @@ DEFAULT_CONFIG = {
         "ExpireSeconds": 3600,
     },
 
+    # Per-process LRU cache of parsed calendar data, keyed by resource-id and
+    # md5, so that popular resources are not re-parsed in every transaction
+    "ComponentCache": {
+        "Enabled": False,
+        "Size": 1000,  # Maximum number of parsed calendar objects
+        "PerUserSize": 2000,  # Maximum number of per-user filtered views
+    },
+
+    # Memcache of the serialized calendar data as seen by each viewer, so that
+    # GETs and calendar-data reports of unchanged data need no parsing
+    "PerUserTextCache": {
+        "Enabled": False,
+        "MaxSize": 512 * 1024,  # Don't cache anything larger than this
+        "ExpireSeconds": 24 * 60 * 60,
+    },
+
+    # Memcache of each collection's current sync token revision, so that sync
+    # requests from clients that are already up to date need no queries
+    "SyncTokenCache": {
+        "Enabled": False,
+        "ExpireSeconds": 60,  # Bounds how long a stale value can survive a lost update
+    },
+
     "GroupCaching": {
         "Enabled": True,
         "UpdateSeconds": 300,
@@ -1132,15 +1194,40 @@ DEFAULT_CONFIG = {
     "EnableResponseCache": True,
     "ResponseCacheTimeout": 30,  # Minutes
 
+    # Per-process cache of which ACE principals match the authenticated principal,
+    # so group membership is not re-checked in every request. Requires
+    # EnableResponseCache, whose notifiers invalidate the entries.
+    "PrincipalMatchCache": {
+        "Enabled": False,
+        "Size": 10000,  # Maximum number of (principal, ACL) entries
+        "TTL": 300,  # Seconds an entry may be used for
+    },
+
+    # Load all children of a home in a few queries when traversing into any of them. This
+    # also happens for requests that only need one child, which then read every child of the
+    # home, so it only helps when most requests list the home. Depth:1 PROPFINDs of a home
+    # always load all children at once.
+    "EnableHomeSnapshot": False,
+
     "EnableFreeBusyCache": True,
     "FreeBusyCacheDaysBack": 7,
     "FreeBusyCacheDaysForward": 12 * 7,
+    "EnableFreeBusyTimeline": False,  # Maintain pre-merged busy time for each calendar via a work item
+    "FreeBusyTimelineDelay": 5,  # Seconds to wait after a calendar change before rebuilding its busy timeline
 
     "FreeBusyIndexLowerLimitDays": 365,
     "FreeBusyIndexExpandAheadDays": 365,
     "FreeBusyIndexExpandMaxDays": 5 * 365,
     "FreeBusyIndexDelayedExpand": False,
     "FreeBusyIndexSmartUpdate": True,
+    "FreeBusyIndexInsertBatchSize": 100,  # Max rows per multi-row TIME_RANGE/PERUSER insert
+    "FreeBusyIndexIncrementalUpdate": True,  # Only change TIME_RANGE rows that differ when re-indexing
+    "FreeBusyIndexExpansion": {  # Work item that re-expands recurrences before queries need them to be
+        "Enabled": False,
+        "PeriodSeconds": 15 * 60,  # Seconds between runs
+        "LeadDays": 30,  # Days past FreeBusyIndexExpandAheadDays to expand to
+        "BatchSize": 200,  # Max resources re-expanded per run
+    },
 
     # The RootResource uses a twext property store. Specify the class here
     "RootResourcePropStoreClass": "txweb2.dav.xattrprops.xattrPropertyStore",
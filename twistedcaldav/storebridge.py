@@ -365,6 +365,9 @@ class _CommonHomeChildCollectionMixin(_CommonStoreExceptionHandler):
             (yield self._newStoreObject.resourceNamesSinceToken(revision))
         )
 
+    def _indexWhatChangedPage(self, after, limit):
+        return self._newStoreObject.listObjectResourcesAfter(after, limit)
+
     @inlineCallbacks
     def makeChild(self, name):
         """
@@ -440,6 +443,9 @@ class _CommonHomeChildCollectionMixin(_CommonStoreExceptionHandler):
     def getInternalSyncToken(self):
         return self._newStoreObject.syncToken() if self._newStoreObject else None
 
+    def refreshInternalSyncToken(self):
+        return self._newStoreObject.refreshSyncToken() if self._newStoreObject else None
+
     def resourceID(self):
         rid = "%s/%s" % (self._newStoreParentHome.id(), self._newStoreObject.id(),)
         return uuid.uuid5(self.uuid_namespace, rid).urn
@@ -465,6 +471,20 @@ class _CommonHomeChildCollectionMixin(_CommonStoreExceptionHandler):
 
         returnValue(result)
 
+    def prefetchChildData(self, children):
+        """
+        Load the calendar/address data for the specified child resources with batched store queries,
+        for reports that return the data of many children.
+
+        @param children: the child resources
+        @type children: L{list} of L{_CommonObjectResource}
+        """
+        objects = [child._newStoreObject for child in children if getattr(child, "_newStoreObject", None) is not None]
+        if objects:
+            return self._newStoreObject.loadObjectResourcesText(objects)
+        else:
+            return succeed(None)
+
     @inlineCallbacks
     def createCollection(self):
         """
@@ -2540,6 +2560,12 @@ class CalendarObjectResource(_CalendarObjectMetaDataMixin, _CommonObjectResource
     def componentForUser(self):
         return self._newStoreObject.componentForUser()
 
+    def iCalendarTextFiltered(self, isowner, format=None):
+        return self._newStoreObject.filteredText(
+            None, isowner, format,
+            includeTimezones=not config.EnableTimezonesByReference,
+        )
+
     def validIfScheduleMatch(self, request):
         """
         Check to see if the given request's C{If-Schedule-Tag-Match} header
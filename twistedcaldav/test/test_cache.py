@@ -19,6 +19,7 @@ import hashlib
 import cPickle
 
 from twisted.internet.defer import succeed, maybeDeferred, inlineCallbacks
+from twisted.internet.task import Clock
 
 from txweb2.dav.util import allDataFromStream
 from txweb2.stream import MemoryStream
@@ -27,6 +28,9 @@ from txweb2.http_headers import Headers
 from twistedcaldav.cache import MemcacheResponseCache, CacheStoreNotifier
 from twistedcaldav.cache import MemcacheChangeNotifier
 from twistedcaldav.cache import PropfindCacheMixin
+from twistedcaldav.cache import PrincipalMatchCache, PrincipalMatchCacheMixin
+from twistedcaldav.cache import MemcacheURLPatternChangeNotifier
+from twistedcaldav import cache as cacheModule
 
 from twistedcaldav.test.util import InMemoryMemcacheProtocol
 from twistedcaldav.test.util import TestCase
@@ -390,10 +394,13 @@ class MemcacheResponseCacheTests(BaseCacheTestMixin, TestCase):
         self.tokens['/principals/__uids__/cdaboo/'] = 'principalToken0'
         self.tokens['/principals/__uids__/dreid/'] = 'principalTokenX'
 
-        def _getToken(uri, cachePoolHandle=None):
-            return succeed(self.tokens.get(uri))
+        self.tokenRequests = []
 
-        self.rc._tokenForURI = _getToken
+        def _getTokens(uris, cachePoolHandle=None):
+            self.tokenRequests.append((cachePoolHandle, sorted(uris)))
+            return succeed(dict([(uri, self.tokens.get(uri)) for uri in uris]))
+
+        self.rc._tokensForURIs = _getTokens
 
         self.expected_response = (200, Headers({}), "Foo")
 
@@ -462,6 +469,46 @@ class MemcacheResponseCacheTests(BaseCacheTestMixin, TestCase):
         d.addCallback(self.assertResponse, expected_response)
         return d
 
+    @inlineCallbacks
+    def test_tokensFetchedOncePerRequest(self):
+        """
+        Test that the tokens needed to validate a response cache entry are fetched with
+        one multi-get per cache pool, and not fetched again when the response is cached.
+        """
+        request = StubRequest(
+            'PROPFIND',
+            '/calendars/__uids__/cdaboo/',
+            '/principals/__uids__/cdaboo/')
+        response = (yield self.rc.getResponseForRequest(request))
+        yield self.assertResponse(response, self.expected_response)
+        self.assertEqual(sorted(self.tokenRequests), [
+            (None, ['/calendars/__uids__/cdaboo/', '/calendars/__uids__/cdaboo/calendars/']),
+            ('PrincipalToken', ['/principals/__uids__/cdaboo/']),
+        ])
+
+        del self.tokenRequests[:]
+        request.childCacheURIs = ['/calendars/__uids__/cdaboo/calendars/']
+        tokens = (yield self.rc._getTokens(request))
+        self.assertEqual(self.tokenRequests, [])
+        self.assertEqual(tokens[3], {'/calendars/__uids__/cdaboo/calendars/': 'childToken0'})
+
+    @inlineCallbacks
+    def test_tokensForURIs(self):
+        """
+        Test that L{MemcacheResponseCache._tokensForURIs} returns the cached tokens for
+        a set of URIs, including C{None} for URIs without a token.
+        """
+        rc = MemcacheResponseCache(None, cachePool=self.memcacheStub)
+        self.memcacheStub._cache['cacheToken:/calendars/__uids__/cdaboo/'] = (0, 'uriToken1')
+        tokens = (yield rc._tokensForURIs([
+            '/calendars/__uids__/cdaboo/',
+            u'/calendars/__uids__/dreid/',
+        ]))
+        self.assertEqual(tokens, {
+            '/calendars/__uids__/cdaboo/': 'uriToken1',
+            u'/calendars/__uids__/dreid/': None,
+        })
+
 
 class StubResponseCacheResource(object):
 
@@ -577,3 +624,64 @@ class PropfindCacheMixinTests(TestCase):
         d.addCallback(_checkCache)
 
         return d
+
+
+class PrincipalMatchCacheTests(TestCase):
+    """
+    Test L{PrincipalMatchCache}.
+    """
+
+    def test_bounded(self):
+        """
+        The least recently used entries are discarded once the cache is full.
+        """
+        cache = PrincipalMatchCache(2, 60)
+        cache.set("a", (True,))
+        cache.set("b", (False,))
+        self.assertEquals(cache.get("a"), (True,))
+        cache.set("c", (True, False,))
+
+        self.assertEquals(cache.get("a"), (True,))
+        self.assertEquals(cache.get("b"), None)
+        self.assertEquals(cache.get("c"), (True, False,))
+
+    def test_expiry(self):
+        """
+        Entries are not used once they have expired.
+        """
+        cache = PrincipalMatchCache(2, -1)
+        cache.set("a", (True,))
+        self.assertEquals(cache.get("a"), None)
+
+    @inlineCallbacks
+    def test_keyChangesWhenDelegateRevoked(self):
+        """
+        Revoking a group's delegate access changes the key for the group's members,
+        even though only the delegator's and the group's tokens are changed.
+        """
+        memcache = InMemoryMemcacheProtocol(reactor=Clock())
+        self.patch(cacheModule, "defaultCachePool", lambda name: memcache)
+        notifier = MemcacheURLPatternChangeNotifier("/principals/__uids__/{token}/", cachePool=memcache)
+
+        class StubRequest(object):
+            pass
+
+        resource = PrincipalMatchCacheMixin()
+        principal = element.Principal(element.HRef("/principals/__uids__/user01/"))
+        acl = element.ACL(
+            element.ACE(
+                element.Principal(element.HRef("/principals/__uids__/user02/calendar-proxy-write/")),
+                element.Grant(element.Privilege(element.All())),
+            ),
+        )
+
+        key1 = yield resource.principalMatchCacheKey(StubRequest(), principal, acl, repr(acl))
+        key2 = yield resource.principalMatchCacheKey(StubRequest(), principal, acl, repr(acl))
+        self.assertEquals(key1, key2)
+
+        # user01 is a member of group01, which is removed as user02's delegate
+        yield notifier.changed("user02")
+        yield notifier.changed("group01")
+
+        key3 = yield resource.principalMatchCacheKey(StubRequest(), principal, acl, repr(acl))
+        self.assertNotEquals(key1, key3)
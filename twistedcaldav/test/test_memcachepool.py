@@ -16,7 +16,9 @@
 
 from zope.interface import implements
 
+from twisted.internet.defer import Deferred, inlineCallbacks, succeed
 from twisted.internet.interfaces import IConnector, IReactorTCP
+from twisted.internet.task import Clock
 from twisted.internet.endpoints import TCP4ClientEndpoint
 from twisted.internet.address import IPv4Address
 
@@ -24,6 +26,7 @@ from twistedcaldav.test.util import InMemoryMemcacheProtocol
 from twistedcaldav.memcachepool import PooledMemCacheProtocol
 from twistedcaldav.memcachepool import MemCacheClientFactory
 from twistedcaldav.memcachepool import MemCachePool
+from twistedcaldav.memcachepool import ShardedMemCachePool
 
 from twistedcaldav.test.util import TestCase
 
@@ -380,3 +383,188 @@ class MemCachePoolTests(TestCase):
 
         self.pool.performRequest('get', 'bar')
         self.assertEquals(self.reactor.calls, [])
+
+    def test_performRequestPipelinesOnBusyClient(self):
+        """
+        Test that L{MemCachePool.performRequest} sends a request on a busy
+        client, rather than queueing it, when the pipeline depth allows.
+        """
+        pool = MemCachePool(
+            TCP4ClientEndpoint(self.reactor, MC_ADDRESS.host, MC_ADDRESS.port),
+            maxClients=1, reactor=self.reactor, pipelineDepth=2
+        )
+
+        p = InMemoryMemcacheProtocol()
+        p.set('foo', 'bar')
+        pool.clientBusy(p)
+        pool._outstanding[p] = 1
+
+        results = []
+        pool.performRequest('get', 'foo').addCallback(results.append)
+        self.assertEquals(results, [(0, 'bar')])
+        self.assertEquals(pool._commands, [])
+        self.assertEquals(pool._outstanding, {p: 1})
+        self.assertEquals(pool._busyClients, set([p]))
+
+        # Depth reached, so the next request is queued
+        pool._outstanding[p] = 2
+        pool.performRequest('get', 'foo')
+        self.assertEquals(len(pool._commands), 1)
+
+
+class StubNodePool(object):
+    """
+    A stub L{MemCachePool} for a node of a L{ShardedMemCachePool}, that can be
+    made to fail or hang.
+    """
+
+    def __init__(self):
+        self.protocol = InMemoryMemcacheProtocol()
+        self.mode = "ok"
+
+    def _request(self, command, *args, **kwargs):
+        if self.mode == "fail":
+            return succeed(None)
+        elif self.mode == "hang":
+            return Deferred()
+        return getattr(self.protocol, command)(*args, **kwargs)
+
+    def get(self, key, withIdentifier=False):
+        return self._request("get", key)
+
+    def getMultiple(self, keys, withIdentifier=False):
+        return self._request("getMultiple", keys)
+
+    def set(self, *args, **kwargs):
+        return self._request("set", *args, **kwargs)
+
+    def flushAll(self):
+        if self.mode == "ok":
+            self.protocol._cache.clear()
+            return succeed(True)
+        return self._request("flushAll")
+
+
+class ShardedMemCachePoolTests(TestCase):
+    """
+    Tests for L{ShardedMemCachePool}.
+    """
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.clock = Clock()
+        self.nodes = [("node%d" % (i,), StubNodePool(),) for i in range(3)]
+        self.pool = ShardedMemCachePool(
+            self.nodes, reactor=self.clock, failureLimit=2, retryInterval=30, requestTimeout=2
+        )
+
+    @inlineCallbacks
+    def test_keysSpreadAcrossNodes(self):
+        """
+        Test that keys are stored on the node consistent hashing maps them to,
+        and that multi-gets are split across the nodes.
+        """
+        keys = ["key%d" % (i,) for i in range(30)]
+        for key in keys:
+            yield self.pool.set(key, "value-%s" % (key,))
+
+        used = set()
+        for key in keys:
+            node = self.pool.nodeForKey(key)
+            self.assertEquals(node.pool.protocol._cache[key], (0, "value-%s" % (key,)))
+            used.add(node.name)
+        self.assertEquals(used, set(["node0", "node1", "node2"]))
+
+        results = yield self.pool.getMultiple(keys + ["missing"])
+        self.assertEquals(results["missing"], (0, None))
+        for key in keys:
+            self.assertEquals(results[key], (0, "value-%s" % (key,)))
+
+        stats = self.pool.nodeStats()
+        self.assertEquals(sum([stat["requests"] for stat in stats.values()]), 33)
+        self.assertEquals(sum([stat["errors"] for stat in stats.values()]), 0)
+
+    @inlineCallbacks
+    def test_deadNodeRehashed(self):
+        """
+        Test that a node is marked dead after repeated failures, its keys are
+        hashed to another node until the retry interval has passed, and that
+        failures look like cache misses.
+        """
+        node = self.pool.nodeForKey("akey")
+        node.pool.mode = "fail"
+
+        result = yield self.pool.get("akey")
+        self.assertEquals(result, (0, None))
+        self.assertTrue(self.pool.nodeForKey("akey") is node)
+        result = yield self.pool.set("akey", "avalue")
+        self.assertFalse(result)
+
+        other = self.pool.nodeForKey("akey")
+        self.assertFalse(other is node)
+        self.assertTrue(self.pool.nodeStats()[node.name]["dead"])
+        result = yield self.pool.set("akey", "avalue")
+        self.assertTrue(result)
+        self.assertEquals(other.pool.protocol._cache["akey"], (0, "avalue"))
+
+        node.pool.mode = "ok"
+        self.clock.advance(30)
+        self.assertTrue(self.pool.nodeForKey("akey") is node)
+        self.assertFalse(self.pool.nodeStats()[node.name]["dead"])
+
+    @inlineCallbacks
+    def test_revivedNodeFlushed(self):
+        """
+        Test that a dead node is flushed before being used again, so that it
+        does not return values that were changed on another node while it
+        was dead, and that it stays dead if the flush fails.
+        """
+        yield self.pool.set("akey", "old")
+        node = self.pool.nodeForKey("akey")
+        node.pool.mode = "fail"
+        yield self.pool.get("akey")
+        yield self.pool.get("akey")
+        self.assertFalse(self.pool.nodeForKey("akey") is node)
+
+        # Still failing when the retry interval has passed
+        self.clock.advance(30)
+        self.assertFalse(self.pool.nodeForKey("akey") is node)
+        self.assertTrue(self.pool.nodeStats()[node.name]["dead"])
+
+        yield self.pool.set("akey", "new")
+        node.pool.mode = "ok"
+        self.clock.advance(30)
+        self.assertTrue(self.pool.nodeForKey("akey") is node)
+        result = yield self.pool.get("akey")
+        self.assertEquals(result, (0, None))
+
+    @inlineCallbacks
+    def test_nodeStatsSinceLast(self):
+        """
+        Test that per-node statistics are reported as changes since the last
+        call.
+        """
+        yield self.pool.set("akey", "avalue")
+        node = self.pool.nodeForKey("akey")
+        stats = self.pool.nodeStatsSinceLast()
+        self.assertEquals(stats[node.name]["requests"], 1)
+        self.assertEquals(stats[node.name]["errors"], 0)
+        self.assertFalse(stats[node.name]["dead"])
+
+        stats = self.pool.nodeStatsSinceLast()
+        self.assertEquals(stats[node.name]["requests"], 0)
+
+    def test_requestTimeout(self):
+        """
+        Test that a request that does not complete in time is treated as a
+        failure.
+        """
+        node = self.pool.nodeForKey("akey")
+        node.pool.mode = "hang"
+
+        results = []
+        self.pool.get("akey").addCallback(results.append)
+        self.assertEquals(results, [])
+        self.clock.advance(2)
+        self.assertEquals(results, [(0, None)])
+        self.assertEquals(self.pool.nodeStats()[node.name]["errors"], 1)
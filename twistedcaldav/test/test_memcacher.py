@@ -7,6 +7,8 @@ Test the memcacher cache abstraction.
 
 from twisted.internet.defer import inlineCallbacks
 
+import cPickle
+
 from twistedcaldav.config import config
 from twistedcaldav.memcacher import Memcacher
 from twistedcaldav.test.util import TestCase
@@ -45,6 +47,48 @@ class MemcacherTestCase(TestCase):
             result = yield cacher.get("akey")
             self.assertEquals(None, result)
 
+    @inlineCallbacks
+    def test_getMultiple(self):
+
+        for processType in ("Single", "Combined",):
+            config.ProcessType = processType
+
+            cacher = Memcacher("testing", pickle=True)
+
+            result = yield cacher.set("akey", ["1", "2", "3", ])
+            self.assertTrue(result)
+            result = yield cacher.set("bkey", {"a": 1})
+            self.assertTrue(result)
+
+            result = yield cacher.getMultiple(["akey", "bkey", "ckey"])
+            if isinstance(cacher._memcacheProtocol, Memcacher.nullCacher):
+                self.assertEquals({"akey": None, "bkey": None, "ckey": None}, result)
+            else:
+                self.assertEquals({"akey": ["1", "2", "3", ], "bkey": {"a": 1}, "ckey": None}, result)
+
+            result = yield cacher.getMultiple([])
+            self.assertEquals({}, result)
+
+    @inlineCallbacks
+    def test_setMultiple(self):
+
+        for processType in ("Single", "Combined",):
+            config.ProcessType = processType
+
+            cacher = Memcacher("testing", pickle=True)
+
+            result = yield cacher.setMultiple({"akey": ["1", "2", "3", ], "bkey": {"a": 1}})
+            self.assertTrue(result)
+
+            result = yield cacher.getMultiple(["akey", "bkey", "ckey"])
+            if isinstance(cacher._memcacheProtocol, Memcacher.nullCacher):
+                self.assertEquals({"akey": None, "bkey": None, "ckey": None}, result)
+            else:
+                self.assertEquals({"akey": ["1", "2", "3", ], "bkey": {"a": 1}, "ckey": None}, result)
+
+            result = yield cacher.setMultiple({})
+            self.assertTrue(result)
+
     @inlineCallbacks
     def test_delete(self):
 
@@ -203,3 +247,98 @@ class MemcacherTestCase(TestCase):
         # Value limits
         result = yield cacher.set("*", "*" * (Memcacher.MEMCACHE_VALUE_LIMIT + 10))
         self.assertFalse(result)
+
+    @inlineCallbacks
+    def test_localCache(self):
+        """
+        Test that values are served from the in-process cache once read or written, and
+        that changes made via the L{Memcacher} invalidate them.
+        """
+
+        self.patch(config.Memcached.Pools.Default, "ClientEnabled", True)
+        self.patch(config.Memcached.LocalCache, "Enabled", True)
+        self.patch(config.Memcached.LocalCache, "Namespaces", {"testing": {"Size": 2, "TTL": 60}})
+        self.patch(Memcacher, "localCacheInstances", {})
+        self.patch(Memcacher, "_lastLocalCacheHits", 0)
+        self.patch(Memcacher, "_lastLocalCacheMisses", 0)
+
+        cacher = Memcacher("testing", pickle=True)
+        cacher._memcacheProtocol = Memcacher.memoryCacher()
+
+        result = yield cacher.set("akey", ["1", "2", ])
+        self.assertTrue(result)
+
+        # A new request checks the generation token before using the local cache
+        Memcacher.revalidateLocalCaches()
+        result = yield cacher.get("akey")
+        self.assertEquals(result, ["1", "2", ])
+
+        # Change the memcached value directly, without changing the generation token
+        yield cacher._memcacheProtocol.set("testing:%s" % (cacher._normalizeKey("akey"),), cPickle.dumps(["3"]))
+        result = yield cacher.get("akey")
+        self.assertEquals(result, ["1", "2", ])
+        result = yield cacher.getMultiple(["akey", "bkey"])
+        self.assertEquals(result, {"akey": ["1", "2", ], "bkey": None})
+        self.assertEquals(Memcacher.localCacheStats(), {"testing": {"size": 1, "hits": 3, "misses": 1}})
+        self.assertEquals(Memcacher.localCacheStatsSinceLast(), (3, 1, 1,))
+        self.assertEquals(Memcacher.localCacheStatsSinceLast(), (0, 0, 1,))
+
+        # Changes via the cacher are seen immediately
+        yield cacher.delete("akey")
+        result = yield cacher.get("akey")
+        self.assertEquals(result, None)
+
+        # Least recently used entries are removed
+        yield cacher.set("akey", "a")
+        yield cacher.set("bkey", "b")
+        yield cacher.get("akey")
+        yield cacher.set("ckey", "c")
+        self.assertEquals(Memcacher.localCacheStats()["testing"]["size"], 2)
+        self.assertEquals(cacher._getLocalCache().get("testing:%s" % (cacher._normalizeKey("bkey"),)), (False, None,))
+
+    @inlineCallbacks
+    def test_localCacheOtherProcess(self):
+        """
+        Test that a delete made via a L{Memcacher} in another process is seen once a new
+        request has started, and that filling the cache in another process does not discard
+        locally cached values.
+        """
+
+        self.patch(config.Memcached.Pools.Default, "ClientEnabled", True)
+        self.patch(config.Memcached.LocalCache, "Enabled", True)
+        self.patch(config.Memcached.LocalCache, "Namespaces", {"testing": {"Size": 10, "TTL": 60}})
+        self.patch(Memcacher, "localCacheInstances", {})
+
+        memcached = Memcacher.memoryCacher()
+        cacher = Memcacher("testing", pickle=True)
+        cacher._memcacheProtocol = memcached
+
+        # The other process has its own local cache
+        other = Memcacher("testing", pickle=True)
+        other._memcacheProtocol = memcached
+        other._localCache = Memcacher.localCacher(10, 60)
+
+        yield cacher.set("akey", "1")
+        Memcacher.revalidateLocalCaches()
+        result = yield cacher.get("akey")
+        self.assertEquals(result, "1")
+
+        # Filling the cache does not change the generation token
+        yield other.set("bkey", "1")
+        Memcacher.revalidateLocalCaches()
+        yield cacher._validateLocal(cacher._getLocalCache())
+        self.assertTrue(cacher._getLocalCache().get("testing:%s" % (cacher._normalizeKey("akey"),))[0])
+
+        yield other.delete("akey")
+        yield other.set("akey", "2")
+
+        # Still the same request
+        result = yield cacher.get("akey")
+        self.assertEquals(result, "1")
+
+        # A new request sees the change
+        Memcacher.revalidateLocalCaches()
+        result = yield cacher.get("akey")
+        self.assertEquals(result, "2")
+        result = yield cacher.getMultiple(["akey"])
+        self.assertEquals(result, {"akey": "2"})
@@ -448,6 +448,9 @@ class InMemoryMemcacheProtocol(object):
 
         return succeed(self._cache[key])
 
+    def getMultiple(self, keys):
+        return succeed(dict([(key, self._cache.get(key, (0, None))) for key in keys]))
+
     def _timeoutKey(self, expireTime, key):
         def _removeKey():
             del self._cache[key]
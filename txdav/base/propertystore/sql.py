@@ -37,6 +37,8 @@ from txdav.base.propertystore.base import (AbstractPropertyStore,
 
 from twisted.internet.defer import inlineCallbacks, returnValue
 
+from collections import OrderedDict
+
 
 prop = schema.RESOURCE_PROPERTY
 
@@ -51,6 +53,18 @@ class PropertyStore(AbstractPropertyStore):
 
     _cacher = Memcacher("SQL.props", pickle=True, key_normalization=False)
 
+    # Parsed property values keyed by their XML text, shared by all stores in this
+    # process. Values are held as text (which is also what goes to memcache) and would
+    # otherwise be parsed again on every read, and many resources have identical values.
+    # Only small values are kept, and callers always get a duplicate of the parsed value.
+    _parsedValues = OrderedDict()
+    _parsedValuesSize = 2000
+    _parsedValueMaxLength = 4096
+
+    # Maximum number of resources whose properties are fetched from memcache, and from
+    # the database on a cache miss, in one request when loading multiple stores.
+    _multipleBatchSize = 500
+
     def __init__(self, *a, **kw):
         raise NotImplementedError(
             "do not construct directly, call PropertyStore.load()"
@@ -72,6 +86,20 @@ class PropertyStore(AbstractPropertyStore):
     def _cacheToken(self, userid):
         return "{0!s}/{1}".format(self._resourceID, userid)
 
+    def _cacheUsers(self):
+        """
+        The uids whose per-user properties are loaded into this store, in the
+        order L{_refresh} loads them.
+
+        @rtype: C{list} of C{str}
+        """
+        uids = [self._defaultUser]
+        if self._perUser != self._defaultUser:
+            uids.append(self._perUser)
+        if self._proxyUser != self._perUser and self._proxyUser not in uids:
+            uids.append(self._proxyUser)
+        return uids
+
     @inlineCallbacks
     def _refresh(self, txn):
         """
@@ -112,12 +140,9 @@ class PropertyStore(AbstractPropertyStore):
             for name, value in rows:
                 self._cached[(name, uid)] = value
 
-        # Cache for the owner first, then the sharee if different
-        yield _cache_user_props(self._defaultUser)
-        if self._perUser != self._defaultUser:
-            yield _cache_user_props(self._perUser)
-        if self._proxyUser != self._perUser:
-            yield _cache_user_props(self._proxyUser)
+        # Cache for the owner first, then the sharee and proxy if different
+        for uid in self._cacheUsers():
+            yield _cache_user_props(uid)
 
     @classmethod
     @inlineCallbacks
@@ -168,6 +193,17 @@ class PropertyStore(AbstractPropertyStore):
             value taken from C{childColumn}) to a L{PropertyStore} for that ID.
         """
         childTable = TableSyntax(childColumn.model.table)
+        if txn.store().queryCachingEnabled():
+            rows = yield Select(
+                [childColumn],
+                From=childTable,
+                Where=parentColumn == parentID
+            ).on(txn)
+            stores = yield cls._loadMultipleCached(
+                defaultUser, shareeUser, proxyUser, txn, [row[0] for row in rows]
+            )
+            returnValue(stores)
+
         query = Select([
             childColumn,
             # XXX is that column necessary?  as per the 'on' clause it has to be
@@ -183,7 +219,7 @@ class PropertyStore(AbstractPropertyStore):
 
     @classmethod
     @inlineCallbacks
-    def forMultipleResourcesWithResourceIDs(cls, defaultUser, shareeUser, proxyUser, txn, resourceIDs):
+    def forMultipleResourcesWithResourceIDs(cls, defaultUser, shareeUser, proxyUser, txn, resourceIDs, defaultUsers=None):
         """
         Load all property stores for all specified resources.  This is used
         to optimize Depth:1 operations on that collection, by loading all
@@ -203,9 +239,19 @@ class PropertyStore(AbstractPropertyStore):
 
         @param resourceIDs: The set of resource ID's to query.
 
+        @param defaultUsers: the UIDs of the users who own any of the resources
+            when that is not C{defaultUser}, i.e. the default user the stores
+            for those resources will be switched to.
+
+        @type defaultUsers: C{dict} mapping resource ID to C{str}
+
         @return: a L{Deferred} that fires with a C{dict} mapping resource ID (a
             value taken from C{childColumn}) to a L{PropertyStore} for that ID.
         """
+        if txn.store().queryCachingEnabled():
+            stores = yield cls._loadMultipleCached(defaultUser, shareeUser, proxyUser, txn, resourceIDs, defaultUsers)
+            returnValue(stores)
+
         query = Select([
             prop.RESOURCE_ID, prop.NAME, prop.VIEWER_UID, prop.VALUE],
             From=prop,
@@ -226,6 +272,93 @@ class PropertyStore(AbstractPropertyStore):
 
         returnValue(stores)
 
+    @classmethod
+    @inlineCallbacks
+    def _loadMultipleCached(cls, defaultUser, shareeUser, proxyUser, txn, resourceIDs, defaultUsers=None):
+        """
+        Load the property stores for the specified resources using the same
+        memcache entries as L{_refresh}. The cached per-user properties of a batch
+        of resources are fetched with one memcache request, then the properties
+        of any resources not fully cached are fetched with one SQL query and
+        written back to memcache with one more request.
+
+        @param txn: the transaction within which to fetch any rows.
+        @type txn: L{IAsyncTransaction}
+
+        @param resourceIDs: The resource ID's to load.
+        @type resourceIDs: C{list} of C{int}
+
+        @param defaultUsers: the default user to switch to for some resources.
+        @type defaultUsers: C{dict} mapping resource ID to C{str}
+
+        @return: a L{Deferred} that fires with a C{dict} mapping resource ID to
+            a L{PropertyStore} for that ID.
+        """
+        stores = {}
+        for resourceID in resourceIDs:
+            store = cls.__new__(cls)
+            super(PropertyStore, store).__init__(defaultUser, shareeUser, proxyUser)
+            store._txn = txn
+            store._resourceID = resourceID
+            store._cached = {}
+            if defaultUsers and resourceID in defaultUsers:
+                store._setDefaultUserUID(defaultUsers[resourceID])
+            stores[resourceID] = store
+
+        resourceIDs = stores.keys()
+        for i in range(0, len(resourceIDs), cls._multipleBatchSize):
+            batch = [stores[resourceID] for resourceID in resourceIDs[i:i + cls._multipleBatchSize]]
+
+            # Look for memcache entries first
+            keys = [str(batchStore._resourceID) for batchStore in batch]
+            keys.extend([batchStore._cacheToken(uid) for batchStore in batch for uid in batchStore._cacheUsers()])
+            cached = yield cls._cacher.getMultiple(keys)
+
+            missing = {}
+            for store in batch:
+                uids = store._cacheUsers()
+                valid_cached_users = cached[str(store._resourceID)] or set()
+                userRows = [cached[store._cacheToken(uid)] if uid in valid_cached_users else None for uid in uids]
+                if None in userRows:
+                    missing[store._resourceID] = valid_cached_users
+                    continue
+                for uid, rows in zip(uids, userRows):
+                    for name, value in rows:
+                        store._cached[(name, uid)] = value
+
+            if not missing:
+                continue
+
+            # Fetch the resources that are not fully cached from SQL DB and cache
+            userRows = {}
+            for resourceID in missing:
+                for uid in stores[resourceID]._cacheUsers():
+                    userRows[(resourceID, uid)] = []
+            uids = list(set([uid for _ignore_resourceID, uid in userRows]))
+            rows = yield Select(
+                [prop.RESOURCE_ID, prop.NAME, prop.VIEWER_UID, prop.VALUE],
+                From=prop,
+                Where=prop.RESOURCE_ID.In(Parameter("resourceIDs", len(missing))).And(
+                    prop.VIEWER_UID.In(Parameter("viewerIDs", len(uids))))
+            ).on(txn, resourceIDs=missing.keys(), viewerIDs=uids)
+
+            for resourceID, name, uid, value in rows:
+                if (resourceID, uid) in userRows:
+                    stores[resourceID]._cached[(name, uid)] = value
+                    userRows[(resourceID, uid)].append((name, value))
+
+            values = {}
+            for resourceID, valid_cached_users in missing.items():
+                store = stores[resourceID]
+                for uid in store._cacheUsers():
+                    values[store._cacheToken(uid)] = userRows[(resourceID, uid)]
+
+                # Mark these uids as valid
+                values[str(resourceID)] = set(valid_cached_users) | set(store._cacheUsers())
+            yield cls._cacher.setMultiple(values)
+
+        returnValue(stores)
+
     @classmethod
     def _createMultipleStores(cls, defaultUser, shareeUser, proxyUser, txn, rows):
         """
@@ -266,7 +399,32 @@ class PropertyStore(AbstractPropertyStore):
         except KeyError:
             raise KeyError(key)
 
-        return WebDAVDocument.fromString(value).root_element
+        return self._parseValue(value)
+
+    @classmethod
+    def _parseValue(cls, value):
+        """
+        Parse the XML text of a property value, using the parsed value cache.
+
+        @param value: the XML text
+        @type value: C{str}
+
+        @return: the parsed value
+        @rtype: L{WebDAVElement}
+        """
+        if len(value) > cls._parsedValueMaxLength:
+            return WebDAVDocument.fromString(value).root_element
+
+        try:
+            parsed = cls._parsedValues.pop(value)
+        except KeyError:
+            parsed = WebDAVDocument.fromString(value).root_element
+            while len(cls._parsedValues) >= cls._parsedValuesSize:
+                cls._parsedValues.popitem(last=False)
+
+        # Re-insert to make this the most recently used entry
+        cls._parsedValues[value] = parsed
+        return parsed.duplicate()
 
     _updateQuery = Update({prop.VALUE: Parameter("value")},
                           Where=(
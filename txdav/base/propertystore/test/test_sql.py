@@ -236,6 +236,71 @@ class PropertyStoreTest(PropertyStoreTest):
         yield store1_user1.__setitem__(pname, pvalue)
         self.assertEqual(store1_user1[pname], pvalue)
 
+    @inlineCallbacks
+    def test_parsedValues(self):
+        """
+        Property values read from the store are parsed once, and each read
+        returns a separate copy of the parsed value.
+        """
+        store1_user1 = yield PropertyStore.load("user01", None, None, self._txn, 2)
+
+        pname = propertyName("dummy1")
+        pvalue = propertyValue("value1-user1")
+        yield store1_user1.__setitem__(pname, pvalue)
+
+        PropertyStore._parsedValues.clear()
+        value1 = store1_user1[pname]
+        self.assertEqual(value1, pvalue)
+        self.assertEqual(PropertyStore._parsedValues.values(), [pvalue])
+
+        value2 = store1_user1[pname]
+        self.assertEqual(value2, pvalue)
+        self.assertTrue(value1 is not value2)
+        self.assertTrue(value2 is not PropertyStore._parsedValues.values()[0])
+        self.assertEqual(len(PropertyStore._parsedValues), 1)
+
+    @inlineCallbacks
+    def test_forMultipleResourcesCached(self):
+        """
+        L{PropertyStore.forMultipleResourcesWithResourceIDs} loads the per-user
+        properties of each resource into memcache, and uses them from there when
+        loading again.
+        """
+        pname = propertyName("dummy1")
+        pvalue1 = propertyValue("value1-user1")
+        pvalue2 = propertyValue("value1-user2")
+
+        store20_user2 = yield PropertyStore.load("user01", "user02", None, self._txn, 20)
+        yield store20_user2.__setitem__(pname, pvalue2)
+        store21_user3 = yield PropertyStore.load("user03", None, None, self._txn, 21)
+        yield store21_user3.__setitem__(pname, pvalue1)
+        store21_user2 = yield PropertyStore.load("user03", "user02", None, self._txn, 21)
+        yield store21_user2.__setitem__(pname, pvalue2)
+        yield self._txn.commit()
+
+        for _ignore in range(2):
+            self._txn = self.store.newTransaction()
+            stores = yield PropertyStore.forMultipleResourcesWithResourceIDs(
+                "user01", "user02", None, self._txn, [20, 21, 22], defaultUsers={21: "user03"}
+            )
+            self.assertEqual(set(stores.keys()), set([20, 21, 22]))
+            self.assertEqual(stores[20][pname], pvalue2)
+            self.assertEqual(stores[21][pname], pvalue2)
+            self.assertEqual(stores[21]._getitem_uid(pname, "user03"), pvalue1)
+            self.assertTrue(pname not in stores[22])
+            self.assertTrue("SQL.props:20/user02" in PropertyStore._cacher._memcacheProtocol._cache)
+            self.assertTrue("SQL.props:21/user03" in PropertyStore._cacher._memcacheProtocol._cache)
+            self.assertTrue("SQL.props:22/user02" in PropertyStore._cacher._memcacheProtocol._cache)
+            yield self._txn.commit()
+
+        # Cached values are used
+        yield PropertyStore._cacher.set("20/user02", [])
+        self._txn = self.store.newTransaction()
+        stores = yield PropertyStore.forMultipleResourcesWithResourceIDs(
+            "user01", "user02", None, self._txn, [20]
+        )
+        self.assertTrue(pname not in stores[20])
+
     @inlineCallbacks
     def test_cacher_failure(self):
         """
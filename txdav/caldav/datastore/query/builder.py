@@ -31,11 +31,15 @@ __all__ = [
 
 # SQL Index column (field) names
 
-def buildExpression(filter, fields):
+def buildExpression(filter, fields, superset=False):
     """
     Convert the supplied calendar-query into an expression tree.
 
     @param filter: the L{Filter} for the calendar-query to convert.
+    @param superset: if C{True}, parts of the filter that cannot be expressed are
+        treated as matching everything rather than raising C{ValueError}, so the
+        expression matches a superset of the resources the filter matches.
+    @type superset: C{bool}
     @return: a L{baseExpression} for the expression tree.
     """
 
@@ -52,15 +56,50 @@ def buildExpression(filter, fields):
         logical = expression.andExpression if vcalfilter.filter_test == "allof" else expression.orExpression
 
         # Only comp-filters are handled
-        for _ignore in [x for x in vcalfilter.filters if not isinstance(x, ComponentFilter)]:
-            raise ValueError
-
-        return compfilterListExpression(vcalfilter.filters, fields, logical)
+        result = combineExpressions([
+            compfilterExpression(x, fields, superset) if isinstance(x, ComponentFilter) else unsupportedExpression(superset)
+            for x in vcalfilter.filters
+        ], logical)
+        return result if result is not None else expression.allExpression()
     else:
         return expression.allExpression()
 
 
-def compfilterListExpression(compfilters, fields, logical):
+def unsupportedExpression(superset):
+    """
+    Handle a part of a filter that cannot be expressed in SQL.
+
+    @param superset: whether a superset of the matching resources is acceptable.
+    @return: C{None}, which matches everything, when C{superset} is C{True}
+    @raise ValueError: when C{superset} is C{False}
+    """
+    if not superset:
+        raise ValueError
+    return None
+
+
+def combineExpressions(expressions, logical):
+    """
+    Combine a list of expressions using a logical expression. A C{None} item
+    is an expression that matches everything.
+
+    @param expressions: the C{list} of L{baseExpression} or C{None} to combine.
+    @param logical: L{expression.andExpression} or L{expression.orExpression}
+    @return: a L{baseExpression}, or C{None} if everything is matched.
+    """
+
+    if logical is expression.orExpression and None in expressions:
+        return None
+    expressions = [x for x in expressions if x is not None]
+    if len(expressions) > 1:
+        return logical(expressions)
+    elif len(expressions) == 1:
+        return expressions[0]
+    else:
+        return None
+
+
+def compfilterListExpression(compfilters, fields, logical, superset=False):
     """
     Create an expression for a list of comp-filter elements.
 
@@ -69,12 +108,12 @@ def compfilterListExpression(compfilters, fields, logical):
     """
 
     if len(compfilters) == 1:
-        return compfilterExpression(compfilters[0], fields)
+        return compfilterExpression(compfilters[0], fields, superset)
     else:
-        return logical([compfilterExpression(c, fields) for c in compfilters])
+        return combineExpressions([compfilterExpression(c, fields, superset) for c in compfilters], logical)
 
 
-def compfilterExpression(compfilter, fields):
+def compfilterExpression(compfilter, fields, superset=False):
     """
     Create an expression for a single comp-filter element.
 
@@ -104,48 +143,34 @@ def compfilterExpression(compfilter, fields):
     # Handle properties - we can only do UID right now
     props = []
     for p in [x for x in compfilter.filters if isinstance(x, PropertyFilter)]:
-        props.append(propfilterExpression(p, fields))
-    if len(props) > 1:
-        propsExpression = logical(props)
-    elif len(props) == 1:
-        propsExpression = props[0]
-    else:
-        propsExpression = None
+        props.append(propfilterExpression(p, fields, superset))
 
     # Handle embedded components - we do not right now as our Index does not handle them
     comps = []
     for _ignore in [x for x in compfilter.filters if isinstance(x, ComponentFilter)]:
-        raise ValueError
-    if len(comps) > 1:
-        compsExpression = logical(comps)
-    elif len(comps) == 1:
-        compsExpression = comps[0]
-    else:
-        compsExpression = None
+        comps.append(unsupportedExpression(superset))
 
     # Now build compound expression
-    if ((propsExpression is not None) and (compsExpression is not None)):
-        expressions.append(logical([propsExpression, compsExpression]))
-    elif propsExpression is not None:
-        expressions.append(propsExpression)
-    elif compsExpression is not None:
-        expressions.append(compsExpression)
+    filtersExpression = combineExpressions(props + comps, logical)
+    if filtersExpression is not None:
+        expressions.append(filtersExpression)
 
     # Now build return expression
     return expression.andExpression(expressions)
 
 
-def propfilterExpression(propfilter, fields):
+def propfilterExpression(propfilter, fields, superset=False):
     """
     Create an expression for a single prop-filter element.
 
     @param propfilter: the L{PropertyFilter} element.
-    @return: a L{baseExpression} for the expression tree.
+    @return: a L{baseExpression} for the expression tree, or C{None} if
+        everything is matched.
     """
 
     # Only handle UID right now
     if propfilter.filter_name != "UID":
-        raise ValueError
+        return unsupportedExpression(superset)
 
     # Handle is-not-defined case
     if not propfilter.defined:
@@ -157,7 +182,7 @@ def propfilterExpression(propfilter, fields):
 
     # Handle time-range - we cannot do this with our Index right now
     if propfilter.qualifier and isinstance(propfilter.qualifier, TimeRange):
-        raise ValueError
+        return unsupportedExpression(superset)
 
     # Handle text-match
     tm = None
@@ -175,23 +200,10 @@ def propfilterExpression(propfilter, fields):
     # Handle embedded parameters - we do not right now as our Index does not handle them
     params = []
     for _ignore in propfilter.filters:
-        raise ValueError
-    if len(params) > 1:
-        paramsExpression = logical(params)
-    elif len(params) == 1:
-        paramsExpression = params[0]
-    else:
-        paramsExpression = None
+        params.append(unsupportedExpression(superset))
 
     # Now build return expression
-    if (tm is not None) and (paramsExpression is not None):
-        return logical([tm, paramsExpression])
-    elif tm is not None:
-        return tm
-    elif paramsExpression is not None:
-        return paramsExpression
-    else:
-        return None
+    return combineExpressions(([tm] if tm is not None else []) + params, logical)
 
 
 def getTimerangeArguments(timerange):
@@ -14,7 +14,7 @@
 # limitations under the License.
 ##
 
-from twext.enterprise.dal.syntax import Select, Coalesce
+from twext.enterprise.dal.syntax import Select, Coalesce, Parameter
 
 from txdav.common.datastore.query import expression
 from txdav.common.datastore.query.generator import SQLQueryGenerator
@@ -41,8 +41,14 @@ class CalDAVSQLQueryGenerator(SQLQueryGenerator):
         @type expr: L{expression}
         @param collection: the resource targeted by the query
         @type collection: L{CommonHomeChild}
-        @param userid: user for whom query is being done - query will be scoped to that user's privileges and their per-user data
-        @type userid: C{str}
+        @param whereid: the resource-id of the calendar to restrict the query to, or a
+            C{list} of resource-ids to query multiple calendars at once, in which case
+            the calendar resource-id is returned as the first column
+        @type whereid: C{int} or C{list}
+        @param userid: user for whom query is being done - query will be scoped to that user's privileges and their per-user data.
+            When multiple calendars are being queried this can be a C{dict} mapping each user to the C{list} of
+            calendar resource-ids for which that user's per-user data is used. Each calendar must only appear once.
+        @type userid: C{str} or C{dict}
         @param freebusy: whether or not a freebusy query is being done - if it is, additional time range and peruser information is returned
         @type freebusy: C{bool}
         """
@@ -64,7 +70,11 @@ class CalDAVSQLQueryGenerator(SQLQueryGenerator):
         self.argcount = 0
         obj = self.collection._objectSchema
 
+        multiple = isinstance(self.whereid, (list, tuple,))
+
         columns = [obj.RESOURCE_NAME, obj.ICALENDAR_UID, obj.ICALENDAR_TYPE]
+        if multiple:
+            columns.insert(0, obj.CALENDAR_RESOURCE_ID)
         if self.freebusy:
             columns.extend([
                 obj.ORGANIZER,
@@ -79,7 +89,10 @@ class CalDAVSQLQueryGenerator(SQLQueryGenerator):
         # For SQL data DB we need to restrict the query to just the targeted calendar resource-id if provided
         if self.whereid:
 
-            test = expression.isExpression(obj.CALENDAR_RESOURCE_ID, self.whereid, True)
+            if multiple:
+                test = expression.inExpression(obj.CALENDAR_RESOURCE_ID, self.whereid, True)
+            else:
+                test = expression.isExpression(obj.CALENDAR_RESOURCE_ID, self.whereid, True)
 
             # Since timerange expression already have the calendar resource-id test in them, do not
             # add the additional term to those. When the additional term is added, add it as the first
@@ -128,7 +141,12 @@ class CalDAVSQLQueryGenerator(SQLQueryGenerator):
         where = self.generateExpression(self.expression)
 
         if self.usedtimerange:
-            where = where.And(self._timerange.CALENDAR_OBJECT_RESOURCE_ID == obj.RESOURCE_ID).And(self._timerange.CALENDAR_RESOURCE_ID == self.whereid)
+            if multiple:
+                argname = self.addArgument(self.whereid)
+                calendarTest = self._timerange.CALENDAR_RESOURCE_ID.In(Parameter(argname, len(self.whereid)))
+            else:
+                calendarTest = self._timerange.CALENDAR_RESOURCE_ID == self.whereid
+            where = where.And(self._timerange.CALENDAR_OBJECT_RESOURCE_ID == obj.RESOURCE_ID).And(calendarTest)
 
         # Set of tables depends on use of timespan and fb use
         if self.usedtimerange:
@@ -136,7 +154,7 @@ class CalDAVSQLQueryGenerator(SQLQueryGenerator):
                 tables = obj.join(
                     self._timerange.join(
                         self._peruser,
-                        on=(self._timerange.INSTANCE_ID == self._peruser.TIME_RANGE_INSTANCE_ID).And(self._peruser.USER_ID == self.userid),
+                        on=(self._timerange.INSTANCE_ID == self._peruser.TIME_RANGE_INSTANCE_ID).And(self._peruserTest()),
                         type="left outer"
                     ),
                     type=","
@@ -155,6 +173,21 @@ class CalDAVSQLQueryGenerator(SQLQueryGenerator):
 
         return select, self.arguments, self.usedtimerange
 
+    def _peruserTest(self):
+        """
+        Generate the expression that restricts the PERUSER join to the per-user data of
+        the user (or users) the query is being done for.
+        """
+        if not isinstance(self.userid, dict):
+            return self._peruser.USER_ID == self.userid
+
+        test = None
+        for userid, calendarIDs in sorted(self.userid.items()):
+            argname = self.addArgument(calendarIDs)
+            usertest = self._timerange.CALENDAR_RESOURCE_ID.In(Parameter(argname, len(calendarIDs))).And(self._peruser.USER_ID == userid)
+            test = usertest if test is None else test.Or(usertest)
+        return test
+
     def generateExpression(self, expr):
         """
         Generate an expression and all it's subexpressions.
@@ -72,6 +72,40 @@ class TestQueryFilter(TestCase):
         self.assertEqual(args, {"arg1": ("VEVENT", "VFREEBUSY", "VAVAILABILITY")})
         self.assertEqual(usedtimerange, False)
 
+    def test_query_superset(self):
+        """
+        Query test with a property filter that cannot be done in SQL - a superset
+        query ignores that part of the filter
+        """
+
+        filter = caldavxml.Filter(
+            caldavxml.ComponentFilter(
+                *[caldavxml.ComponentFilter(
+                    caldavxml.PropertyFilter(
+                        caldavxml.TextMatch.fromString("Meeting", False),
+                        name="SUMMARY",
+                    ),
+                    **{"name": "VEVENT"}
+                )],
+                **{"name": "VCALENDAR"}
+            )
+        )
+        filter = Filter(filter)
+        filter.child.settzinfo(Timezone(tzid="America/New_York"))
+
+        self.assertRaises(ValueError, buildExpression, filter, self._queryFields)
+
+        expression = buildExpression(filter, self._queryFields, superset=True)
+        sql = CalDAVSQLQueryGenerator(expression, self, 1234)
+        select, args, usedtimerange = sql.generate()
+
+        self.assertEqual(select.toSQL(), SQLFragment(
+            "select distinct RESOURCE_NAME, ICALENDAR_UID, ICALENDAR_TYPE from CALENDAR_OBJECT where CALENDAR_RESOURCE_ID = ? and ICALENDAR_TYPE = ?",
+            [1234, "VEVENT"]
+        ))
+        self.assertEqual(args, {})
+        self.assertEqual(usedtimerange, False)
+
     def test_query_timerange(self):
         """
         Basic query test - with time range
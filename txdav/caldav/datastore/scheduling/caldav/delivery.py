@@ -17,7 +17,8 @@
 from twext.python.log import Logger
 from txweb2.dav.http import ErrorResponse
 
-from twisted.internet.defer import inlineCallbacks, returnValue, succeed
+from twisted.internet.defer import inlineCallbacks, returnValue, succeed, \
+    DeferredList, DeferredSemaphore
 from twisted.logger import LogLevel
 from twisted.python.failure import Failure
 from txweb2 import responsecode
@@ -27,6 +28,7 @@ from twistedcaldav.caldavxml import caldav_namespace
 from twistedcaldav.config import config
 
 from txdav.base.propertystore.base import PropertyName
+from txdav.caldav.datastore.scheduling.cuaddress import LocalCalendarUser
 from txdav.caldav.datastore.scheduling.delivery import DeliveryService
 from txdav.caldav.datastore.scheduling.freebusy import FreebusyQuery
 from txdav.caldav.datastore.scheduling.itip import iTIPRequestStatus
@@ -51,6 +53,19 @@ __all__ = [
 log = Logger()
 
 
+class _PendingResponses(object):
+    """
+    Records the responses for a recipient being delivered to in its own transaction, so
+    that they can be added to the real responses once that transaction has committed.
+    """
+
+    def __init__(self):
+        self.added = []
+
+    def add(self, *args, **kwargs):
+        self.added.append((args, kwargs,))
+
+
 class ScheduleViaCalDAV(DeliveryService):
 
     def __init__(self, scheduler, recipients, responses, freebusy):
@@ -94,34 +109,172 @@ class ScheduleViaCalDAV(DeliveryService):
         organizerProp = self.scheduler.calendar.getOrganizerProperty()
         uid = self.scheduler.calendar.resourceUID()
 
-        # Freebusy needs to be optimized by doing multiple attendee in parallel if possible
+        # Freebusy is optimized by looking up the data for all attendees at once
         if self.freebusy:
             # Look for special delegate extended free-busy request
             use_extended_free_busy = self.scheduler.calendar.getExtendedFreeBusy() is not None
 
+            queries = []
             for recipient in self.recipients:
                 event_details = [] if use_extended_free_busy else None
 
                 # Check access controls - we do not do this right now. But if we ever implement access controls to
                 # determine which users can schedule with other users, here is where we would do that test.
-                yield self.generateFreeBusyResponse(recipient, self.responses, organizerProp, uid, event_details)
+                queries.append(self.freeBusyQuery(recipient, organizerProp, uid, event_details))
+
+            if len(queries) > 1:
+                try:
+                    yield FreebusyQuery.prefetchFreeBusy(queries)
+                except Exception as e:
+                    # Fall back to doing each recipient separately so errors are reported per-recipient
+                    log.error("Could not prefetch free busy information: {ex}", ex=e)
+                    for query in queries:
+                        query.prefetched = {}
+
+            for recipient, query in zip(self.recipients, queries):
+                yield self.generateFreeBusyResponse(recipient, self.responses, query)
+        elif self.deliverInParallel():
+            yield self.generateResponsesInParallel(self.responses)
         else:
             for recipient in self.recipients:
                 # Check access controls - we do not do this right now. But if we ever implement access controls to
                 # determine which users can schedule with other users, here is where we would do that test.
                 yield self.generateResponse(recipient, self.responses)
 
+    def deliverInParallel(self):
+        """
+        Determine whether each recipient of an organizer's message should be delivered to in its
+        own transaction, several at a time, rather than one after the other in the scheduler's
+        transaction.
+
+        @rtype: L{bool}
+        """
+        return (
+            config.Scheduling.Options.ParallelDelivery.Enabled and
+            self.scheduler.internal_request and
+            len(self.recipients) > 1 and
+            self.scheduler.calendar.propertyValue("METHOD") in ("REQUEST", "ADD", "CANCEL",) and
+            all([type(recipient) is LocalCalendarUser for recipient in self.recipients])
+        )
+
+    def generateResponsesInParallel(self, responses):
+        """
+        Deliver to each recipient in its own transaction, with at most
+        Scheduling.Options.ParallelDelivery.Concurrency of them running at once.
+
+        The organizer's transaction keeps its database connection while it waits for the
+        recipients' transactions, so the concurrency is capped at one less than
+        MaxDBConnectionsPerPool to leave that connection free; otherwise every pool connection
+        could be taken by a recipient transaction waiting behind the organizer's.
+
+        Each recipient's transaction commits before the organizer's transaction does. If the
+        organizer's transaction then fails, the work item is retried and the message is sent
+        again. L{generateResponseInTransaction} skips recipients whose inbox already has it.
+        """
+        concurrency = config.Scheduling.Options.ParallelDelivery.Concurrency
+        if config.MaxDBConnectionsPerPool > 0:
+            concurrency = min(concurrency, config.MaxDBConnectionsPerPool - 1)
+        semaphore = DeferredSemaphore(max(concurrency, 1))
+        return DeferredList([
+            semaphore.run(self.generateResponseInTransaction, recipient, responses)
+            for recipient in self.recipients
+        ], consumeErrors=True)
+
+    @inlineCallbacks
+    def generateResponseInTransaction(self, recipient, responses):
+        """
+        Deliver to one recipient in a new transaction. Failures in processing the message are
+        reported as usual. A failure to commit the transaction is reported as a pending
+        delivery, so that L{ScheduleOrganizerSendWork.retryPendingRecipients} or
+        L{ScheduleWorkMixin.checkTemporaryFailure} can retry it. A message that is already in
+        the recipient's inbox, from an earlier attempt, is reported as delivered without being
+        processed again.
+        """
+        txn = self.scheduler.txn.store().newTransaction(label="ScheduleViaCalDAV.generateResponseInTransaction")
+        pending = _PendingResponses()
+        try:
+            # The recipient's inbox has to be looked up again in the new transaction
+            inbox = None
+            recipient_home = yield txn.calendarHomeWithUID(recipient.record.uid, create=True)
+            if recipient_home is not None:
+                inbox = yield recipient_home.calendarWithName("inbox")
+            txnRecipient = LocalCalendarUser(recipient.cuaddr, recipient.record)
+            txnRecipient.inbox = inbox
+
+            message = self.scheduler.calendar.duplicate()
+            if recipient_home is not None and (yield self.alreadyDelivered(recipient_home, message)):
+                log.debug(
+                    "iTIP message for UID: '{uid}' already delivered to {cuaddr}",
+                    uid=message.resourceUID(), cuaddr=recipient.cuaddr,
+                )
+                pending.add(recipient.cuaddr, responsecode.OK, reqstatus=iTIPRequestStatus.MESSAGE_DELIVERED)
+            else:
+                yield self.generateResponse(txnRecipient, pending, txn=txn, message=message)
+            yield txn.commit()
+        except Exception as e:
+            log.error(
+                "Could not deliver iTIP message to {cuaddr}: {ex}",
+                cuaddr=recipient.cuaddr, ex=e,
+            )
+            yield txn.abort()
+            err = HTTPError(ErrorResponse(
+                responsecode.SERVICE_UNAVAILABLE,
+                (caldav_namespace, "recipient-permissions"),
+                "Could not deliver iTIP message",
+            ))
+            responses.add(recipient.cuaddr, Failure(exc_value=err), reqstatus=iTIPRequestStatus.MESSAGE_PENDING)
+        else:
+            for args, kwargs in pending.added:
+                responses.add(*args, **kwargs)
+
     @inlineCallbacks
-    def generateResponse(self, recipient, responses):
+    def alreadyDelivered(self, home, message):
+        """
+        Determine whether an inbox item in C{home} is this iTIP message, matching on METHOD, UID
+        and the SEQUENCE and DTSTAMP of its main component.
+
+        @param home: the recipient's calendar home
+        @type home: L{ICalendarHome}
+        @param message: the iTIP message
+        @type message: L{Component}
+
+        @rtype: L{bool}
+        """
+        signature = self._messageSignature(message)
+        resources = yield home.objectResourcesWithUID(message.resourceUID())
+        for resource in resources:
+            if resource.parentCollection().isInbox():
+                component = yield resource.component()
+                if self._messageSignature(component) == signature:
+                    returnValue(True)
+        returnValue(False)
+
+    @staticmethod
+    def _messageSignature(message):
+        main = message.mainComponent()
+        return (
+            message.propertyValue("METHOD"),
+            message.resourceUID(),
+            main.propertyValue("SEQUENCE"),
+            main.propertyValue("DTSTAMP"),
+        )
+
+    @inlineCallbacks
+    def generateResponse(self, recipient, responses, txn=None, message=None):
+        if txn is None:
+            txn = self.scheduler.txn
+        if message is None:
+            message = self.scheduler.calendar
+
         # Hash the iCalendar data for use as the last path element of the URI path
-        name = "{hash}-{r}.ics".format(hash=hashlib.md5(self.scheduler.calendar.resourceUID()).hexdigest(), r=str(uuid.uuid4())[:8],)
+        name = "{hash}-{r}.ics".format(hash=hashlib.md5(message.resourceUID()).hexdigest(), r=str(uuid.uuid4())[:8],)
 
         # Do implicit scheduling message processing.
         try:
             processor = ImplicitProcessor()
             _ignore_processed, autoprocessed, store_inbox, changes = (yield processor.doImplicitProcessing(
-                self.scheduler.txn,
-                self.scheduler.calendar,
+                txn,
+                message,
                 self.scheduler.originator,
                 recipient,
                 noAttendeeRefresh=self.scheduler.noAttendeeRefresh,
@@ -161,7 +314,7 @@ class ScheduleViaCalDAV(DeliveryService):
         if store_inbox:
             # Copy calendar to inbox
             try:
-                child = yield recipient.inbox._createCalendarObjectWithNameInternal(name, self.scheduler.calendar, ComponentUpdateState.INBOX)
+                child = yield recipient.inbox._createCalendarObjectWithNameInternal(name, message, ComponentUpdateState.INBOX)
             except Exception as e:
                 log.failure(
                     "Could not store data in inbox {inbox}: {error}",
@@ -190,25 +343,29 @@ class ScheduleViaCalDAV(DeliveryService):
                 self.scheduler.logItems["itip.auto"] = self.scheduler.logItems.get("itip.auto", 0) + 1
         returnValue(True)
 
-    @inlineCallbacks
-    def generateFreeBusyResponse(self, recipient, responses, organizerProp, uid, event_details):
+    def freeBusyQuery(self, recipient, organizerProp, uid, event_details):
 
         # Extract the ATTENDEE property matching current recipient from the calendar data
         cuas = recipient.record.calendarUserAddresses
         attendeeProp = self.scheduler.calendar.getAttendeeProperty(cuas)
 
+        return FreebusyQuery(
+            organizer=self.scheduler.organizer,
+            organizerProp=organizerProp,
+            recipient=recipient,
+            attendeeProp=attendeeProp,
+            uid=uid,
+            timerange=self.scheduler.timeRange,
+            excludeUID=self.scheduler.excludeUID,
+            logItems=self.scheduler.logItems,
+            event_details=event_details,
+        )
+
+    @inlineCallbacks
+    def generateFreeBusyResponse(self, recipient, responses, query):
+
         try:
-            fbresult = yield FreebusyQuery(
-                organizer=self.scheduler.organizer,
-                organizerProp=organizerProp,
-                recipient=recipient,
-                attendeeProp=attendeeProp,
-                uid=uid,
-                timerange=self.scheduler.timeRange,
-                excludeUID=self.scheduler.excludeUID,
-                logItems=self.scheduler.logItems,
-                event_details=event_details,
-            ).generateAttendeeFreeBusyResponse()
+            fbresult = yield query.generateAttendeeFreeBusyResponse()
         except Exception as e:
             log.failure(
                 "Could not determine free busy information for recipient {cuaddr}",
@@ -14,6 +14,9 @@
 # limitations under the License.
 ##
 
+from array import array
+from bisect import bisect_right
+
 from pycalendar.datetime import DateTime
 from pycalendar.duration import Duration
 from pycalendar.period import Period
@@ -39,23 +42,252 @@ from txdav.caldav.datastore.scheduling.cuaddress import LocalCalendarUser
 from txdav.common.icommondatastore import IndexedSearchException, \
     InternalDataStoreError
 
+import datetime
+import time
 import uuid
 from collections import namedtuple
 
 log = Logger()
 
+# Cached instance times are stored as minutes since the epoch, with any seconds
+# stored separately in the instance flags
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# Index of each fbtype value used in the instance flags
+_FBTYPE_CODES = "?FBUT"
+
+
+def _tupleToMinutes(tp):
+    """
+    Convert a L{tuple} produced by L{tupleFromDateTime} into minutes since the epoch
+    and the remaining seconds.
+    """
+    delta = datetime.datetime(*tp[:5]) - _EPOCH
+    return delta.days * 1440 + delta.seconds // 60, tp[5]
+
+
+def _minutesToTuple(minutes, seconds):
+    """
+    Convert minutes since the epoch and seconds into a L{tuple} as produced by
+    L{tupleFromDateTime}.
+    """
+    dt = _EPOCH + datetime.timedelta(minutes=minutes)
+    return (dt.year, dt.month, dt.day, dt.hour, dt.minute, seconds,)
+
+
+def _encodeFlags(float, fbtype, startSeconds, endSeconds):
+    return (1 if float == 'Y' else 0) | (_FBTYPE_CODES.index(fbtype) << 1) | (startSeconds << 4) | (endSeconds << 10)
+
+
+def _decodeFlags(flags):
+    return (
+        'Y' if flags & 1 else 'N',
+        _FBTYPE_CODES[(flags >> 1) & 0x07],
+        (flags >> 4) & 0x3F,
+        (flags >> 10) & 0x3F,
+    )
+
+
+def _mergePeriods(periods):
+    """
+    Merge a list of (start, end) integer pairs into a sorted list of non-overlapping pairs.
+    """
+    merged = []
+    for start, end in sorted(periods):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
 
 class FBCacheEntry(object):
+    """
+    A cached set of free busy results for a calendar. To keep entries small and quick to
+    unpickle, the results are stored in a compact form: the resource details are stored once,
+    each instance is packed into an integer array as (resource index, flags, start, end) with
+    times in minutes since the epoch, and the busy time of all the non-floating VEVENT
+    instances is pre-merged for each fbtype into a packed array of (start, end) pairs.
+    """
 
     CACHE_DAYS_FLOATING_ADJUST = 1
 
+    # Bump this whenever the encoding changes so that old entries are ignored
+    VERSION = 2
+
     fbcacher = Memcacher("FBCache", pickle=True)
 
     def __init__(self, key, token, timerange, fbresults):
         self.key = key
         self.token = token
         self.timerange = timerange.getText()
-        self.fbresults = fbresults
+        self.version = self.VERSION
+        self.encode(fbresults)
+
+    def encode(self, fbresults):
+        """
+        Encode the aggregated resources of a free busy query.
+
+        @param fbresults: the aggregated resources
+        @type fbresults: C{dict}
+        """
+
+        resources = []
+        others = []
+        instances = array("i")
+        busy = {}
+        for key, values in fbresults.iteritems():
+            index = len(resources)
+            resources.append(key)
+
+            # Only VEVENTs with a known fbtype can use the pre-merged busy time
+            shortcut = key[2] == "VEVENT" and values[0][3] != '?'
+            if not shortcut:
+                others.append(index)
+
+            for float, start, end, fbtype in values:
+                startMinutes, startSeconds = _tupleToMinutes(start)
+                endMinutes, endSeconds = _tupleToMinutes(end)
+                instances.extend((index, _encodeFlags(float, fbtype, startSeconds, endSeconds), startMinutes, endMinutes,))
+                if shortcut and self._mergeable(float, fbtype, startSeconds, endSeconds):
+                    busy.setdefault(fbtype, []).append((startMinutes, endMinutes,))
+
+        self.resources = resources
+        self.others = others
+        self.instances = instances.tostring()
+        self.busy = {}
+        for fbtype, periods in busy.items():
+            packed = array("i")
+            for period in _mergePeriods(periods):
+                packed.extend(period)
+            self.busy[fbtype] = packed.tostring()
+
+    @staticmethod
+    def _mergeable(float, fbtype, startSeconds, endSeconds):
+        """
+        Floating instances depend on the calendar timezone at the time of the request and
+        instances with seconds cannot be stored in minutes, so those are always matched
+        individually.
+        """
+        return float == 'N' and fbtype not in ('F', '?') and startSeconds == 0 and endSeconds == 0
+
+    def size(self):
+        """
+        Approximate size of the encoded data.
+        """
+        return len(self.instances) + sum(map(len, self.busy.values())) + sum([sum(map(len, filter(None, key))) for key in self.resources])
+
+    def hasUID(self, uid):
+        return uid is not None and any([key[1] == uid for key in self.resources])
+
+    def fbresults(self, indexes=None):
+        """
+        Decode the entry back into aggregated resources.
+
+        @param indexes: resource indexes to decode, or C{None} for all resources
+        @type indexes: C{list}
+
+        @return: the aggregated resources
+        @rtype: C{dict}
+        """
+
+        if indexes is not None:
+            indexes = set(indexes)
+            if not indexes:
+                return {}
+        instances = array("i")
+        instances.fromstring(self.instances)
+        results = {}
+        for offset in xrange(0, len(instances), 4):
+            index, flags, start, end = instances[offset:offset + 4]
+            if indexes is not None and index not in indexes:
+                continue
+            float, fbtype, startSeconds, endSeconds = _decodeFlags(flags)
+            results.setdefault(self.resources[index], []).append((
+                float,
+                _minutesToTuple(start, startSeconds),
+                _minutesToTuple(end, endSeconds),
+                fbtype,
+            ))
+        return results
+
+    def match(self, timerange, tzinfo):
+        """
+        Match the VEVENTs with a known fbtype against a time range, using the pre-merged
+        busy time for the non-floating instances. Resources that cannot be matched this way
+        need to be processed individually via L{fbresults}.
+
+        @param timerange: the UTC time range to match
+        @type timerange: L{Period}
+        @param tzinfo: the timezone to use for floating instances
+        @type tzinfo: L{Timezone}
+
+        @return: a C{tuple} of the C{dict} of busy periods keyed by fbtype, the number of
+            matched resources, and the C{list} of resource indexes not processed
+        @rtype: C{tuple}
+        """
+
+        rangeStartMinutes, rangeStartSeconds = _tupleToMinutes(tupleFromDateTime(normalizeToUTC(timerange.getStart())))
+        rangeEndMinutes, rangeEndSeconds = _tupleToMinutes(tupleFromDateTime(normalizeToUTC(timerange.getEnd())))
+        rangeStart = rangeStartMinutes * 60 + rangeStartSeconds
+        rangeEnd = rangeEndMinutes * 60 + rangeEndSeconds
+
+        others = set(self.others)
+        matched = set()
+        busy = {}
+
+        # Look at each instance to count the matched resources, and to clip any instance
+        # not included in the pre-merged busy time
+        instances = array("i")
+        instances.fromstring(self.instances)
+        for offset in xrange(0, len(instances), 4):
+            index, flags, start, end = instances[offset:offset + 4]
+            if index in others:
+                continue
+            float, fbtype, startSeconds, endSeconds = _decodeFlags(flags)
+
+            # Ignore free time or unknown
+            if fbtype in ('F', '?'):
+                continue
+
+            if float == 'N':
+                start = start * 60 + startSeconds
+                end = end * 60 + endSeconds
+                if max(start, rangeStart) >= min(end, rangeEnd):
+                    continue
+                matched.add(index)
+                if self._mergeable(float, fbtype, startSeconds, endSeconds):
+                    continue
+                fbstart = tupleToDateTime(_minutesToTuple(start // 60, startSeconds), withTimezone=Timezone.UTCTimezone)
+                fbend = tupleToDateTime(_minutesToTuple(end // 60, endSeconds), withTimezone=Timezone.UTCTimezone)
+            else:
+                fbstart = tupleToDateTime(_minutesToTuple(start, startSeconds), withTimezone=tzinfo)
+                fbend = tupleToDateTime(_minutesToTuple(end, endSeconds), withTimezone=tzinfo)
+
+            clipped = clipPeriod(Period(fbstart, end=fbend), timerange)
+            if clipped:
+                clipped.setUseDuration(True)
+                matched.add(index)
+                busy.setdefault(fbtype, []).append(clipped)
+
+        # Add the pre-merged busy time overlapping the time range
+        for fbtype, packed in self.busy.items():
+            periods = array("i")
+            periods.fromstring(packed)
+            offset = bisect_right(periods[1::2], rangeStart // 60) * 2
+            for offset in xrange(offset, len(periods), 2):
+                start, end = periods[offset], periods[offset + 1]
+                if start * 60 >= rangeEnd:
+                    break
+                fbstart = tupleToDateTime(_minutesToTuple(start, 0), withTimezone=Timezone.UTCTimezone)
+                fbend = tupleToDateTime(_minutesToTuple(end, 0), withTimezone=Timezone.UTCTimezone)
+                clipped = clipPeriod(Period(fbstart, end=fbend), timerange)
+                if clipped:
+                    clipped.setUseDuration(True)
+                    busy.setdefault(fbtype, []).append(clipped)
+
+        return busy, len(matched), self.others
 
     @classmethod
     @inlineCallbacks
@@ -65,6 +297,49 @@ class FBCacheEntry(object):
         token = (yield calresource.syncToken())
         entry = (yield cls.fbcacher.get(key))
 
+        returnValue(cls._validEntryResults(entry, token, timerange))
+
+    @classmethod
+    @inlineCallbacks
+    def getCacheEntries(cls, calresources, timerange):
+        """
+        Get the cached results for a set of calendars, using a single query for the
+        calendar sync tokens and a single cache request for the entries.
+
+        @param calresources: the calendars and the user each is being looked up for
+        @type calresources: C{list} of C{tuple} of (L{Calendar}, C{str})
+
+        @return: a C{dict} mapping (user uid, calendar resource-id) to the L{FBCacheEntry},
+            or C{None} if there is no valid cache entry for that calendar
+        """
+
+        # Pre-load sync tokens for all calendars in one query
+        missing = dict([(calresource.id(), calresource) for calresource, _ignore_useruid in calresources if calresource._syncTokenRevision is None])
+        if len(missing) > 1:
+            calresource = missing.values()[0]
+            revisions = (yield calresource.childSyncTokenRevisions(calresource.viewerHome(), missing.keys()))
+            for calresource, _ignore_useruid in calresources:
+                if calresource.id() in revisions:
+                    calresource._syncTokenRevision = revisions[calresource.id()]
+
+        keys = dict([(str(calresource.id()) + "/" + useruid, (calresource, useruid,)) for calresource, useruid in calresources])
+        entries = (yield cls.fbcacher.getMultiple(keys.keys()))
+
+        results = {}
+        for key, (calresource, useruid) in keys.items():
+            token = (yield calresource.syncToken())
+            results[(useruid, calresource.id())] = cls._validEntryResults(entries.get(key), token, timerange)
+
+        returnValue(results)
+
+    @classmethod
+    def _validEntryResults(cls, entry, token, timerange):
+        """
+        Check that a cache entry covers the requested time range and is still valid.
+
+        @return: the L{FBCacheEntry} or C{None}
+        """
+
         if entry:
 
             # Offset one day at either end to account for floating
@@ -76,10 +351,10 @@ class FBCacheEntry(object):
             if compareDateTime(timerange.getEnd(), cached_end) <= 0 and compareDateTime(timerange.getStart(), cached_start) >= 0:
 
                 # Verify that cached entry is still valid
-                if token == entry.token:
-                    returnValue(entry.fbresults)
+                if token == entry.token and getattr(entry, "version", None) == cls.VERSION:
+                    return entry
 
-        returnValue(None)
+        return None
 
     @classmethod
     @inlineCallbacks
@@ -100,6 +375,9 @@ class FreebusyQuery(object):
     FBInfo_mapper = {"BUSY": "busy", "BUSY-TENTATIVE": "tentative", "BUSY-UNAVAILABLE": "unavailable"}
     FBInfo_index_mapper = {'B': "busy", 'T': "tentative", 'U': "unavailable"}
 
+    # Resource key used for the busy periods of a calendar busy timeline
+    TIMELINE_RESOURCE = ("", "", "VEVENT", "",)
+
     def __init__(
         self,
         organizer=None, organizerProp=None, recipient=None, attendeeProp=None,
@@ -190,6 +468,47 @@ class FreebusyQuery(object):
                 if config.Scheduling.Options.RoomResourceRichFreeBusy and self.attendee_record.getCUType() in ("RESOURCE", "ROOM",):
                     self.rich_options["resource"] = True
 
+    @inlineCallbacks
+    def freeBusySet(self):
+        """
+        Get the recipient's calendars that are used for free busy.
+
+        @return: the calendars
+        @rtype: C{list} of L{Calendar}
+        """
+        if not hasattr(self, "fbset"):
+            fbset = (yield self.recipient.inbox.ownerHome().loadCalendars())
+            self.fbset = [calendar for calendar in fbset if calendar.isUsedForFreeBusy()]
+        returnValue(self.fbset)
+
+    @classmethod
+    @inlineCallbacks
+    def prefetchFreeBusy(cls, queries):
+        """
+        Look up the free busy data for the internal free busy calendars of a set of
+        attendees all at once, so that the number of cache requests and DB queries
+        does not depend on the number of attendees. The results are stored on each
+        query and used when L{generateAttendeeFreeBusyResponse} is later called.
+
+        @param queries: the queries to prefetch, which must all be for the same
+            time range
+        @type queries: C{list} of L{FreebusyQuery}
+        """
+
+        calresources = []
+        for query in queries:
+            if query.recipient is not None:
+                fbset = yield query.freeBusySet()
+                calresources.extend([(calendar, query.attendee_uid,) for calendar in fbset if not calendar.external()])
+
+        if calresources:
+            results = yield cls._matchMultipleResources(
+                calresources, queries[0].timerange, queries[0].accountingItems, queries[0].logItems,
+                useTimeline=all([query._canUseTimeline() for query in queries]),
+            )
+            for query in queries:
+                query.prefetched = results
+
     @inlineCallbacks
     def generateAttendeeFreeBusyResponse(self, fbset=None, method="REPLY"):
 
@@ -199,8 +518,7 @@ class FreebusyQuery(object):
         if self.recipient is not None:
             # Find the current recipients calendars that are not transparent
             if fbset is None:
-                fbset = (yield self.recipient.inbox.ownerHome().loadCalendars())
-                fbset = [calendar for calendar in fbset if calendar.isUsedForFreeBusy()]
+                fbset = yield self.freeBusySet()
 
             # Process the availability property from the Inbox.
             if hasattr(self.recipient, "inbox"):
@@ -381,6 +699,8 @@ class FreebusyQuery(object):
             self.accountingItems["fb-resources"] = {}
             for calid, result in results.items():
                 aggregated_resources, tzinfo, filter = result
+                if isinstance(aggregated_resources, FBCacheEntry):
+                    aggregated_resources = aggregated_resources.fbresults()
                 for k, v in aggregated_resources.items():
                     name, uid, comptype, test_organizer = k
                     self.accountingItems["fb-resources"][uid] = []
@@ -400,6 +720,27 @@ class FreebusyQuery(object):
         for calid, result in results.items():
             calresource = calidmap[calid]
             aggregated_resources, tzinfo, filter = result
+
+            if isinstance(aggregated_resources, FBCacheEntry):
+                # Use the pre-merged busy time unless each resource has to be checked
+                entry = aggregated_resources
+                decodeStart = time.time()
+                if any(self.rich_options.values()) or entry.hasUID(self.excludeuid):
+                    aggregated_resources = entry.fbresults()
+                else:
+                    busy, matched, others = entry.match(self.timerange, tzinfo)
+                    for fbtype, periods in busy.items():
+                        getattr(fbinfo, self.FBInfo_index_mapper.get(fbtype, "busy")).extend(periods)
+
+                    # Check size of results is within limit
+                    matchtotal += matched
+                    if matchtotal > config.MaxQueryWithDataResults:
+                        raise QueryMaxResources(config.MaxQueryWithDataResults, matchtotal)
+
+                    aggregated_resources = entry.fbresults(others)
+                if self.accountingItems is not None:
+                    self.accountingItems["fb-cache-decode"] = self.accountingItems.get("fb-cache-decode", 0.0) + (time.time() - decodeStart) * 1000.0
+
             for key in aggregated_resources.iterkeys():
 
                 name, uid, comptype, test_organizer = key
@@ -492,60 +833,201 @@ class FreebusyQuery(object):
     @inlineCallbacks
     def _matchResources(self, fbset):
         """
-        For now iterate over each calendar and collect the results. In the longer term we might want to consider
-        doing a single DB query in the case where multiple calendars need to be searched.
+        Collect the results for each calendar, using any results already looked up by
+        L{prefetchFreeBusy} and looking up the rest via L{_matchMultipleResources}.
 
         @param fbset: list of calendars to process
         @type fbset: L{list} of L{Calendar}
         """
 
+        prefetched = getattr(self, "prefetched", {})
         results = {}
+        missing = []
         for calresource in fbset:
-            aggregated_resources, tzinfo, filter = yield self._matchCalendarResources(calresource)
-            results[calresource.id()] = (aggregated_resources, tzinfo, filter,)
+            key = (self.attendee_uid, calresource.id(),)
+            if key in prefetched:
+                results[calresource.id()] = prefetched[key]
+            else:
+                missing.append(calresource)
+
+        if missing:
+            matched = yield self._matchMultipleResources(
+                [(calresource, self.attendee_uid,) for calresource in missing],
+                self.timerange, self.accountingItems, self.logItems,
+                useTimeline=self._canUseTimeline(),
+            )
+            for (_ignore_useruid, calid), result in matched.items():
+                results[calid] = result
 
         returnValue(results)
 
+    def _canUseTimeline(self):
+        """
+        Calendar busy timelines only have the merged busy time, so cannot be used when
+        events need to be excluded by UID or when extended details may be needed.
+        """
+        return self.excludeuid is None and self.event_details is None
+
+    @classmethod
     @inlineCallbacks
-    def _matchCalendarResources(self, calresource):
+    def _matchMultipleResources(cls, calresources, timerange, accountingItems=None, logItems=None, useTimeline=False):
+        """
+        Collect the results for a set of calendars, each being looked up for a specific user.
+        Cache entries for all the calendars are fetched with a single cache request, and the
+        calendars not in the cache are searched with a single DB query for each distinct
+        calendar timezone (typically just one).
 
-        # Get the timezone property from the collection.
-        tz = calresource.getTimezone()
+        @param calresources: the calendars and the user each is being looked up for
+        @type calresources: C{list} of C{tuple} of (L{Calendar}, C{str})
+        @param timerange: time range for freebusy request
+        @type timerange: L{Period}
+        @param logItems: items to add to logging
+        @type logItems: L{dict}
+        @param accountingItems: items to add to accounting logging
+        @type accountingItems: L{dict}
+        @param useTimeline: whether calendar busy timelines can be used
+        @type useTimeline: L{bool}
+
+        @return: a C{dict} mapping (user uid, calendar resource-id) to a C{tuple} of the
+            aggregated resources (or the L{FBCacheEntry} when cached), timezone and filter
+            for that calendar
+        """
+
+        results = {}
 
         # Try cache
-        aggregated_resources = (yield FBCacheEntry.getCacheEntry(calresource, self.attendee_uid, self.timerange)) if config.EnableFreeBusyCache else None
-
-        if aggregated_resources is None:
-
-            if self.accountingItems is not None:
-                self.accountingItems["fb-uncached"] = self.accountingItems.get("fb-uncached", 0) + 1
-
-            caching = False
-            if config.EnableFreeBusyCache:
-                # Log extended item
-                if self.logItems is not None:
-                    self.logItems["fb-uncached"] = self.logItems.get("fb-uncached", 0) + 1
-
-                # We want to cache a large range of time based on the current date
-                cache_start = normalizeToUTC(DateTime.getToday() + Duration(days=0 - config.FreeBusyCacheDaysBack))
-                cache_end = normalizeToUTC(DateTime.getToday() + Duration(days=config.FreeBusyCacheDaysForward))
-
-                # If the requested time range would fit in our allowed cache range, trigger the cache creation
-                if compareDateTime(self.timerange.getStart(), cache_start) >= 0 and compareDateTime(self.timerange.getEnd(), cache_end) <= 0:
-                    cache_timerange = Period(cache_start, cache_end)
-                    caching = True
-
-            #
-            # What we do is a fake calendar-query for VEVENT/VFREEBUSYs in the specified time-range.
-            # We then take those results and merge them into one VFREEBUSY component
-            # with appropriate FREEBUSY properties, and return that single item as iCal data.
-            #
-
-            # Create fake filter element to match time-range
-            tr = TimeRange(
-                start=(cache_timerange if caching else self.timerange).getStart().getText(),
-                end=(cache_timerange if caching else self.timerange).getEnd().getText(),
-            )
+        cached = (yield FBCacheEntry.getCacheEntries(calresources, timerange)) if config.EnableFreeBusyCache else {}
+
+        uncached = []
+        for calresource, useruid in calresources:
+            entry = cached.get((useruid, calresource.id(),))
+            if entry is None:
+                uncached.append((calresource, useruid,))
+                continue
+
+            if accountingItems is not None:
+                accountingItems["fb-cached"] = accountingItems.get("fb-cached", 0) + 1
+                accountingItems["fb-cache-size"] = accountingItems.get("fb-cache-size", 0) + entry.size()
+
+            # Log extended item
+            if logItems is not None:
+                logItems["fb-cached"] = logItems.get("fb-cached", 0) + 1
+
+            # Determine appropriate timezone (UTC is the default)
+            tz = calresource.getTimezone()
+            tzinfo = tz.gettimezone() if tz is not None else Timezone.UTCTimezone
+            results[(useruid, calresource.id(),)] = (entry, tzinfo, None,)
+
+        if uncached and useTimeline and config.EnableFreeBusyTimeline:
+            uncached = yield cls._matchBusyTimelines(uncached, timerange, results, accountingItems, logItems)
+
+        if uncached:
+            results.update((yield cls._matchCalendarResources(uncached, timerange, accountingItems, logItems)))
+
+        returnValue(results)
+
+    @classmethod
+    @inlineCallbacks
+    def _matchBusyTimelines(cls, calresources, timerange, results, accountingItems=None, logItems=None):
+        """
+        Use the busy timeline of each calendar being looked up for its owner, if the timeline
+        is up to date. The busy periods are returned as an L{FBCacheEntry} with a single
+        resource, so that they are processed in the same way as cached results. See
+        L{_matchMultipleResources} for argument description.
+
+        @param results: the results to add to
+        @type results: C{dict}
+
+        @return: the calendars that still need to be searched
+        @rtype: C{list}
+        """
+
+        owned = [calresource for calresource, useruid in calresources if useruid == calresource.ownerHome().uid()]
+        timelines = (yield owned[0].busyTimelines(owned, timerange)) if owned else {}
+
+        uncached = []
+        for calresource, useruid in calresources:
+            periods = timelines.get(calresource.id()) if useruid == calresource.ownerHome().uid() else None
+            if periods is None:
+                uncached.append((calresource, useruid,))
+                continue
+
+            if accountingItems is not None:
+                accountingItems["fb-timeline"] = accountingItems.get("fb-timeline", 0) + 1
+
+            # Log extended item
+            if logItems is not None:
+                logItems["fb-timeline"] = logItems.get("fb-timeline", 0) + 1
+
+            aggregated_resources = {}
+            if periods:
+                aggregated_resources[cls.TIMELINE_RESOURCE] = [
+                    ('N', tupleFromDateTime(start), tupleFromDateTime(end), fbtype,)
+                    for fbtype, start, end in periods
+                ]
+            entry = FBCacheEntry(None, None, timerange, aggregated_resources)
+            results[(useruid, calresource.id(),)] = (entry, Timezone.UTCTimezone, None,)
+
+        returnValue(uncached)
+
+    @classmethod
+    @inlineCallbacks
+    def _matchCalendarResources(cls, calresources, timerange, accountingItems=None, logItems=None):
+        """
+        Search a set of calendars for matching resources, and cache the results when the
+        time range is suitable. See L{_matchMultipleResources} for argument description.
+        """
+
+        if accountingItems is not None:
+            accountingItems["fb-uncached"] = accountingItems.get("fb-uncached", 0) + len(calresources)
+
+        caching = False
+        if config.EnableFreeBusyCache:
+            # Log extended item
+            if logItems is not None:
+                logItems["fb-uncached"] = logItems.get("fb-uncached", 0) + len(calresources)
+
+            # We want to cache a large range of time based on the current date
+            cache_start = normalizeToUTC(DateTime.getToday() + Duration(days=0 - config.FreeBusyCacheDaysBack))
+            cache_end = normalizeToUTC(DateTime.getToday() + Duration(days=config.FreeBusyCacheDaysForward))
+
+            # If the requested time range would fit in our allowed cache range, trigger the cache creation
+            if compareDateTime(timerange.getStart(), cache_start) >= 0 and compareDateTime(timerange.getEnd(), cache_end) <= 0:
+                cache_timerange = Period(cache_start, cache_end)
+                caching = True
+
+        #
+        # What we do is a fake calendar-query for VEVENT/VFREEBUSYs in the specified time-range.
+        # We then take those results and merge them into one VFREEBUSY component
+        # with appropriate FREEBUSY properties, and return that single item as iCal data.
+        #
+
+        # Create fake filter element to match time-range
+        tr = TimeRange(
+            start=(cache_timerange if caching else timerange).getStart().getText(),
+            end=(cache_timerange if caching else timerange).getEnd().getText(),
+        )
+        if accountingItems is not None:
+            accountingItems["fb-query-timerange"] = (str(tr.start), str(tr.end),)
+
+        # Floating times are matched using the calendar timezone, so calendars can
+        # only be searched together when they have the same timezone. Also, the same
+        # calendar can only be searched for one user per query.
+        groups = []
+        for calresource, useruid in calresources:
+            tz = calresource.getTimezone()
+            tzkey = str(tz) if tz is not None else None
+            for group in groups:
+                if group["tzkey"] == tzkey and calresource.id() not in group["ids"]:
+                    break
+            else:
+                group = {"tzkey": tzkey, "tz": tz, "ids": set(), "calresources": []}
+                groups.append(group)
+            group["ids"].add(calresource.id())
+            group["calresources"].append((calresource, useruid,))
+
+        results = {}
+        for group in groups:
             filter = caldavxml.Filter(
                 caldavxml.ComponentFilter(
                     caldavxml.ComponentFilter(
@@ -556,15 +1038,23 @@ class FreebusyQuery(object):
                 )
             )
             filter = Filter(filter)
-            tzinfo = filter.settimezone(tz)
-            if self.accountingItems is not None:
-                self.accountingItems["fb-query-timerange"] = (str(tr.start), str(tr.end),)
+            tzinfo = filter.settimezone(group["tz"])
 
+            calendars = [calresource for calresource, _ignore_useruid in group["calresources"]]
+            userids = {}
+            for calresource, useruid in group["calresources"]:
+                userids.setdefault(useruid if useruid else ".", []).append(calresource.id())
             try:
-                resources = yield calresource.search(filter, useruid=self.attendee_uid, fbtype=True)
+                if len(userids) == 1:
+                    resources = yield calendars[0].searchMultiple(calendars, filter, useruid=userids.keys()[0], fbtype=True)
+                else:
+                    resources = yield calendars[0].searchMultiple(calendars, filter, useruid=userids, fbtype=True)
+            except IndexedSearchException:
+                raise InternalDataStoreError("Invalid indexedSearch query")
 
+            for calresource, useruid in group["calresources"]:
                 aggregated_resources = {}
-                for name, uid, comptype, test_organizer, float, start, end, fbtype, transp in resources:
+                for name, uid, comptype, test_organizer, float, start, end, fbtype, transp in resources[calresource.id()]:
                     if transp == 'T' and fbtype != '?':
                         fbtype = 'F'
                     aggregated_resources.setdefault((name, uid, comptype, test_organizer,), []).append((
@@ -575,23 +1065,11 @@ class FreebusyQuery(object):
                     ))
 
                 if caching:
-                    yield FBCacheEntry.makeCacheEntry(calresource, self.attendee_uid, cache_timerange, aggregated_resources)
-            except IndexedSearchException:
-                raise InternalDataStoreError("Invalid indexedSearch query")
-
-        else:
-            if self.accountingItems is not None:
-                self.accountingItems["fb-cached"] = self.accountingItems.get("fb-cached", 0) + 1
+                    yield FBCacheEntry.makeCacheEntry(calresource, useruid, cache_timerange, aggregated_resources)
 
-            # Log extended item
-            if self.logItems is not None:
-                self.logItems["fb-cached"] = self.logItems.get("fb-cached", 0) + 1
+                results[(useruid, calresource.id(),)] = (aggregated_resources, tzinfo, filter,)
 
-            # Determine appropriate timezone (UTC is the default)
-            tzinfo = tz.gettimezone() if tz is not None else Timezone.UTCTimezone
-            filter = None
-
-        returnValue((aggregated_resources, tzinfo, filter,))
+        returnValue(results)
 
     @inlineCallbacks
     def _testIgnoreExcludeUID(self, uid, test_organizer, recordUIDCache, dirservice):
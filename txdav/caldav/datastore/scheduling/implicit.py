@@ -464,7 +464,7 @@ class ImplicitScheduler(object):
         yield self.doImplicitOrganizer(queued=True)
 
     @inlineCallbacks
-    def queuedOrganizerSending(self, txn, action, home, resource, uid, organizer, attendee, itipmsg, no_refresh):
+    def queuedOrganizerSending(self, txn, action, home, resource, uid, organizer, attendee, itipmsg, no_refresh, other_attendees=()):
         """
         Process an organizer scheduling work queue item. The basic goal here is to setup the ImplicitScheduler as if
         this operation were the equivalent of the PUT that enqueued the work, and then do the actual work.
@@ -492,7 +492,7 @@ class ImplicitScheduler(object):
         self.only_refresh_attendees = None
         self.split_details = None
 
-        yield self.processSend(attendee, itipmsg, jobqueue=False)
+        yield self.processSend(attendee, itipmsg, jobqueue=False, other_attendees=other_attendees)
 
     @inlineCallbacks
     def sendAttendeeReply(self, txn, resource):
@@ -1283,10 +1283,12 @@ class ImplicitScheduler(object):
         @type queued: L{bool}
         """
 
-        # TODO: a better policy here is to aggregate by attendees with the same set of instances
-        # being requested, but for now we will do one scheduling message per attendee.
+        # Local attendees with the same set of instances being requested get the same message,
+        # so, when aggregating, one scheduling message is sent to all of them. Otherwise, and
+        # for non-local attendees, do one per attendee.
+        aggregate = config.Scheduling.Options.AggregateRequests and not queued
+        aggregated = collections.OrderedDict()
 
-        # Do one per attendee
         count = 0
         recipientProperties = collections.defaultdict(list)
         for p in self.calendar.getAllAttendeeProperties():
@@ -1340,14 +1342,24 @@ class ImplicitScheduler(object):
                         itipmsg.addProperty(Property("X-CALENDARSERVER-SPLIT-RID", rid))
                         itipmsg.addProperty(Property("X-CALENDARSERVER-SPLIT-OLDER-UID" if newer_piece else "X-CALENDARSERVER-SPLIT-NEWER-UID", uid))
 
-                    yield self.processSend(attendee, itipmsg, count=count + cancel_count)
+                    if aggregate and type(attendeeAddress) is LocalCalendarUser:
+                        key = str(itipmsg)
+                        if key in aggregated:
+                            aggregated[key][0].append(attendee)
+                            continue
+                        aggregated[key] = ([attendee], itipmsg, count + cancel_count,)
+                    else:
+                        yield self.processSend(attendee, itipmsg, count=count + cancel_count)
 
                 count += 1
 
+        for attendees, itipmsg, stagger in aggregated.values():
+            yield self.processSend(attendees[0], itipmsg, count=stagger, other_attendees=attendees[1:])
+
         returnValue(count)
 
     @inlineCallbacks
-    def processSend(self, attendee, itipmsg, jobqueue=True, count=0):
+    def processSend(self, attendee, itipmsg, jobqueue=True, count=0, other_attendees=()):
         """
         Send an iTIP message to an attendee. This might send it directly, or it might create job to
         send it later.
@@ -1358,6 +1370,8 @@ class ImplicitScheduler(object):
         @type itipmsg: L{Component}
         @param jobqueue: if allowed, queue up a job to do the actual work
         @type jobqueue: L{bool}
+        @param other_attendees: calendar user addresses of other attendees to send the same message to
+        @type other_attendees: L{list} of L{str}
         """
 
         # Attendee refreshes are already executed in a job (in batches) so don't create more
@@ -1373,6 +1387,7 @@ class ImplicitScheduler(object):
                 itipmsg,
                 self.suppress_refresh,
                 count,
+                other_attendees=other_attendees,
             )
         else:
             # Execute the work right now
@@ -1383,10 +1398,10 @@ class ImplicitScheduler(object):
                 "Implicit {method} - organizer: '{organizer}' to attendee: '{attendee}', UID: '{uid}'",
                 method=itipmsg.propertyValue("METHOD"),
                 organizer=self.organizer,
-                attendee=attendee,
+                attendee=", ".join((attendee,) + tuple(other_attendees)),
                 uid=self.uid,
             )
-            response = (yield scheduler.doSchedulingViaPUT(self.originator, (attendee,), itipmsg, internal_request=True, suppress_refresh=self.suppress_refresh))
+            response = (yield scheduler.doSchedulingViaPUT(self.originator, (attendee,) + tuple(other_attendees), itipmsg, internal_request=True, suppress_refresh=self.suppress_refresh))
             self.handleSchedulingResponse(response, True)
 
     def handleSchedulingResponse(self, response, is_organizer):
@@ -16,16 +16,19 @@
 
 from pycalendar.datetime import DateTime
 from pycalendar.period import Period
+from pycalendar.timezone import Timezone
 
 from twext.python.clsprop import classproperty
 
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.trial.unittest import TestCase
 
+from twistedcaldav.config import config
 from twistedcaldav.ical import Component, Property
 
 from txdav.caldav.datastore.scheduling.cuaddress import calendarUserFromCalendarUserAddress
-from txdav.caldav.datastore.scheduling.freebusy import FreebusyQuery
+from txdav.caldav.datastore.scheduling.freebusy import FreebusyQuery, FBCacheEntry
+from txdav.caldav.datastore.sql import Calendar
 from txdav.common.datastore.test.util import CommonCommonTests, populateCalendarsFrom
 
 
@@ -236,6 +239,59 @@ END:VCALENDAR
             self.assertEqual(normalizeiCalendarText(str(result)), calendar.replace("\n", "\r\n"), msg=description)
 
 
+class CacheEntryEncoding (TestCase):
+    """
+    Test txdav.caldav.datastore.scheduling.freebusy.FBCacheEntry encoding
+    """
+
+    fbresults = {
+        ("1.ics", "uid1", "VEVENT", "",): [
+            ("N", (2008, 6, 1, 10, 0, 0), (2008, 6, 1, 11, 0, 0), "B",),
+            ("N", (2008, 6, 1, 10, 30, 0), (2008, 6, 1, 12, 0, 0), "B",),
+            ("N", (2008, 6, 1, 14, 0, 15), (2008, 6, 1, 14, 30, 0), "B",),
+        ],
+        ("2.ics", "uid2", "VEVENT", "mailto:user01@example.com",): [
+            ("N", (2008, 6, 1, 13, 0, 0), (2008, 6, 1, 14, 0, 0), "T",),
+            ("N", (2008, 6, 1, 15, 0, 0), (2008, 6, 1, 16, 0, 0), "F",),
+        ],
+        ("3.ics", "uid3", "VEVENT", "",): [
+            ("Y", (2008, 6, 1, 16, 0, 0), (2008, 6, 1, 17, 0, 0), "U",),
+        ],
+        ("4.ics", "uid4", "VFREEBUSY", "",): [
+            ("N", (1901, 1, 1, 0, 0, 0), (2100, 1, 1, 0, 0, 0), "?",),
+        ],
+    }
+
+    def test_roundtrip(self):
+        """
+        Decoding an entry returns the original aggregated resources.
+        """
+
+        entry = FBCacheEntry("key", "token", Period.parseText("20080501T000000Z/20080701T000000Z"), self.fbresults)
+        self.assertEqual(entry.fbresults(), self.fbresults)
+        self.assertEqual(entry.fbresults(entry.others), {("4.ics", "uid4", "VFREEBUSY", "",): self.fbresults[("4.ics", "uid4", "VFREEBUSY", "",)]})
+        self.assertTrue(entry.hasUID("uid2"))
+        self.assertFalse(entry.hasUID("uid5"))
+        self.assertFalse(entry.hasUID(None))
+
+    def test_match(self):
+        """
+        Matching an entry merges busy time and clips it to the requested time range.
+        """
+
+        entry = FBCacheEntry("key", "token", Period.parseText("20080501T000000Z/20080701T000000Z"), self.fbresults)
+        busy, matched, others = entry.match(Period.parseText("20080601T103000Z/20080601T160000Z"), Timezone.UTCTimezone)
+        self.assertEqual(
+            dict([(fbtype, sorted([period.getText() for period in periods])) for fbtype, periods in busy.items()]),
+            {
+                "B": ["20080601T103000Z/PT1H30M", "20080601T140015Z/PT29M45S"],
+                "T": ["20080601T130000Z/PT1H"],
+            }
+        )
+        self.assertEqual(matched, 2)
+        self.assertEqual(len(others), 1)
+
+
 class GenerateFreeBusyInfo(CommonCommonTests, TestCase):
     """
     Test txdav.caldav.datastore.scheduling.freebusy.FreebusyQuery
@@ -270,6 +326,8 @@ class GenerateFreeBusyInfo(CommonCommonTests, TestCase):
             "user01": {
                 "calendar_1": {
                 },
+                "calendar_2": {
+                },
                 "inbox": {
                 },
             },
@@ -382,3 +440,167 @@ END:VCALENDAR
         self.assertEqual(len(fbinfo.unavailable), 0)
         self.assertEqual(len(event_details), 1)
         self.assertEqual(str(event_details[0]), str(tuple(Component.fromString(data).subcomponents())[0]))
+
+    @inlineCallbacks
+    def test_multiple_calendars(self):
+        """
+        Test that multiple calendars are searched with a single query.
+        """
+
+        data = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:%s
+DTSTAMP:20080601T000000Z
+DTSTART:%s
+DTEND:%s
+END:VEVENT
+END:VCALENDAR
+"""
+
+        calendar1 = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+        yield calendar1.createCalendarObjectWithName("test.ics", Component.fromString(data % ("1234-5678", self.now_12H.getText(), self.now_13H.getText(),)))
+        calendar2 = (yield self.calendarUnderTest(home="user01", name="calendar_2"))
+        yield calendar2.createCalendarObjectWithName("test.ics", Component.fromString(data % ("1234-5679", self.now_13H.getText(), self.now_1D.getText(),)))
+        yield self.commit()
+
+        searches = []
+        searchMultiple = Calendar.searchMultiple.im_func
+
+        def _searchMultiple(cls, calendars, *args, **kwargs):
+            searches.append(len(calendars))
+            return searchMultiple(cls, calendars, *args, **kwargs)
+        self.patch(Calendar, "searchMultiple", classmethod(_searchMultiple))
+
+        calendar1 = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+        calendar2 = (yield self.calendarUnderTest(home="user01", name="calendar_2"))
+        fbinfo = FreebusyQuery.FBInfo([], [], [])
+        timerange = Period(self.now, self.now_1D)
+
+        organizer = recipient = yield calendarUserFromCalendarUserAddress("mailto:user01@example.com", self.transactionUnderTest())
+        freebusy = FreebusyQuery(organizer=organizer, recipient=recipient, timerange=timerange)
+        result = (yield freebusy.generateFreeBusyInfo([calendar1, calendar2, ], fbinfo))
+        self.assertEqual(result, 2)
+        self.assertEqual(searches, [2])
+        self.assertEqual(sorted(fbinfo.busy, key=lambda period: period.getStart()), [
+            Period(self.now_12H, self.now_13H),
+            Period(self.now_13H, self.now_1D),
+        ])
+
+    @inlineCallbacks
+    def test_prefetch_multiple_attendees(self):
+        """
+        Test that free busy for multiple attendees is looked up with a single query.
+        """
+
+        data = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:%s
+DTSTAMP:20080601T000000Z
+DTSTART:%s
+DTEND:%s
+END:VEVENT
+END:VCALENDAR
+"""
+
+        calendar1 = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+        yield calendar1.createCalendarObjectWithName("test.ics", Component.fromString(data % ("1234-5678", self.now_12H.getText(), self.now_13H.getText(),)))
+        calendar2 = (yield self.calendarUnderTest(home="user02", name="calendar_1"))
+        yield calendar2.createCalendarObjectWithName("test.ics", Component.fromString(data % ("1234-5679", self.now_13H.getText(), self.now_1D.getText(),)))
+        yield self.commit()
+
+        searches = []
+        searchMultiple = Calendar.searchMultiple.im_func
+
+        def _searchMultiple(cls, calendars, *args, **kwargs):
+            searches.append(len(calendars))
+            return searchMultiple(cls, calendars, *args, **kwargs)
+        self.patch(Calendar, "searchMultiple", classmethod(_searchMultiple))
+
+        timerange = Period(self.now, self.now_1D)
+        organizer = yield calendarUserFromCalendarUserAddress("mailto:user01@example.com", self.transactionUnderTest())
+        queries = []
+        for user in ("user01", "user02", "user03",):
+            recipient = yield calendarUserFromCalendarUserAddress("mailto:{}@example.com".format(user), self.transactionUnderTest())
+            queries.append(FreebusyQuery(organizer=organizer, recipient=recipient, timerange=timerange))
+
+        yield FreebusyQuery.prefetchFreeBusy(queries)
+        self.assertEqual(len(searches), 1)
+
+        busy = []
+        for query in queries:
+            fbinfo = FreebusyQuery.FBInfo([], [], [])
+            yield query.generateFreeBusyInfo((yield query.freeBusySet()), fbinfo)
+            busy.append(fbinfo.busy)
+        self.assertEqual(len(searches), 1)
+        self.assertEqual(busy, [
+            [Period(self.now_12H, self.now_13H), ],
+            [Period(self.now_13H, self.now_1D), ],
+            [],
+        ])
+
+    @inlineCallbacks
+    def test_busy_timeline(self):
+        """
+        Test that an up to date calendar busy timeline is used instead of searching the calendar.
+        """
+
+        data = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:%s
+DTSTAMP:20080601T000000Z
+DTSTART:%s
+DTEND:%s
+END:VEVENT
+END:VCALENDAR
+"""
+
+        self.patch(config, "EnableFreeBusyCache", False)
+
+        calendar = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+        yield calendar.createCalendarObjectWithName("test1.ics", Component.fromString(data % ("1234-5678", self.now_12H.getText(), self.now_13H.getText(),)))
+        yield calendar.createCalendarObjectWithName("test2.ics", Component.fromString(data % ("1234-5679", self.now_12H.getText(), self.now_1D.getText(),)))
+        yield self.commit()
+
+        calendar = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+        self.assertTrue((yield calendar.rebuildBusyTimeline()))
+        yield self.commit()
+
+        searches = []
+        searchMultiple = Calendar.searchMultiple.im_func
+
+        def _searchMultiple(cls, calendars, *args, **kwargs):
+            searches.append(len(calendars))
+            return searchMultiple(cls, calendars, *args, **kwargs)
+        self.patch(Calendar, "searchMultiple", classmethod(_searchMultiple))
+
+        @inlineCallbacks
+        def _freeBusy():
+            calendar = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+            fbinfo = FreebusyQuery.FBInfo([], [], [])
+            organizer = recipient = yield calendarUserFromCalendarUserAddress("mailto:user01@example.com", self.transactionUnderTest())
+            freebusy = FreebusyQuery(organizer=organizer, recipient=recipient, timerange=Period(self.now, self.now_1D))
+            yield freebusy.generateFreeBusyInfo([calendar, ], fbinfo)
+            yield self.commit()
+            returnValue(fbinfo.busy)
+
+        self.patch(config, "EnableFreeBusyTimeline", True)
+        busy = yield _freeBusy()
+        self.assertEqual(searches, [])
+        self.assertEqual(busy, [Period(self.now_12H, self.now_1D), ])
+
+        # Any change to the calendar means the timeline is out of date
+        self.patch(config, "EnableFreeBusyTimeline", False)
+        calendar = (yield self.calendarUnderTest(home="user01", name="calendar_1"))
+        yield calendar.createCalendarObjectWithName("test3.ics", Component.fromString(data % ("1234-5680", self.now.getText(), self.now_12H.getText(),)))
+        yield self.commit()
+
+        self.patch(config, "EnableFreeBusyTimeline", True)
+        busy = yield _freeBusy()
+        self.assertEqual(searches, [1])
+        self.assertEqual(len(busy), 3)
@@ -29,8 +29,11 @@ from twistedcaldav.config import config
 from twistedcaldav.ical import Component
 from twistedcaldav.timezones import TimezoneCache
 
+from txdav.caldav.datastore.scheduling.caldav.delivery import ScheduleViaCalDAV, \
+    _PendingResponses
 from txdav.caldav.datastore.scheduling.cuaddress import LocalCalendarUser
 from txdav.caldav.datastore.scheduling.implicit import ImplicitScheduler
+from txdav.caldav.datastore.scheduling.itip import iTIPRequestStatus
 from txdav.caldav.datastore.scheduling.scheduler import ScheduleResponseQueue
 from txdav.caldav.icalendarstore import AttendeeAllowedError, \
     ComponentUpdateState
@@ -1139,6 +1142,99 @@ END:VCALENDAR
         self.assertEqual(len(list2), 1)
         self.assertTrue(list2[0].startswith(hashlib.md5("12345-67890").hexdigest()))
 
+    @inlineCallbacks
+    def test_doImplicitScheduling_NewOrganizerEvent_Parallel(self):
+        """
+        Test that doImplicitScheduling delivers one aggregated scheduling message to attendees, each
+        in their own transaction.
+        """
+
+        self.patch(config.Scheduling.Options, "AggregateRequests", True)
+        self.patch(config.Scheduling.Options.ParallelDelivery, "Enabled", True)
+        self.patch(config.Scheduling.Options.ParallelDelivery, "Concurrency", 1)
+
+        data = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:12345-67890
+DTSTAMP:20080601T120000Z
+DTSTART:20080601T120000Z
+DTEND:20080601T130000Z
+ORGANIZER;CN="User 01":mailto:user01@example.com
+ATTENDEE:mailto:user01@example.com
+ATTENDEE:mailto:user02@example.com
+ATTENDEE:mailto:user03@example.com
+END:VEVENT
+END:VCALENDAR
+"""
+        yield self._createCalendarObject(data, "user01", "test.ics")
+
+        for user in ("user02", "user03",):
+            list2 = (yield self._listCalendarObjects(user))
+            self.assertEqual(len(list2), 1)
+            self.assertTrue(list2[0].startswith(hashlib.md5("12345-67890").hexdigest()))
+
+            list2 = (yield self._listCalendarObjects(user, "inbox"))
+            self.assertEqual(len(list2), 1)
+
+    @inlineCallbacks
+    def test_doImplicitScheduling_Parallel_Retry(self):
+        """
+        Test that delivering the same message again in parallel, as happens when the organizer's
+        transaction fails after the attendees' have committed, does not add a second inbox item.
+        """
+
+        self.patch(config.Scheduling.Options, "AggregateRequests", True)
+        self.patch(config.Scheduling.Options.ParallelDelivery, "Enabled", True)
+        self.patch(config.Scheduling.Options.ParallelDelivery, "Concurrency", 1)
+
+        data = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:12345-67890
+DTSTAMP:20080601T120000Z
+DTSTART:20080601T120000Z
+DTEND:20080601T130000Z
+ORGANIZER;CN="User 01":mailto:user01@example.com
+ATTENDEE:mailto:user01@example.com
+ATTENDEE:mailto:user02@example.com
+ATTENDEE:mailto:user03@example.com
+END:VEVENT
+END:VCALENDAR
+"""
+        yield self._createCalendarObject(data, "user01", "test.ics")
+
+        list2 = (yield self._listCalendarObjects("user02", "inbox"))
+        inbox_resource = (yield self.calendarObjectUnderTest(name=list2[0], calendar_name="inbox", home="user02"))
+        message = (yield inbox_resource.component())
+
+        class FakeScheduler(object):
+            pass
+
+        scheduler = FakeScheduler()
+        scheduler.txn = self.transactionUnderTest()
+        scheduler.calendar = message
+        recipients = []
+        for user in ("user02", "user03",):
+            record = yield self.directory.recordWithUID(user)
+            recipients.append(LocalCalendarUser("mailto:{}@example.com".format(user), record))
+        responses = _PendingResponses()
+        yield ScheduleViaCalDAV(scheduler, recipients, responses, False).generateResponsesInParallel(responses)
+        yield self.commit()
+
+        self.assertEqual(
+            sorted([(args[0], kwargs["reqstatus"]) for args, kwargs in responses.added]),
+            [
+                ("mailto:user02@example.com", iTIPRequestStatus.MESSAGE_DELIVERED),
+                ("mailto:user03@example.com", iTIPRequestStatus.MESSAGE_DELIVERED),
+            ]
+        )
+        for user in ("user02", "user03",):
+            list2 = (yield self._listCalendarObjects(user, "inbox"))
+            self.assertEqual(len(list2), 1)
+
     @inlineCallbacks
     def test_doImplicitScheduling_UpdateOrganizerEvent(self):
         """
@@ -14,6 +14,7 @@
 # limitations under the License.
 ##
 from twistedcaldav.ical import Component, diff_iCalStrs, normalize_iCalStr
+from txdav.caldav.datastore.scheduling.itip import iTIPRequestStatus
 from twext.enterprise.jobs.jobitem import JobItem
 from twext.enterprise.jobs.workitem import WorkItem
 from txdav.common.datastore.sql_tables import scheduleActionFromSQL
@@ -358,6 +359,105 @@ END:VCALENDAR
         yield jobs[0].delete()
         yield self.commit()
 
+    @inlineCallbacks
+    def test_create_aggregated(self):
+        """
+        Test that a single L{txdav.caldav.datastore.scheduling.work.ScheduleOrganizerSendWork}
+        item delivers its message to all of its attendees.
+        """
+
+        txn = self.transactionUnderTest()
+        home = yield self.homeUnderTest(name="user01")
+        yield ScheduleOrganizerSendWork.schedule(
+            txn,
+            "create",
+            home,
+            None,
+            "urn:x-uid:user01",
+            "urn:x-uid:user02",
+            self.itip_new,
+            True,
+            1000,
+            other_attendees=["urn:x-uid:user03"],
+        )
+
+        jobs = yield JobItem.all(self.transactionUnderTest())
+        self.assertEqual(len(jobs), 1)
+
+        work = yield jobs[0].workItem()
+        self.assertEqual(work.otherAttendeesList(), ["urn:x-uid:user03"])
+        yield work.doWork()
+
+        for user in ("user02", "user03",):
+            calendar = yield self.calendarUnderTest(home=user, name="calendar")
+            cobjs = yield calendar.calendarObjects()
+            self.assertEqual(len(cobjs), 1)
+
+        yield work.delete()
+        yield jobs[0].delete()
+        yield self.commit()
+
+    @inlineCallbacks
+    def test_retryPendingRecipients(self):
+        """
+        Test that L{txdav.caldav.datastore.scheduling.work.ScheduleOrganizerSendWork.retryPendingRecipients}
+        queues a new work item for just the pending recipients when only some of them are pending.
+        """
+
+        txn = self.transactionUnderTest()
+        home = yield self.homeUnderTest(name="user01")
+        yield ScheduleOrganizerSendWork.schedule(
+            txn,
+            "create",
+            home,
+            None,
+            "urn:x-uid:user01",
+            "urn:x-uid:user02",
+            self.itip_new,
+            True,
+            1000,
+            other_attendees=["urn:x-uid:user03", "urn:x-uid:user04"],
+        )
+
+        jobs = yield JobItem.all(self.transactionUnderTest())
+        self.assertEqual(len(jobs), 1)
+        work = yield jobs[0].workItem()
+
+        # All pending - left for checkTemporaryFailure to retry
+        results = [
+            ("urn:x-uid:user02", iTIPRequestStatus.MESSAGE_PENDING_CODE),
+            ("urn:x-uid:user03", iTIPRequestStatus.MESSAGE_PENDING_CODE),
+        ]
+        remaining = yield work.retryPendingRecipients(results, home, None, "urn:x-uid:user01", self.itip_new)
+        self.assertEqual(remaining, results)
+        jobs = yield JobItem.all(self.transactionUnderTest())
+        self.assertEqual(len(jobs), 1)
+
+        # Some pending - those are queued again
+        results = [
+            ("urn:x-uid:user02", iTIPRequestStatus.MESSAGE_PENDING_CODE),
+            ("urn:x-uid:user03", iTIPRequestStatus.NO_USER_SUPPORT_CODE),
+            ("urn:x-uid:user04", iTIPRequestStatus.MESSAGE_PENDING_CODE),
+        ]
+        remaining = yield work.retryPendingRecipients(results, home, None, "urn:x-uid:user01", self.itip_new)
+        self.assertEqual(remaining, [("urn:x-uid:user03", iTIPRequestStatus.NO_USER_SUPPORT_CODE)])
+
+        jobs = yield JobItem.all(self.transactionUnderTest())
+        self.assertEqual(len(jobs), 2)
+        retries = []
+        for job in jobs:
+            retry = yield job.workItem()
+            if retry.workID != work.workID:
+                retries.append(retry)
+        self.assertEqual(len(retries), 1)
+        self.assertEqual(retries[0].attendee, "urn:x-uid:user02")
+        self.assertEqual(retries[0].otherAttendeesList(), ["urn:x-uid:user04"])
+
+        for job in jobs:
+            yield (yield job.workItem()).delete()
+            yield job.delete()
+        yield self.commit()
+
 
 class TestScheduleWork(BaseWorkTests):
     """
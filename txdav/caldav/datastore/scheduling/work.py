@@ -462,12 +462,14 @@ class ScheduleOrganizerSendWork(ScheduleWorkMixin, fromTable(schema.SCHEDULE_ORG
 
     This work item is used to send iTIP request and cancel messages when an organizer changes
     their calendar object resource. One of these will be created for each iTIP message that
-    L{ScheduleOrganizerWork} needs to have sent.
+    L{ScheduleOrganizerWork} needs to have sent. When the same message is sent to several local
+    attendees, they are all stored in the one work item and the message is delivered to them
+    together.
     """
 
     @classmethod
     @inlineCallbacks
-    def schedule(cls, txn, action, home, resource, organizer, attendee, itipmsg, no_refresh, stagger, pause=0):
+    def schedule(cls, txn, action, home, resource, organizer, attendee, itipmsg, no_refresh, stagger, pause=0, other_attendees=()):
         """
         Create the work item. Because there may be lots of these dumped onto the server in one go, we will
         stagger them via notBefore. However, we are using a "chained" work item so when one completes, it
@@ -486,6 +488,8 @@ class ScheduleOrganizerSendWork(ScheduleWorkMixin, fromTable(schema.SCHEDULE_ORG
         @type no_refresh: L{bool}
         @param stagger: number of seconds into the future for notBefore
         @type stagger: L{int}
+        @param other_attendees: calendar user addresses of other attendees to send the same message to
+        @type other_attendees: L{list} of L{str}
         """
 
         # Always queue up new work - coalescing happens when work is executed
@@ -501,15 +505,17 @@ class ScheduleOrganizerSendWork(ScheduleWorkMixin, fromTable(schema.SCHEDULE_ORG
             attendee=attendee,
             itipMsg=itipmsg.getTextWithTimezones(includeTimezones=not config.EnableTimezonesByReference),
             noRefresh=no_refresh,
+            otherAttendees="\n".join(other_attendees) if other_attendees else None,
             pause=pause,
         ))
         cls._enqueued()
         log.debug(
-            "ScheduleOrganizerSendWork - enqueued for ID: {id}, UID: {uid}, organizer: {org}, attendee: {att}",
+            "ScheduleOrganizerSendWork - enqueued for ID: {id}, UID: {uid}, organizer: {org}, attendee: {att}, others: {others}",
             id=work.workID,
             uid=uid,
             org=organizer,
-            att=attendee
+            att=attendee,
+            others=len(other_attendees),
         )
 
     @inlineCallbacks
@@ -533,11 +539,60 @@ class ScheduleOrganizerSendWork(ScheduleWorkMixin, fromTable(schema.SCHEDULE_ORG
             txn, scheduleActionFromSQL[self.scheduleAction],
             new_home, new_resource, new_home.uid(), self.attendee,
             itipmsg, self.noRefresh, 0,
-            pause=1
+            pause=1,
+            other_attendees=self.otherAttendeesList(),
         )
 
         returnValue(True)
 
+    def otherAttendeesList(self):
+        """
+        The other attendees the message is to be sent to, in addition to L{attendee}.
+
+        @rtype: L{list} of L{str}
+        """
+        return self.otherAttendees.splitlines() if self.otherAttendees else []
+
+    @inlineCallbacks
+    def retryPendingRecipients(self, results, home, resource, organizer, itipmsg):
+        """
+        When a message sent to several recipients could only be delivered to some of them,
+        queue a new work item to send it again to just the ones whose delivery is pending,
+        after the temporary failure delay. L{checkTemporaryFailure} only retries a work item
+        when every recipient is pending, so without this the pending recipients would be
+        recorded as a permanent failure. Each retry goes to fewer recipients, so once only
+        pending recipients are left the usual temporary failure limit applies.
+
+        @param results: set of results gathered in L{extractSchedulingResponse}
+        @type results: L{list}
+
+        @return: the results for the recipients that are not being retried
+        @rtype: L{list}
+        """
+        pending = [recipient for recipient, statusCode in results if statusCode == iTIPRequestStatus.MESSAGE_PENDING_CODE]
+        if not pending or len(pending) == len(results):
+            returnValue(results)
+
+        log.debug(
+            "ScheduleOrganizerSendWork - retrying pending recipients for ID: {id}, UID: {uid}, recipients: {count}",
+            id=self.workID,
+            uid=self.icalendarUID,
+            count=len(pending),
+        )
+        yield ScheduleOrganizerSendWork.schedule(
+            self.transaction,
+            scheduleActionFromSQL[self.scheduleAction],
+            home,
+            resource,
+            organizer,
+            pending[0],
+            itipmsg,
+            self.noRefresh,
+            config.Scheduling.Options.WorkQueues.TemporaryFailureDelay,
+            other_attendees=pending[1:],
+        )
+        returnValue([result for result in results if result[1] != iTIPRequestStatus.MESSAGE_PENDING_CODE])
+
     @inlineCallbacks
     def doWork(self):
 
@@ -570,7 +625,8 @@ class ScheduleOrganizerSendWork(ScheduleWorkMixin, fromTable(schema.SCHEDULE_ORG
                 organizer,
                 self.attendee,
                 itipmsg,
-                self.noRefresh
+                self.noRefresh,
+                other_attendees=self.otherAttendeesList(),
             )
 
             # Handle responses - update the actual resource in the store. Note that for a create the resource did not previously
@@ -581,6 +637,9 @@ class ScheduleOrganizerSendWork(ScheduleWorkMixin, fromTable(schema.SCHEDULE_ORG
                 responses, all_delivered = self.extractSchedulingResponse(scheduler.queuedResponses)
                 if not all_delivered:
 
+                    # Retry any recipients still pending when others were delivered to
+                    responses = yield self.retryPendingRecipients(responses, home, resource, organizer, itipmsg)
+
                     # Check for all connection failed
                     yield self.checkTemporaryFailure(responses)
 
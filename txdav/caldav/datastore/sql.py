@@ -27,8 +27,9 @@ __all__ = [
 ]
 
 from twext.enterprise.dal.record import fromTable, SerializableRecord
-from twext.enterprise.dal.syntax import Count, ColumnSyntax, Delete, \
+from twext.enterprise.dal.syntax import Coalesce, Count, ColumnSyntax, Delete, \
     Insert, Len, Max, Parameter, Select, Update, utcNowSQL, Union
+from twext.enterprise.ienterprise import ORACLE_DIALECT
 from twext.enterprise.locking import NamedLock
 from twext.enterprise.jobs.jobitem import JobItem
 from twext.enterprise.jobs.workitem import WorkItem, AggregatedWorkItem, \
@@ -46,10 +47,12 @@ from twisted.python.failure import Failure
 from twistedcaldav import customxml, ical
 from twistedcaldav.stdconfig import config
 from twistedcaldav.datafilters.peruserdata import PerUserDataFilter
-from twistedcaldav.dateops import normalizeForIndex, \
-    pyCalendarToSQLTimestamp, parseSQLDateToPyCalendar
+from twistedcaldav.dateops import normalizeForIndex, normalizeToUTC, \
+    pyCalendarToSQLTimestamp, parseSQLDateToPyCalendar, \
+    parseSQLTimestampToPyCalendar
 from twistedcaldav.ical import Component, InvalidICalendarDataError, Property, ATTENDEE_COMMENT
 from twistedcaldav.instance import InvalidOverriddenInstanceError
+from twistedcaldav.memcacher import Memcacher
 from twistedcaldav.timezones import TimezoneException, readVTZ, hasTZ
 
 from txdav.base.propertystore.base import PropertyName
@@ -70,6 +73,7 @@ from txdav.caldav.datastore.sql_directory import GroupAttendeeRecord, \
 from txdav.caldav.datastore.util import normalizationLookup
 from txdav.caldav.datastore.util import CalendarObjectBase
 from txdav.caldav.datastore.util import dropboxIDFromCalendarObject
+from txdav.caldav.datastore.util import componentCache
 from txdav.caldav.icalendarstore import ICalendarHome, ICalendar, ICalendarObject, \
     AttachmentStoreFailed, AttachmentStoreValidManagedID, \
     TooManyAttendeesError, InvalidComponentTypeError, InvalidCalendarAccessError, \
@@ -91,6 +95,7 @@ from txdav.common.datastore.sql_tables import _ATTACHMENTS_MODE_NONE, \
     _TRANSP_OPAQUE, _TRANSP_TRANSPARENT, schema, _CHILD_TYPE_TRASH, \
     _HOME_STATUS_NORMAL
 from txdav.common.datastore.sql_sharing import SharingInvitation
+from txdav.common.datastore.sql_util import allocateSequenceValues, bulkInsert
 from txdav.common.icommondatastore import IndexedSearchException, \
     InternalDataStoreError, HomeChildNameAlreadyExistsError, \
     HomeChildNameNotAllowedError, ObjectResourceTooBigError, \
@@ -1167,9 +1172,10 @@ class Calendar(CommonHomeChild):
         """
         super(Calendar, self).__init__(*args, **kw)
         self._transp = _TRANSP_OPAQUE
+        self._busyTimelineQueued = False
 
     @classmethod
-    def makeClass(cls, home, bindData, additionalBindData, metadataData, propstore=None, ownerHome=None):
+    def makeClass(cls, home, bindData, additionalBindData, metadataData, propstore=None, ownerHome=None, ownerName=None):
         """
         Examine the calendar metadata to see which flavor of Calendar collection
         to create, then call the inherited makeClass with the right class.
@@ -1186,6 +1192,8 @@ class Calendar(CommonHomeChild):
         @type propstore: L{PropertyStore}
         @param ownerHome: the home of the owner, or C{None} to figure it out automatically
         @type ownerHome: L{CommonHome}
+        @param ownerName: the owner's name for the child, when L{ownerHome} is given
+        @type ownerName: C{str}
 
         @return: the constructed child class
         @rtype: L{CommonHomeChild}
@@ -1200,7 +1208,7 @@ class Calendar(CommonHomeChild):
 
             return super(Calendar, actualClass).makeClass(
                 home, bindData, additionalBindData, metadataData,
-                propstore=propstore, ownerHome=ownerHome
+                propstore=propstore, ownerHome=ownerHome, ownerName=ownerName
             )
 
     @classmethod
@@ -1708,10 +1716,14 @@ class Calendar(CommonHomeChild):
         return MimeType.fromString("text/calendar; charset=utf-8")
 
     @inlineCallbacks
-    def search(self, filter, useruid=None, fbtype=False):
+    def search(self, filter, useruid=None, fbtype=False, superset=False):
         """
         Finds resources matching the given qualifiers.
         @param filter: the L{Filter} for the calendar-query to execute.
+        @param superset: if C{True}, parts of the filter that cannot be done in SQL
+            are ignored, so the results are the candidates that could match and the
+            caller must match each one against the filter itself.
+        @type superset: C{bool}
         @return: an iterable of tuples for each resource matching the
             given C{qualifiers}. The tuples are C{(name, uid)}, where
             C{name} is the resource name, C{uid} is the resource UID.
@@ -1725,7 +1737,7 @@ class Calendar(CommonHomeChild):
                 filter = None
 
         # Make sure we have a proper Filter element and get the partial SQL statement to use.
-        sql_stmt = self._sqlquery(filter, useruid, fbtype)
+        sql_stmt = self._sqlquery(filter, useruid, fbtype, superset)
 
         # No result means it is too complex for us
         if sql_stmt is None:
@@ -1734,36 +1746,7 @@ class Calendar(CommonHomeChild):
 
         # Check for time-range re-expand
         if usedtimerange is not None:
-
-            today = DateTime.getToday()
-
-            # Determine how far we need to extend the current expansion of
-            # events. If we have an open-ended time-range we will expand
-            # one year past the start. That should catch bounded
-            # recurrences - unbounded will have been indexed with an
-            # "infinite" value always included.
-            maxDate, isStartDate = filter.getmaxtimerange()
-            if maxDate:
-                maxDate = maxDate.duplicate()
-                maxDate.offsetDay(1)
-                maxDate.setDateOnly(True)
-                upperLimit = today + Duration(days=config.FreeBusyIndexExpandMaxDays)
-                if maxDate > upperLimit:
-                    raise TimeRangeUpperLimit(upperLimit)
-                if isStartDate:
-                    maxDate += Duration(days=365)
-
-            # Determine if the start date is too early for the restricted range we
-            # are applying. If it is today or later we don't need to worry about truncation
-            # in the past.
-            minDate, _ignore_isEndDate = filter.getmintimerange()
-            if minDate >= today:
-                minDate = None
-            if minDate is not None and config.FreeBusyIndexLowerLimitDays:
-                truncateLowerLimit = today - Duration(days=config.FreeBusyIndexLowerLimitDays)
-                if minDate < truncateLowerLimit:
-                    raise TimeRangeLowerLimit(truncateLowerLimit)
-
+            minDate, maxDate = self._searchIndexRange(filter)
             if maxDate is not None or minDate is not None:
                 yield self.testAndUpdateIndex(minDate, maxDate)
 
@@ -1772,19 +1755,113 @@ class Calendar(CommonHomeChild):
         # Check result for missing resources
         results = []
         for row in rowiter:
-            if fbtype:
-                row = list(row)
-                row[4] = 'Y' if row[4] else 'N'
-                row[7] = indexfbtype_to_icalfbtype[row[7]]
-                if row[9] is not None:
-                    row[8] = row[9]
-                row[8] = 'T' if row[8] else 'F'
-                del row[9]
-            results.append(row)
+            results.append(self._searchResultRow(row, fbtype))
+
+        returnValue(results)
+
+    @classmethod
+    @inlineCallbacks
+    def searchMultiple(cls, calendars, filter, useruid=None, fbtype=False):
+        """
+        Finds resources matching the given qualifiers in each of a set of calendars, using
+        a single query for all of them. The calendars must all be using the same transaction,
+        and the L{Filter} timezone must be appropriate for all of them.
+
+        @param calendars: the calendars to search
+        @type calendars: C{list} of L{Calendar}
+        @param filter: the L{Filter} for the calendar-query to execute.
+        @return: a C{dict} mapping each calendar resource-id to the results for that
+            calendar, in the same form as returned by L{search}.
+        """
+
+        if len(calendars) == 1:
+            results = yield calendars[0].search(filter, useruid=useruid, fbtype=fbtype)
+            returnValue({calendars[0].id(): results})
+
+        calendarIDs = [calendar.id() for calendar in calendars]
+        try:
+            expression = buildExpression(filter, cls._queryFields)
+            sql_stmt = CalDAVSQLQueryGenerator(expression, calendars[0], calendarIDs, useruid, fbtype).generate()
+        except ValueError:
+            sql_stmt = None
+
+        # No result means it is too complex for us
+        if sql_stmt is None:
+            raise IndexedSearchException()
+        sql_stmt, args, usedtimerange = sql_stmt
+
+        # Check for time-range re-expand
+        if usedtimerange is not None:
+            minDate, maxDate = cls._searchIndexRange(filter)
+            if maxDate is not None or minDate is not None:
+                yield cls.testAndUpdateIndexMultiple(calendars, minDate, maxDate)
+
+        rowiter = yield sql_stmt.on(calendars[0]._txn, **args)
+
+        results = dict([(calendarID, []) for calendarID in calendarIDs])
+        for row in rowiter:
+            results[row[0]].append(cls._searchResultRow(row[1:], fbtype))
 
         returnValue(results)
 
-    def _sqlquery(self, filter, useruid, fbtype):
+    @staticmethod
+    def _searchIndexRange(filter):
+        """
+        Determine the range the time-range index needs to cover for a query using
+        the supplied filter.
+
+        @param filter: the L{Filter} for the calendar-query.
+        @return: a C{tuple} of the lower and upper L{DateTime} limits, either of which
+            may be C{None}
+        """
+
+        today = DateTime.getToday()
+
+        # Determine how far we need to extend the current expansion of
+        # events. If we have an open-ended time-range we will expand
+        # one year past the start. That should catch bounded
+        # recurrences - unbounded will have been indexed with an
+        # "infinite" value always included.
+        maxDate, isStartDate = filter.getmaxtimerange()
+        if maxDate:
+            maxDate = maxDate.duplicate()
+            maxDate.offsetDay(1)
+            maxDate.setDateOnly(True)
+            upperLimit = today + Duration(days=config.FreeBusyIndexExpandMaxDays)
+            if maxDate > upperLimit:
+                raise TimeRangeUpperLimit(upperLimit)
+            if isStartDate:
+                maxDate += Duration(days=365)
+
+        # Determine if the start date is too early for the restricted range we
+        # are applying. If it is today or later we don't need to worry about truncation
+        # in the past.
+        minDate, _ignore_isEndDate = filter.getmintimerange()
+        if minDate >= today:
+            minDate = None
+        if minDate is not None and config.FreeBusyIndexLowerLimitDays:
+            truncateLowerLimit = today - Duration(days=config.FreeBusyIndexLowerLimitDays)
+            if minDate < truncateLowerLimit:
+                raise TimeRangeLowerLimit(truncateLowerLimit)
+
+        return minDate, maxDate
+
+    @staticmethod
+    def _searchResultRow(row, fbtype):
+        """
+        Convert the raw index values in a search result row.
+        """
+        if fbtype:
+            row = list(row)
+            row[4] = 'Y' if row[4] else 'N'
+            row[7] = indexfbtype_to_icalfbtype[row[7]]
+            if row[9] is not None:
+                row[8] = row[9]
+            row[8] = 'T' if row[8] else 'F'
+            del row[9]
+        return row
+
+    def _sqlquery(self, filter, useruid, fbtype, superset=False):
         """
         Convert the supplied addressbook-query into a partial SQL statement.
 
@@ -1798,7 +1875,7 @@ class Calendar(CommonHomeChild):
             return None
 
         try:
-            expression = buildExpression(filter, self._queryFields)
+            expression = buildExpression(filter, self._queryFields, superset)
             sql = CalDAVSQLQueryGenerator(expression, self, self.id(), useruid, fbtype)
             return sql.generate()
         except ValueError:
@@ -1892,6 +1969,295 @@ class Calendar(CommonHomeChild):
             self.log.info("Search falls outside range of index for {name} {min} to {max}", name=name, min=minDate, max=maxDate)
             yield self.reExpandResource(name, minDate, maxDate)
 
+    @classmethod
+    def _notExpandedWithinMultipleQuery(cls, resourceIDs):
+        """
+        Query to find resources in a set of calendars that need to be re-expanded
+        """
+        co = cls._objectSchema
+        return Select(
+            [co.CALENDAR_RESOURCE_ID, co.RESOURCE_NAME],
+            From=co,
+            Where=(
+                (co.RECURRANCE_MIN > Parameter("minDate"))
+                .Or(co.RECURRANCE_MAX < Parameter("maxDate"))
+            ).And(co.CALENDAR_RESOURCE_ID.In(Parameter("resourceIDs", len(resourceIDs))))
+        )
+
+    @classmethod
+    @inlineCallbacks
+    def testAndUpdateIndexMultiple(cls, calendars, minDate, maxDate):
+        """
+        Same as L{testAndUpdateIndex} but for a set of calendars, using a single query
+        to find the resources needing re-expansion.
+        """
+        calendarIDs = [calendar.id() for calendar in calendars]
+        rows = yield cls._notExpandedWithinMultipleQuery(calendarIDs).on(
+            calendars[0]._txn,
+            minDate=pyCalendarToSQLTimestamp(normalizeForIndex(minDate)) if minDate is not None else None,
+            maxDate=pyCalendarToSQLTimestamp(normalizeForIndex(maxDate)),
+            resourceIDs=calendarIDs,
+        )
+
+        calendarsByID = dict([(calendar.id(), calendar) for calendar in calendars])
+        for calendarID, name in rows:
+            calendar = calendarsByID[calendarID]
+            calendar.log.info("Search falls outside range of index for {name} {min} to {max}", name=name, min=minDate, max=maxDate)
+            yield calendar.reExpandResource(name, minDate, maxDate)
+
+    @inlineCallbacks
+    def _changeRevision(self, action, name):
+        """
+        Queue a rebuild of the busy timeline whenever the calendar changes.
+        """
+        revision = yield super(Calendar, self)._changeRevision(action, name)
+        yield self._queueBusyTimelineUpdate()
+        returnValue(revision)
+
+    @inlineCallbacks
+    def _queueBusyTimelineUpdate(self):
+        """
+        Queue a L{CalendarBusyTimelineWork} for this calendar, at most once for each
+        transaction. Any other queued work for the calendar is removed when the work runs.
+        """
+        if config.EnableFreeBusyTimeline and not self._busyTimelineQueued and not self.isInbox() and not self.isTrash():
+            self._busyTimelineQueued = True
+            notBefore = datetime.datetime.utcnow() + datetime.timedelta(seconds=config.FreeBusyTimelineDelay)
+            yield self._txn.enqueue(
+                Calendar.CalendarBusyTimelineWork,
+                homeResourceID=self.ownerHome()._resourceID,
+                calendarResourceID=self._resourceID,
+                notBefore=notBefore,
+            )
+
+    @classproperty
+    def _busyTimelineInstancesQuery(cls):
+        """
+        DAL query to load the instances of a calendar overlapping a time range, along with
+        the per-user data for a specific user.
+        """
+        co = cls._objectSchema
+        tr = schema.TIME_RANGE
+        tpy = schema.PERUSER
+        return Select(
+            [
+                co.ICALENDAR_TYPE,
+                tr.FLOATING,
+                Coalesce(tpy.ADJUSTED_START_DATE, tr.START_DATE),
+                Coalesce(tpy.ADJUSTED_END_DATE, tr.END_DATE),
+                tr.FBTYPE,
+                tr.TRANSPARENT,
+                tpy.TRANSPARENT,
+            ],
+            From=tr.join(co, tr.CALENDAR_OBJECT_RESOURCE_ID == co.RESOURCE_ID).join(
+                tpy, (tr.INSTANCE_ID == tpy.TIME_RANGE_INSTANCE_ID).And(tpy.USER_ID == Parameter("userid")), "left outer"
+            ),
+            Where=(tr.CALENDAR_RESOURCE_ID == Parameter("resourceID")).And(
+                tr.START_DATE < Parameter("endDate")).And(
+                tr.END_DATE > Parameter("startDate")),
+        )
+
+    @classproperty
+    def _busyTimelineStateInsertQuery(cls):
+        bts = schema.CALENDAR_BUSY_TIMELINE_STATE
+        return Insert({
+            bts.CALENDAR_RESOURCE_ID: Parameter("resourceID"),
+            bts.REVISION: Parameter("revision"),
+            bts.START_DATE: Parameter("startDate"),
+            bts.END_DATE: Parameter("endDate"),
+        })
+
+    @classproperty
+    def _busyTimelineStateDeleteQuery(cls):
+        bts = schema.CALENDAR_BUSY_TIMELINE_STATE
+        return Delete(
+            From=bts,
+            Where=bts.CALENDAR_RESOURCE_ID == Parameter("resourceID"),
+        )
+
+    @classproperty
+    def _busyTimelineDeleteQuery(cls):
+        bt = schema.CALENDAR_BUSY_TIMELINE
+        return Delete(
+            From=bt,
+            Where=bt.CALENDAR_RESOURCE_ID == Parameter("resourceID"),
+        )
+
+    @inlineCallbacks
+    def rebuildBusyTimeline(self):
+        """
+        Rebuild the pre-merged busy time of the calendar owner, covering the same time range
+        as the free busy cache. The timeline is only stored when all the instances in that
+        range can be merged. Any floating instance, or any VFREEBUSY, VAVAILABILITY or unknown
+        free busy type, means that free busy lookups must search this calendar instead.
+
+        @return: C{True} if the timeline was stored, C{False} otherwise
+        @rtype: C{bool}
+        """
+
+        # Get the revision before reading the index, so that any change made while the
+        # timeline is being built means the timeline will not be used
+        revision = yield self.syncTokenRevision()
+
+        start = normalizeToUTC(DateTime.getToday() + Duration(days=0 - config.FreeBusyCacheDaysBack))
+        end = normalizeToUTC(DateTime.getToday() + Duration(days=config.FreeBusyCacheDaysForward))
+
+        # Make sure the index covers the entire timeline
+        maxDate = end.duplicate()
+        maxDate.offsetDay(1)
+        maxDate.setDateOnly(True)
+        yield self.testAndUpdateIndex(start, maxDate)
+
+        # Floating times are stored without a timezone, so look one day either side
+        # to catch any that might overlap the time range in any timezone
+        rows = yield self._busyTimelineInstancesQuery.on(
+            self._txn,
+            resourceID=self._resourceID,
+            userid=self.ownerHome().uid(),
+            startDate=pyCalendarToSQLTimestamp(start - Duration(days=1)),
+            endDate=pyCalendarToSQLTimestamp(end + Duration(days=1)),
+        )
+
+        busy = collections.defaultdict(list)
+        complete = True
+        for comptype, floating, startDate, endDate, fbtype, transparent, userTransparent in rows:
+            # Only these component types are used for free busy
+            if comptype not in ("VEVENT", "VFREEBUSY", "VAVAILABILITY",):
+                continue
+            if comptype != "VEVENT" or floating or fbtype == icalfbtype_to_indexfbtype["UNKNOWN"]:
+                complete = False
+                break
+            if userTransparent is not None:
+                transparent = userTransparent
+            if transparent or fbtype == icalfbtype_to_indexfbtype["FREE"]:
+                continue
+            busy[fbtype].append((parseSQLTimestamp(startDate), parseSQLTimestamp(endDate),))
+
+        yield self._busyTimelineDeleteQuery.on(self._txn, resourceID=self._resourceID)
+        yield self._busyTimelineStateDeleteQuery.on(self._txn, resourceID=self._resourceID)
+        if not complete:
+            returnValue(False)
+
+        # Merge the overlapping periods of each free busy type
+        timelineRows = []
+        for fbtype, periods in sorted(busy.items()):
+            merged = []
+            for periodStart, periodEnd in sorted(periods):
+                if merged and periodStart <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], periodEnd)
+                else:
+                    merged.append([periodStart, periodEnd])
+            timelineRows.extend([(self._resourceID, fbtype, periodStart, periodEnd,) for periodStart, periodEnd in merged])
+
+        bt = schema.CALENDAR_BUSY_TIMELINE
+        yield bulkInsert(
+            self._txn, bt, [bt.CALENDAR_RESOURCE_ID, bt.FBTYPE, bt.START_DATE, bt.END_DATE],
+            timelineRows, config.FreeBusyIndexInsertBatchSize,
+        )
+        yield self._busyTimelineStateInsertQuery.on(
+            self._txn,
+            resourceID=self._resourceID,
+            revision=revision,
+            startDate=pyCalendarToSQLTimestamp(start),
+            endDate=pyCalendarToSQLTimestamp(end),
+        )
+        returnValue(True)
+
+    @classmethod
+    def _busyTimelineStateQuery(cls, resourceIDs):
+        bts = schema.CALENDAR_BUSY_TIMELINE_STATE
+        return Select(
+            [bts.CALENDAR_RESOURCE_ID, bts.REVISION, bts.START_DATE, bts.END_DATE],
+            From=bts,
+            Where=bts.CALENDAR_RESOURCE_ID.In(Parameter("resourceIDs", len(resourceIDs))),
+        )
+
+    @classmethod
+    def _busyTimelineQuery(cls, resourceIDs):
+        bt = schema.CALENDAR_BUSY_TIMELINE
+        return Select(
+            [bt.CALENDAR_RESOURCE_ID, bt.FBTYPE, bt.START_DATE, bt.END_DATE],
+            From=bt,
+            Where=bt.CALENDAR_RESOURCE_ID.In(Parameter("resourceIDs", len(resourceIDs))).And(
+                bt.START_DATE < Parameter("endDate")).And(
+                bt.END_DATE > Parameter("startDate")),
+        )
+
+    @classmethod
+    @inlineCallbacks
+    def busyTimelines(cls, calendars, timerange):
+        """
+        Get the pre-merged busy time of the calendar owner for a set of calendars, for each
+        calendar whose busy timeline is up to date and covers the time range.
+
+        @param calendars: the calendars to look up, all using the same transaction
+        @type calendars: C{list} of L{Calendar}
+        @param timerange: the UTC time range to get the busy time for
+        @type timerange: L{Period}
+
+        @return: a C{dict} mapping calendar resource-id to a C{list} of C{tuple} of
+            (fbtype, start, end) for each busy period overlapping the time range, with the
+            fbtype as a single character and the start and end as L{DateTime}s
+        @rtype: C{dict}
+        """
+
+        # Pre-load sync tokens for all calendars in one query
+        missing = dict([(calendar.id(), calendar) for calendar in calendars if calendar._syncTokenRevision is None])
+        if missing:
+            revisions = yield calendars[0].childSyncTokenRevisions(calendars[0].viewerHome(), missing.keys())
+            for resourceID, calendar in missing.items():
+                calendar._syncTokenRevision = revisions.get(resourceID)
+
+        startDate = pyCalendarToSQLTimestamp(normalizeToUTC(timerange.getStart()))
+        endDate = pyCalendarToSQLTimestamp(normalizeToUTC(timerange.getEnd()))
+
+        calendarsByID = dict([(calendar.id(), calendar) for calendar in calendars])
+        resourceIDs = calendarsByID.keys()
+        valid = []
+        for resourceID, revision, timelineStart, timelineEnd in (yield cls._busyTimelineStateQuery(resourceIDs).on(
+            calendars[0]._txn, resourceIDs=resourceIDs
+        )):
+            if (
+                revision == calendarsByID[resourceID]._syncTokenRevision and
+                parseSQLTimestamp(timelineStart) <= startDate and
+                parseSQLTimestamp(timelineEnd) >= endDate
+            ):
+                valid.append(resourceID)
+
+        results = dict([(resourceID, []) for resourceID in valid])
+        if valid:
+            for resourceID, fbtype, periodStart, periodEnd in (yield cls._busyTimelineQuery(valid).on(
+                calendars[0]._txn, resourceIDs=valid, startDate=startDate, endDate=endDate
+            )):
+                results[resourceID].append((
+                    indexfbtype_to_icalfbtype[fbtype],
+                    parseSQLTimestampToPyCalendar(periodStart, withTimezone=Timezone.UTCTimezone),
+                    parseSQLTimestampToPyCalendar(periodEnd, withTimezone=Timezone.UTCTimezone),
+                ))
+
+        returnValue(results)
+
+    class CalendarBusyTimelineWork(AggregatedWorkItem, fromTable(schema.CALENDAR_BUSY_TIMELINE_WORK)):
+        """
+        A L{WorkItem} that rebuilds the busy timeline of a calendar.
+        """
+
+        group = property(lambda self: (self.table.CALENDAR_RESOURCE_ID == self.calendarResourceID))
+        default_priority = WORK_PRIORITY_LOW
+        default_weight = WORK_WEIGHT_3
+
+        @inlineCallbacks
+        def doWork(self):
+
+            log.debug("Rebuild busy timeline for calendar with resource-id: {rid}", rid=self.calendarResourceID)
+
+            home = (yield self.transaction.calendarHomeWithResourceID(self.homeResourceID))
+            calendar = (yield home.childWithID(self.calendarResourceID)) if home is not None else None
+            if calendar is None:
+                returnValue(None)
+
+            yield calendar.rebuildBusyTimeline()
+
     @inlineCallbacks
     def splitCollectionByComponentTypes(self):
         """
@@ -2574,6 +2940,44 @@ accessMode_to_type = {
 accesstype_to_accessMode = dict([(v, k) for k, v in accessMode_to_type.items()])
 
 
+def _indexTimestamp(value):
+    """
+    Normalize a TIME_RANGE/PERUSER timestamp value, either as generated for an insert
+    or as returned by the database, so that the two can be compared.
+    """
+    if value is None:
+        return None
+    if isinstance(value, basestring):
+        value = parseSQLTimestamp(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    return value
+
+
+def _instanceDetailsKey(details):
+    """
+    Generate a hashable key for the TIME_RANGE row and PERUSER rows of an instance,
+    as returned by L{CalendarObject._instanceDetails}, normalizing any differences
+    in how the database returns column values.
+    """
+    timeRangeRow, perUserRows = details
+    calendarID, resourceID, floating, start, end, fbtype, transp = timeRangeRow
+    return (
+        (
+            calendarID,
+            bool(floating),
+            _indexTimestamp(start),
+            _indexTimestamp(end),
+            int(fbtype),
+            bool(transp),
+        ),
+        frozenset([
+            (useruid, bool(usertransp), _indexTimestamp(adjusted_start), _indexTimestamp(adjusted_end),)
+            for useruid, usertransp, adjusted_start, adjusted_end in perUserRows
+        ]),
+    )
+
+
 class CalendarObject(CommonObjectResource, CalendarObjectBase):
     implements(ICalendarObject)
 
@@ -2598,6 +3002,7 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
         # Component caching
         self._cachedComponent = None
         self._cachedCommponentPerUser = {}
+        self._componentFromStore = False
 
         self._lockedUID = False
 
@@ -3946,6 +4351,13 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
                 recurrenceLowerLimit = None
                 recurrenceLimit = DateTime(1900, 1, 1, 0, 0, 0, tzid=Timezone.UTCTimezone)
 
+        # When re-indexing an existing resource we can compare the new instances with the
+        # existing rows and only change the ones that differ, rather than wiping everything
+        incrementalIndexing = (
+            instanceIndexingRequired and doInstanceIndexing and
+            not inserting and config.FreeBusyIndexIncrementalUpdate
+        )
+
         co = self._objectSchema
         tr = schema.TIME_RANGE
 
@@ -3956,6 +4368,7 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
             self._objectText = componentText
             self._cachedComponent = component
             self._cachedCommponentPerUser = {}
+            self._componentFromStore = False
 
             organizer = component.getOrganizer()
             if not organizer:
@@ -4031,7 +4444,7 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
                 )[0][0])
 
                 # Need to wipe the existing time-range for this and rebuild if required
-                if instanceIndexingRequired:
+                if instanceIndexingRequired and not incrementalIndexing:
                     yield Delete(
                         From=tr,
                         Where=tr.CALENDAR_OBJECT_RESOURCE_ID == self._resourceID
@@ -4050,20 +4463,24 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
             ).on(txn)
 
             # Need to wipe the existing time-range for this and rebuild
-            yield Delete(
-                From=tr,
-                Where=tr.CALENDAR_OBJECT_RESOURCE_ID == self._resourceID
-            ).on(txn)
+            if not incrementalIndexing:
+                yield Delete(
+                    From=tr,
+                    Where=tr.CALENDAR_OBJECT_RESOURCE_ID == self._resourceID
+                ).on(txn)
 
         if instanceIndexingRequired and doInstanceIndexing:
-            yield self._addInstances(component, instances, truncateLowerLimit, isInboxItem, txn)
+            yield self._addInstances(component, instances, truncateLowerLimit, isInboxItem, txn, incrementalIndexing)
 
         yield self.removeOldEventGroupLink(component, instances, inserting, txn)
 
     @inlineCallbacks
-    def _addInstances(self, component, instances, truncateLowerLimit, isInboxItem, txn):
+    def _addInstances(self, component, instances, truncateLowerLimit, isInboxItem, txn, incremental=False):
         """
-        Add the set of supplied instances to the store.
+        Add the set of supplied instances to the store. All the TIME_RANGE rows (and
+        any dependent PERUSER rows) are written using multi-row inserts rather than
+        one insert per instance. When C{incremental} is C{True} the existing rows for
+        the resource are kept and only the differences are applied.
 
         @param component: the component whose instances are being added
         @type component: L{Component}
@@ -4075,9 +4492,12 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
         @type isInboxItem: C{bool}
         @param txn: transaction to use
         @type txn: L{Transaction}
+        @param incremental: whether existing rows are to be updated in place
+        @type incremental: C{bool}
         """
 
         # TIME_RANGE table update
+        details = []
         lowerLimitApplied = False
         for key in instances:
             instance = instances[key]
@@ -4094,14 +4514,14 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
                 lowerLimitApplied = True
                 continue
 
-            yield self._addInstanceDetails(component, instance.rid, start, end, floating, transp, fbtype, isInboxItem, txn)
+            details.append(self._instanceDetails(component, instance.rid, start, end, floating, transp, fbtype, isInboxItem))
 
         # For truncated items we insert a tomb stone lower bound so that a time-range
         # query with just an end bound will match
         if lowerLimitApplied or instances.lowerLimit and len(instances.instances) == 0:
             start = DateTime(1901, 1, 1, 0, 0, 0, tzid=Timezone.UTCTimezone)
             end = DateTime(1901, 1, 1, 1, 0, 0, tzid=Timezone.UTCTimezone)
-            yield self._addInstanceDetails(component, None, start, end, False, True, "UNKNOWN", isInboxItem, txn)
+            details.append(self._instanceDetails(component, None, start, end, False, True, "UNKNOWN", isInboxItem))
 
         # Special - for unbounded recurrence we insert a value for "infinity"
         # that will allow an open-ended time-range to always match it.
@@ -4110,25 +4530,36 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
         if component.isRecurringUnbounded() or instances.limit and len(instances.instances) == 0:
             start = DateTime(2100, 1, 1, 0, 0, 0, tzid=Timezone.UTCTimezone)
             end = DateTime(2100, 1, 1, 1, 0, 0, tzid=Timezone.UTCTimezone)
-            yield self._addInstanceDetails(component, None, start, end, False, True, "UNKNOWN", isInboxItem, txn)
+            details.append(self._instanceDetails(component, None, start, end, False, True, "UNKNOWN", isInboxItem))
 
-    @inlineCallbacks
-    def _addInstanceDetails(self, component, rid, start, end, floating, transp, fbtype, isInboxItem, txn):
+        if incremental:
+            yield self._updateInstanceDetails(details, txn)
+        else:
+            yield self._insertInstanceDetails(details, txn)
 
-        tr = schema.TIME_RANGE
-        tpy = schema.PERUSER
+    def _instanceDetails(self, component, rid, start, end, floating, transp, fbtype, isInboxItem):
+        """
+        Determine the TIME_RANGE column values and any PERUSER column values for
+        one instance.
+
+        @return: a tuple of the TIME_RANGE row values (in L{_timeRangeColumns} order)
+            and a list of PERUSER row values (in L{_perUserColumns} order, without
+            the TIME_RANGE_INSTANCE_ID column)
+        @rtype: C{tuple} of (C{tuple}, C{list})
+        """
 
-        instanceid = (yield Insert({
-            tr.CALENDAR_RESOURCE_ID: self._calendar._resourceID,
-            tr.CALENDAR_OBJECT_RESOURCE_ID: self._resourceID,
-            tr.FLOATING: floating,
-            tr.START_DATE: pyCalendarToSQLTimestamp(start),
-            tr.END_DATE: pyCalendarToSQLTimestamp(end),
-            tr.FBTYPE: icalfbtype_to_indexfbtype.get(fbtype, icalfbtype_to_indexfbtype["FREE"]),
-            tr.TRANSPARENT: transp,
-        }, Return=tr.INSTANCE_ID).on(txn))[0][0]
+        timeRangeRow = (
+            self._calendar._resourceID,
+            self._resourceID,
+            floating,
+            pyCalendarToSQLTimestamp(start),
+            pyCalendarToSQLTimestamp(end),
+            icalfbtype_to_indexfbtype.get(fbtype, icalfbtype_to_indexfbtype["FREE"]),
+            transp,
+        )
 
         # Don't do transparency for inbox items - we never do freebusy on inbox
+        perUserRows = []
         if not isInboxItem:
             peruserdata = component.perUserData(rid)
             for useruid, (usertransp, adjusted_start, adjusted_end) in peruserdata:
@@ -4142,13 +4573,133 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
                         return None
 
                 if usertransp != transp or adjusted_start is not None or adjusted_end is not None:
-                    (yield Insert({
-                        tpy.TIME_RANGE_INSTANCE_ID: instanceid,
-                        tpy.USER_ID: useruid if useruid else ".",
-                        tpy.TRANSPARENT: usertransp,
-                        tpy.ADJUSTED_START_DATE: _adjustDateTime(start, adjusted_start, add_duration=False),
-                        tpy.ADJUSTED_END_DATE: _adjustDateTime(end, adjusted_end, add_duration=True),
-                    }).on(txn))
+                    perUserRows.append((
+                        useruid if useruid else ".",
+                        usertransp,
+                        _adjustDateTime(start, adjusted_start, add_duration=False),
+                        _adjustDateTime(end, adjusted_end, add_duration=True),
+                    ))
+
+        return timeRangeRow, perUserRows
+
+    @classproperty
+    def _timeRangeColumns(cls):
+        tr = schema.TIME_RANGE
+        return [
+            tr.CALENDAR_RESOURCE_ID,
+            tr.CALENDAR_OBJECT_RESOURCE_ID,
+            tr.FLOATING,
+            tr.START_DATE,
+            tr.END_DATE,
+            tr.FBTYPE,
+            tr.TRANSPARENT,
+        ]
+
+    @classproperty
+    def _perUserColumns(cls):
+        tpy = schema.PERUSER
+        return [
+            tpy.TIME_RANGE_INSTANCE_ID,
+            tpy.USER_ID,
+            tpy.TRANSPARENT,
+            tpy.ADJUSTED_START_DATE,
+            tpy.ADJUSTED_END_DATE,
+        ]
+
+    @inlineCallbacks
+    def _insertInstanceDetails(self, details, txn):
+        """
+        Write the TIME_RANGE and PERUSER rows for a set of instances. When PERUSER
+        rows are needed the INSTANCE_ID values are allocated from the sequence up
+        front, so that the dependent rows can be written in bulk too. On Oracle
+        the values are always allocated up front, since the column has no default
+        there and a sequence in a multi-row insert is only evaluated once.
+
+        @param details: the result of L{_instanceDetails} for each instance
+        @type details: C{list}
+        @param txn: transaction to use
+        @type txn: L{Transaction}
+        """
+
+        if not details:
+            returnValue(None)
+
+        tr = schema.TIME_RANGE
+        batchSize = config.FreeBusyIndexInsertBatchSize
+
+        if txn.dbtype.dialect == ORACLE_DIALECT or any([perUserRows for _ignore_timeRangeRow, perUserRows in details]):
+            instanceIDs = yield allocateSequenceValues(txn, schema.INSTANCE_ID_SEQ.model.name, len(details))
+            timeRangeRows = []
+            perUserRows = []
+            for instanceID, (timeRangeRow, userRows) in zip(instanceIDs, details):
+                timeRangeRows.append((instanceID,) + timeRangeRow)
+                perUserRows.extend([(instanceID,) + userRow for userRow in userRows])
+            yield bulkInsert(txn, tr, [tr.INSTANCE_ID] + self._timeRangeColumns, timeRangeRows, batchSize)
+            yield bulkInsert(txn, schema.PERUSER, self._perUserColumns, perUserRows, batchSize)
+        else:
+            timeRangeRows = [timeRangeRow for timeRangeRow, _ignore_perUserRows in details]
+            yield bulkInsert(txn, tr, self._timeRangeColumns, timeRangeRows, batchSize)
+
+    @classproperty
+    def _existingInstancesQuery(cls):
+        """
+        DAL query to load the existing TIME_RANGE rows, and any PERUSER rows, for a resource.
+        """
+        tr = schema.TIME_RANGE
+        tpy = schema.PERUSER
+        return Select(
+            [tr.INSTANCE_ID] + cls._timeRangeColumns + cls._perUserColumns[1:],
+            From=tr.join(tpy, tr.INSTANCE_ID == tpy.TIME_RANGE_INSTANCE_ID, "left outer"),
+            Where=tr.CALENDAR_OBJECT_RESOURCE_ID == Parameter("resourceID"),
+        )
+
+    @inlineCallbacks
+    def _updateInstanceDetails(self, details, txn):
+        """
+        Make the stored TIME_RANGE and PERUSER rows for this resource match the supplied
+        set of instances, by removing only the existing rows that no longer match and
+        adding only the new rows that are not already present. An instance whose details
+        have changed is removed and re-added.
+
+        @param details: the result of L{_instanceDetails} for each instance
+        @type details: C{list}
+        @param txn: transaction to use
+        @type txn: L{Transaction}
+        """
+
+        # Group the existing rows by instance
+        existingRows = collections.OrderedDict()
+        for row in (yield self._existingInstancesQuery.on(txn, resourceID=self._resourceID)):
+            instanceID, timeRangeRow, userRow = row[0], tuple(row[1:8]), tuple(row[8:])
+            rowDetails = existingRows.setdefault(instanceID, (timeRangeRow, []))
+            if userRow[0] is not None:
+                rowDetails[1].append(userRow)
+
+        existing = collections.defaultdict(list)
+        for instanceID, rowDetails in existingRows.items():
+            existing[_instanceDetailsKey(rowDetails)].append(instanceID)
+
+        # Anything that matches an existing row is left alone
+        added = []
+        for rowDetails in details:
+            instanceIDs = existing.get(_instanceDetailsKey(rowDetails))
+            if instanceIDs:
+                instanceIDs.pop()
+            else:
+                added.append(rowDetails)
+
+        removed = [instanceID for unmatched in existing.values() for instanceID in unmatched]
+        if removed:
+            tr = schema.TIME_RANGE
+            batchSize = config.FreeBusyIndexInsertBatchSize
+            for offset in range(0, len(removed), batchSize):
+                batch = removed[offset:offset + batchSize]
+                yield Delete(
+                    From=tr,
+                    Where=tr.INSTANCE_ID.In(Parameter("instanceIDs", len(batch))),
+                ).on(txn, instanceIDs=batch)
+
+        yield self._insertInstanceDetails(added, txn)
 
     @inlineCallbacks
     def copyMetadata(self, other):
@@ -4184,39 +4735,47 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
 
         if self._cachedComponent is None:
 
-            text = yield self._text()
+            # Only up to date data is shared via the process-wide cache
+            cache = self._sharedComponentCache()
+            component = cache.get(self._resourceID, self._md5) if cache is not None else None
 
-            try:
-                component = Component.fromString(text)
-            except InvalidICalendarDataError, e:
-                # This is a really bad situation, so do raise
-                raise InternalDataStoreError(
-                    "Data corruption detected ({0}) in id: {1}".format(
-                        e, self._resourceID
+            if component is None:
+                text = yield self._text()
+
+                try:
+                    component = Component.fromString(text)
+                except InvalidICalendarDataError, e:
+                    # This is a really bad situation, so do raise
+                    raise InternalDataStoreError(
+                        "Data corruption detected ({0}) in id: {1}".format(
+                            e, self._resourceID
+                        )
                     )
-                )
 
-            # Fix any bogus data we can
-            fixed, unfixed = component.validCalendarData(doFix=True, doRaise=False)
+                # Fix any bogus data we can
+                fixed, unfixed = component.validCalendarData(doFix=True, doRaise=False)
 
-            if unfixed:
-                self.log.error(
-                    "Calendar data id={id} had unfixable problems:\n  {problems}",
-                    id=self._resourceID, problems="\n  ".join(unfixed),
-                )
+                if unfixed:
+                    self.log.error(
+                        "Calendar data id={id} had unfixable problems:\n  {problems}",
+                        id=self._resourceID, problems="\n  ".join(unfixed),
+                    )
 
-            if fixed:
-                self.log.error(
-                    "Calendar data id={id} had fixable problems:\n  {problems}",
-                    id=self._resourceID, problems="\n  ".join(fixed),
-                )
+                if fixed:
+                    self.log.error(
+                        "Calendar data id={id} had fixable problems:\n  {problems}",
+                        id=self._resourceID, problems="\n  ".join(fixed),
+                    )
 
-            # Check for on-demand data upgrade
-            if self._dataversion < self._currentDataVersion:
-                yield self.upgradeData(component, doUpdate)
+                # Check for on-demand data upgrade
+                if self._dataversion < self._currentDataVersion:
+                    yield self.upgradeData(component, doUpdate)
+                elif cache is not None:
+                    cache.set(self._resourceID, self._md5, component, len(text))
 
             self._cachedComponent = component
             self._cachedCommponentPerUser = {}
+            self._componentFromStore = True
 
         returnValue(self._cachedComponent)
 
@@ -4236,11 +4795,72 @@ class CalendarObject(CommonObjectResource, CalendarObjectBase):
             user_uuid = self._parentCollection.viewerHome().uid()
 
         if user_uuid not in self._cachedCommponentPerUser:
-            caldata = yield self.component()
-            filtered = PerUserDataFilter(user_uuid).filter(caldata.duplicate())
+            # The shared per-user views can only be used if this object's data
+            # has not been changed in this transaction
+            cache = None
+            if self._cachedComponent is None or self._componentFromStore:
+                cache = self._sharedComponentCache()
+            filtered = cache.getForUser(self._resourceID, self._md5, user_uuid) if cache is not None else None
+            if filtered is None:
+                caldata = yield self.component()
+                filtered = PerUserDataFilter(user_uuid).filter(caldata.duplicate())
+                if cache is not None:
+                    cache.setForUser(self._resourceID, self._md5, user_uuid, filtered, self._size or 0)
             self._cachedCommponentPerUser[user_uuid] = filtered
         returnValue(self._cachedCommponentPerUser[user_uuid])
 
+    def _sharedComponentCache(self):
+        """
+        Return the process-wide L{ComponentCache} if it can be used for this
+        object's data, i.e. it is enabled and the stored data is at the current
+        data version (older data has to go through an upgrade first).
+
+        @rtype: L{ComponentCache} or C{None}
+        """
+        if self._resourceID is None or self._md5 is None or self._dataversion < self._currentDataVersion:
+            return None
+        return componentCache()
+
+    _filteredTextCacher = Memcacher("PerUserText")
+
+    @inlineCallbacks
+    def filteredText(self, accessUID, isowner, format=None, includeTimezones=True):
+        """
+        See L{CalendarObjectBase.filteredText}. When enabled via
+        C{config.PerUserTextCache}, the serialized data is cached in memcache
+        keyed by resource-id, md5, viewer and the filtering options, so that
+        reading unchanged data needs no iCalendar parsing at all. Entries are
+        implicitly invalidated when the md5 changes.
+        """
+
+        if accessUID is None:
+            accessUID = self._parentCollection.viewerHome().uid()
+
+        # Only data that has not been changed in this transaction can be shared
+        options = config.PerUserTextCache
+        if (
+            not options.Enabled or self._resourceID is None or self._md5 is None or
+            (self._cachedComponent is not None and not self._componentFromStore)
+        ):
+            text = yield super(CalendarObject, self).filteredText(accessUID, isowner, format, includeTimezones)
+            returnValue(text)
+
+        key = "{}:{}:{}:{}:{}:{}:{}".format(
+            self._resourceID,
+            self._md5,
+            accessUID,
+            self.accessMode,
+            "owner" if isowner else "",
+            format if format else "text/calendar",
+            "tz" if includeTimezones else "",
+        )
+        text = yield self._filteredTextCacher.get(key)
+        if text is None:
+            text = yield super(CalendarObject, self).filteredText(accessUID, isowner, format, includeTimezones)
+            if len(text) <= options.MaxSize:
+                yield self._filteredTextCacher.set(key, text, expireTime=options.ExpireSeconds)
+        returnValue(text)
+
     @inlineCallbacks
     def upgradeData(self, component, doUpdate=False):
         """
@@ -41,6 +41,7 @@ from twistedcaldav.stdconfig import config
 from twistedcaldav.dateops import datetimeMktime
 from twistedcaldav.ical import Component, normalize_iCalStr, diff_iCalStrs, Property
 from twistedcaldav.instance import InvalidOverriddenInstanceError
+from twistedcaldav.memcacher import Memcacher
 from twistedcaldav.timezones import TimezoneCache, readVTZ, TimezoneException
 
 from txdav.base.propertystore.base import PropertyName
@@ -52,7 +53,8 @@ from txdav.caldav.datastore.scheduling.implicit import ImplicitScheduler
 from txdav.caldav.datastore.scheduling.itip import iTIPRequestStatus
 from txdav.caldav.datastore.scheduling.processing import ImplicitProcessor
 from txdav.caldav.datastore.scheduling.scheduler import ScheduleResponseQueue
-from txdav.caldav.datastore.sql import CalendarStoreFeatures, CalendarObject
+from txdav.caldav.datastore.sql import CalendarStoreFeatures, CalendarObject, \
+    Calendar
 from txdav.common.datastore.sql import ECALENDARTYPE, CommonObjectResource, \
     CommonStoreTransactionMonitor
 from txdav.common.datastore.sql_tables import schema, _BIND_MODE_DIRECT, \
@@ -63,7 +65,8 @@ from txdav.caldav.datastore.test.test_file import setUpCalendarStore
 from txdav.caldav.datastore.test.util import DateTimeSubstitutionsMixin
 from txdav.common.datastore.test.util import populateCalendarsFrom, \
     CommonCommonTests, updateToCurrentYear
-from txdav.caldav.datastore.util import _migrateCalendar, migrateHome
+from txdav.caldav.datastore import util as sql_util
+from txdav.caldav.datastore.util import _migrateCalendar, migrateHome, ComponentCache
 from txdav.caldav.icalendarstore import ComponentUpdateState, InvalidDefaultCalendar, \
     InvalidSplit, UnknownTimezone
 from txdav.common.icommondatastore import NoSuchObjectResourceError, \
@@ -1531,6 +1534,149 @@ END:VCALENDAR
         yield obj1.remove()
         yield self.commit()
 
+    @inlineCallbacks
+    def test_loadObjectResourcesText(self):
+        """
+        L{CommonHomeChild.loadObjectResourcesText} loads the text of all the specified object
+        resources, in batches.
+        """
+
+        self.patch(CommonObjectResource, "BATCH_LOAD_SIZE", 2)
+
+        cal = yield self.calendarUnderTest()
+        resources = yield cal.objectResourcesWithNames(("1.ics", "2.ics", "3.ics",))
+        self.assertEqual(len(resources), 3)
+        self.assertTrue(all([resource._textData is None for resource in resources]))
+
+        yield cal.loadObjectResourcesText(resources)
+        for resource in resources:
+            self.assertTrue(resource._textData is not None)
+            component = yield resource.component()
+            self.assertEqual(component.resourceUID(), resource.uid())
+        yield self.commit()
+
+    @inlineCallbacks
+    def test_componentCache(self):
+        """
+        L{CalendarObject.component} and L{CalendarObject.componentForUser} use the
+        process-wide L{ComponentCache} across transactions, handing out copies.
+        """
+
+        self.patch(config.ComponentCache, "Enabled", True)
+        cache = ComponentCache(10, 10)
+        self.patch(sql_util, "_componentCache", cache)
+
+        cobj = yield self.calendarObjectUnderTest()
+        component = yield cobj.component()
+        filtered = yield cobj.componentForUser("user01")
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["user-misses"], 1)
+        yield self.commit()
+
+        cobj = yield self.calendarObjectUnderTest()
+        filtered2 = yield cobj.componentForUser("user01")
+        self.assertEqual(cache.stats()["user-hits"], 1)
+        self.assertEqual(str(filtered2), str(filtered))
+        self.assertFalse(filtered2 is filtered)
+        component2 = yield cobj.component()
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(str(component2), str(component))
+        self.assertFalse(component2 is component)
+        yield self.commit()
+
+    @inlineCallbacks
+    def test_filteredTextCache(self):
+        """
+        L{CalendarObject.filteredText} caches serialized data across transactions
+        without parsing, and a change to the data is seen.
+        """
+
+        self.patch(config.PerUserTextCache, "Enabled", True)
+        self.patch(Memcacher, "allowTestCache", True)
+        self.patch(CalendarObject, "_filteredTextCacher", Memcacher("PerUserText"))
+
+        cobj = yield self.calendarObjectUnderTest()
+        text = yield cobj.filteredText(None, True)
+        self.assertTrue(cobj._cachedComponent is not None)
+        yield self.commit()
+
+        cobj = yield self.calendarObjectUnderTest()
+        cached = yield cobj.filteredText(None, True)
+        self.assertEqual(cached, text)
+        self.assertTrue(cobj._cachedComponent is None)
+
+        component = (yield cobj.component()).duplicate()
+        component.mainComponent().replaceProperty(Property("SUMMARY", "Changed"))
+        yield cobj.setComponent(component)
+        yield self.commit()
+
+        cobj = yield self.calendarObjectUnderTest()
+        changed = yield cobj.filteredText(None, True)
+        self.assertNotEqual(changed, text)
+        self.assertTrue("SUMMARY:Changed" in changed)
+        yield self.commit()
+
+    @inlineCallbacks
+    def test_syncTokenCache(self):
+        """
+        L{Calendar.syncTokenRevision} caches the revision across transactions, and
+        the cached value is updated when the calendar changes.
+        """
+
+        self.patch(config.SyncTokenCache, "Enabled", True)
+        self.patch(Memcacher, "allowTestCache", True)
+        self.patch(Calendar, "_syncTokenCacher", Memcacher("SyncTokenRevision"))
+
+        calendar = yield self.calendarUnderTest()
+        revision = yield calendar.syncTokenRevision()
+        cached = yield Calendar._syncTokenCacher.get(calendar._syncTokenCacheKey())
+        self.assertEqual(cached, str(revision))
+        yield self.commit()
+
+        cobj = yield self.calendarObjectUnderTest()
+        yield cobj.remove()
+        yield self.commit()
+
+        calendar = yield self.calendarUnderTest()
+        key = calendar._syncTokenCacheKey()
+        changed = yield calendar.syncTokenRevision(cached=False)
+        self.assertTrue(changed > revision)
+        cached = yield Calendar._syncTokenCacher.get(key)
+        self.assertEqual(cached, str(changed))
+
+        # A revision read before the change was committed does not replace the new one
+        yield calendar._updateSyncTokenCache(key, revision)
+        cached = yield Calendar._syncTokenCacher.get(key)
+        self.assertEqual(cached, str(changed))
+
+        # A stale cached value is bypassed when refreshing the token
+        yield Calendar._syncTokenCacher.set(key, str(revision))
+        stale = yield calendar.syncTokenRevision()
+        self.assertEqual(stale, revision)
+        token = yield calendar.refreshSyncToken()
+        self.assertEqual(token, "%s_%s" % (calendar.id(), changed,))
+        yield self.commit()
+
+    @inlineCallbacks
+    def test_listObjectResourcesAfter(self):
+        """
+        L{CommonHomeChild.listObjectResourcesAfter} returns pages of sorted names from
+        the store, whether or not all the names have already been loaded.
+        """
+
+        calendar = yield self.calendarUnderTest()
+        names = yield calendar.listObjectResourcesAfter("", 2)
+        self.assertEqual(len(names), 2)
+        rest = yield calendar.listObjectResourcesAfter(names[-1])
+        allNames = yield calendar.listObjectResources()
+        self.assertEqual(names + rest, allNames)
+
+        names = yield calendar.listObjectResourcesAfter("", 2)
+        self.assertEqual(names, allNames[:2])
+        rest = yield calendar.listObjectResourcesAfter(names[-1])
+        self.assertEqual(rest, allNames[2:])
+        yield self.commit()
+
     @inlineCallbacks
     def test_loadObjectResourcesWithName(self):
         """
@@ -2376,6 +2522,37 @@ END:VCALENDAR
         token = yield calendar.syncToken()
         self.assertTrue(token is not None)
 
+    @inlineCallbacks
+    def test_loadSnapshot(self):
+        """
+        Test that L{CommonHome.loadSnapshot} loads owned and shared children, with the
+        owner details of the shared ones, and that later lookups use the loaded children.
+        """
+        yield self.homeUnderTest(name="user02", create=True)
+        cal = yield self.calendarUnderTest(home="user01", name="calendar")
+        shareeView = yield cal.directShareWithUser("user02")
+        shareName = shareeView.name()
+        yield self.commit()
+
+        home = yield self.homeUnderTest(name="user02")
+        yield home.loadSnapshot()
+        self.assertTrue(home._childrenLoaded)
+
+        shared = yield home.childWithName(shareName)
+        self.assertTrue(shared is not None)
+        self.assertTrue(shared is home._children[home._childrenKey(False)][shareName])
+        self.assertEqual(shared.ownerHome().uid(), "user01")
+        self.assertEqual(shared._ownerName, "calendar")
+
+        owned = yield home.childWithName("calendar")
+        self.assertTrue(owned is not None)
+        self.assertEqual(owned.ownerHome().uid(), "user02")
+
+        # A second call must not reload
+        children = home._children
+        yield home.loadSnapshot()
+        self.assertTrue(home._children is children)
+
     @inlineCallbacks
     def test_removeAfterRevisionCleanup(self):
         """
@@ -8980,6 +9157,52 @@ END:VCALENDAR
 
         self.assertEqual(self.trcount, 2)
 
+    @inlineCallbacks
+    def _instanceRows(self):
+        cobj = yield self.calendarObjectUnderTest()
+        tr = schema.TIME_RANGE
+        rows = yield Select(
+            [tr.INSTANCE_ID, tr.START_DATE, tr.END_DATE],
+            From=tr,
+            Where=tr.CALENDAR_OBJECT_RESOURCE_ID == cobj._resourceID,
+        ).on(self.transactionUnderTest())
+        yield self.commit()
+        returnValue(dict([(row[0], (parseSQLTimestamp(row[1]), parseSQLTimestamp(row[2]),)) for row in rows]))
+
+    @inlineCallbacks
+    def test_updatePUT_incremental(self):
+        """
+        Test that a TIME_RANGE update only changes the instances that differ
+        """
+
+        self.patch(config, "FreeBusyIndexIncrementalUpdate", True)
+
+        cal = yield self.calendarUnderTest()
+        yield cal.createObjectResourceWithName("1.ics", Component.fromString(self.EVENT7.format(**self.dtsubs)))
+        yield self.commit()
+        before = yield self._instanceRows()
+
+        # Remove the first instance - only that row is removed
+        cobj = yield self.calendarObjectUnderTest()
+        yield cobj.setComponent(Component.fromString(self.EVENT9.format(**self.dtsubs)))
+        yield self.commit()
+        after = yield self._instanceRows()
+
+        self.assertEqual(self.trcount, 2)
+        self.assertEqual(len(after), len(before) - 1)
+        self.assertTrue(set(after.keys()).issubset(set(before.keys())))
+
+        # Result is the same as a full rebuild
+        self.patch(config, "FreeBusyIndexIncrementalUpdate", False)
+        self.patch(config, "FreeBusyIndexSmartUpdate", False)
+        cobj = yield self.calendarObjectUnderTest()
+        yield cobj.setComponent(Component.fromString(self.EVENT9.format(**self.dtsubs)))
+        yield self.commit()
+        rebuilt = yield self._instanceRows()
+
+        self.assertEqual(sorted(after.values()), sorted(rebuilt.values()))
+        self.assertTrue(set(after.keys()).isdisjoint(set(rebuilt.keys())))
+
     INVITE1 = """BEGIN:VCALENDAR
 VERSION:2.0
 PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
@@ -22,6 +22,7 @@ from twisted.trial.unittest import TestCase
 from twistedcaldav import customxml
 from twistedcaldav.stdconfig import config
 from txdav.base.propertystore.base import PropertyName
+from txdav.common.datastore.sql import CommonHomeChild
 from txdav.common.datastore.sql_tables import _BIND_MODE_DIRECT
 from txdav.common.datastore.sql_tables import _BIND_MODE_GROUP
 from txdav.common.datastore.sql_tables import _BIND_MODE_GROUP_READ
@@ -1869,3 +1870,33 @@ class SharingRevisions(BaseSharingTests):
             self.assertEqual(len(changed), 0)
             self.assertEqual(len(deleted), 0)
             self.assertEqual(len(invalid), 0)
+
+    @inlineCallbacks
+    def test_sharedRevisionsBatched(self):
+        """
+        Verify that home-level resourceNamesSinceRevision finds changes in shared collections
+        with a single revision query.
+        """
+        sharedName = yield self._createShare()
+        otherCal = yield self.calendarUnderTest(home="user02", name=sharedName)
+        bindRevision = otherCal._bindRevision
+        yield self.commit()
+
+        cobj = yield self.calendarObjectUnderTest(home="user01", calendar_name="calendar", name="cal1.ics")
+        yield cobj.remove()
+        yield self.commit()
+
+        queries = []
+        original = CommonHomeChild._sharedChangesQuery.im_func
+
+        def _sharedChangesQuery(cls, count):
+            queries.append(count)
+            return original(cls, count)
+        self.patch(CommonHomeChild, "_sharedChangesQuery", classmethod(_sharedChangesQuery))
+
+        otherHome = yield self.homeUnderTest(name="user02")
+        changed, deleted, invalid = yield otherHome.resourceNamesSinceRevision(bindRevision, "infinity")
+        self.assertTrue(sharedName + "/" in changed)
+        self.assertEqual(deleted, [sharedName + "/cal1.ics"])
+        self.assertEqual(len(invalid), 0)
+        self.assertEqual(queries, [1])
@@ -25,13 +25,13 @@ from txweb2.http_headers import MimeType
 
 from twisted.internet.defer import inlineCallbacks
 
-from twistedcaldav.ical import Component
+from twistedcaldav.ical import Component, Property
 from twistedcaldav.test.util import TestCase
 
 from txdav.common.datastore.test.util import populateCalendarsFrom, CommonCommonTests
 
 from txdav.caldav.datastore.util import dropboxIDFromCalendarObject, \
-    StorageTransportBase, migrateHome
+    StorageTransportBase, migrateHome, ComponentCache
 
 from txdav.common.icommondatastore import HomeChildNameAlreadyExistsError
 
@@ -303,6 +303,69 @@ class StorageTransportTests(TestCase):
             self.assertEquals(item._dispositionName, filename)
 
 
+class ComponentCacheTests(TestCase):
+
+    data = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:12345-67890
+DTSTART:20071114T000000Z
+DTSTAMP:20071114T000000Z
+SUMMARY:Cached
+END:VEVENT
+END:VCALENDAR
+"""
+
+    def test_copies(self):
+        """
+        L{ComponentCache} never hands out the cached component itself.
+        """
+
+        cache = ComponentCache(2, 2)
+        component = Component.fromString(self.data)
+        cache.set(1, "abc", component, len(self.data))
+
+        # Changes to the original are not seen
+        component.mainComponent().replaceProperty(Property("SUMMARY", "Changed"))
+        cached = cache.get(1, "abc")
+        self.assertEqual(cached.mainComponent().propertyValue("SUMMARY"), "Cached")
+
+        # Changes to a returned copy are not seen
+        cached.mainComponent().replaceProperty(Property("SUMMARY", "Changed"))
+        self.assertEqual(cache.get(1, "abc").mainComponent().propertyValue("SUMMARY"), "Cached")
+
+        # Different md5 is a miss
+        self.assertTrue(cache.get(1, "def") is None)
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru(self):
+        """
+        L{ComponentCache} evicts the least recently used entries in each tier.
+        """
+
+        cache = ComponentCache(2, 1)
+        component = Component.fromString(self.data)
+        cache.set(1, "abc", component, 10)
+        cache.set(2, "abc", component, 20)
+        self.assertTrue(cache.get(1, "abc") is not None)
+        cache.set(3, "abc", component, 30)
+        self.assertTrue(cache.get(1, "abc") is not None)
+        self.assertTrue(cache.get(2, "abc") is None)
+        self.assertTrue(cache.get(3, "abc") is not None)
+        self.assertEqual(cache.stats()["bytes"], 40)
+
+        cache.setForUser(1, "abc", "user01", component, 10)
+        cache.setForUser(1, "abc", "user02", component, 10)
+        self.assertTrue(cache.getForUser(1, "abc", "user01") is None)
+        self.assertTrue(cache.getForUser(1, "abc", "user02") is not None)
+        self.assertEqual(cache.stats()["user-entries"], 1)
+
+        self.assertEqual(cache.statsSinceLast(), (4, 2, 50,))
+        self.assertEqual(cache.statsSinceLast(), (0, 0, 50,))
+
+
 class HomeMigrationTests(CommonCommonTests, BaseTestCase):
     """
     Tests for L{migrateHome}.
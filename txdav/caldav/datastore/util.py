@@ -19,6 +19,7 @@
 Utility logic common to multiple backend implementations.
 """
 
+from collections import OrderedDict
 import os
 
 from zope.interface.declarations import implements
@@ -417,6 +418,176 @@ def migrateHome(inHome, outHome, getComponent=lambda x: x.component(), merge=Fal
         yield outHome.splitCalendars()
 
 
+class ComponentCache(object):
+    """
+    A bounded, per-process LRU cache of parsed and validated calendar data,
+    keyed by calendar object resource-id and md5. Since the md5 changes
+    whenever the stored data changes, entries never need to be explicitly
+    invalidated - stale ones simply age out of the cache.
+
+    A second tier caches the per-user filtered views of each resource, keyed
+    additionally by the user's UID.
+
+    Cached components are never handed out directly: callers always get a
+    duplicate, so the cached copy can be shared across transactions without
+    any risk of one caller's changes leaking into another.
+    """
+
+    def __init__(self, size, perUserSize):
+        self.size = size
+        self.perUserSize = perUserSize
+        self._components = OrderedDict()
+        self._perUser = OrderedDict()
+        self._bytes = 0
+        self._perUserBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.perUserHits = 0
+        self.perUserMisses = 0
+        self._lastHits = 0
+        self._lastMisses = 0
+
+    def get(self, resourceID, md5):
+        """
+        Return a copy of the cached component for the specified resource.
+
+        @param resourceID: the resource-id of the calendar object
+        @type resourceID: C{int}
+        @param md5: the md5 of the calendar object's stored data
+        @type md5: C{str}
+
+        @return: the cached component or C{None} if not cached
+        @rtype: L{VComponent} or C{None}
+        """
+        component = self._get(self._components, (resourceID, md5,))
+        if component is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return component
+
+    def set(self, resourceID, md5, component, length):
+        """
+        Cache a copy of the parsed component for the specified resource.
+
+        @param resourceID: the resource-id of the calendar object
+        @type resourceID: C{int}
+        @param md5: the md5 of the calendar object's stored data
+        @type md5: C{str}
+        @param component: the parsed and validated calendar data
+        @type component: L{VComponent}
+        @param length: size of the calendar data, used to estimate memory use
+        @type length: C{int}
+        """
+        self._bytes += self._set(self._components, (resourceID, md5,), component, length, self.size)
+
+    def getForUser(self, resourceID, md5, user_uuid):
+        """
+        Return a copy of the cached per-user filtered component for the
+        specified resource.
+
+        @param user_uuid: the UID of the user the data was filtered for
+        @type user_uuid: C{str}
+
+        @return: the cached component or C{None} if not cached
+        @rtype: L{VComponent} or C{None}
+        """
+        component = self._get(self._perUser, (resourceID, md5, user_uuid,))
+        if component is None:
+            self.perUserMisses += 1
+        else:
+            self.perUserHits += 1
+        return component
+
+    def setForUser(self, resourceID, md5, user_uuid, component, length):
+        """
+        Cache a copy of the per-user filtered component for the specified
+        resource.
+
+        @param user_uuid: the UID of the user the data was filtered for
+        @type user_uuid: C{str}
+        """
+        self._perUserBytes += self._set(self._perUser, (resourceID, md5, user_uuid,), component, length, self.perUserSize)
+
+    def _get(self, cache, key):
+        try:
+            component, length = cache.pop(key)
+        except KeyError:
+            return None
+
+        # Re-insert to mark as most recently used
+        cache[key] = (component, length,)
+        return component.duplicate()
+
+    def _set(self, cache, key, component, length, limit):
+        """
+        Add an entry to one of the tiers, evicting the least recently used
+        entries when over the limit. Returns the change in estimated size.
+        """
+        delta = length
+        if key in cache:
+            delta -= cache.pop(key)[1]
+        cache[key] = (component.duplicate(), length,)
+        while len(cache) > limit:
+            delta -= cache.popitem(last=False)[1][1]
+        return delta
+
+    def clear(self):
+        self._components.clear()
+        self._perUser.clear()
+        self._bytes = 0
+        self._perUserBytes = 0
+
+    def stats(self):
+        """
+        Return a summary of cache use.
+
+        @rtype: C{dict}
+        """
+        return {
+            "entries": len(self._components),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "user-entries": len(self._perUser),
+            "user-bytes": self._perUserBytes,
+            "user-hits": self.perUserHits,
+            "user-misses": self.perUserMisses,
+        }
+
+    def statsSinceLast(self):
+        """
+        Return the number of hits and misses (across both tiers) since the
+        last call, together with the current estimated size of the cache. Used
+        to feed cache activity into the per-request access log stats.
+
+        @rtype: C{tuple} of (C{int}, C{int}, C{int})
+        """
+        hits = self.hits + self.perUserHits
+        misses = self.misses + self.perUserMisses
+        result = (hits - self._lastHits, misses - self._lastMisses, self._bytes + self._perUserBytes,)
+        self._lastHits = hits
+        self._lastMisses = misses
+        return result
+
+
+_componentCache = None
+
+
+def componentCache():
+    """
+    Return the process-wide L{ComponentCache}, or C{None} if component caching
+    is disabled.
+    """
+    global _componentCache
+    from twistedcaldav.config import config
+    if not config.ComponentCache.Enabled:
+        return None
+    if _componentCache is None:
+        _componentCache = ComponentCache(config.ComponentCache.Size, config.ComponentCache.PerUserSize)
+    return _componentCache
+
+
 class CalendarObjectBase(object):
     """
     Base logic shared between file- and sql-based L{ICalendarObject}
@@ -459,6 +630,36 @@ class CalendarObjectBase(object):
             component = data_filter.filter(component)
         returnValue(component)
 
+    @inlineCallbacks
+    def filteredText(self, accessUID, isowner, format=None, includeTimezones=True):
+        """
+        Return this calendar object's iCalendar data serialized as it would be
+        perceived by a particular user, accounting for per-user iCalendar data,
+        hidden instances and private events.
+
+        @param accessUID: the UID of the principal who is accessing this
+            component, or C{None} for the viewer of the parent collection.
+        @type accessUID: C{str} (UTF-8 encoded)
+
+        @param isowner: should the private event restrictions be ignored?
+        @type isowner: C{bool}
+
+        @param format: the MIME type of the serialized data.
+        @type format: C{str}
+
+        @param includeTimezones: should referenced timezones be included?
+        @type includeTimezones: C{bool}
+
+        @return: a L{Deferred} which fires with a C{str}.
+        """
+        component = yield self.componentForUser(accessUID)
+        for data_filter in [
+            HiddenInstanceFilter(),
+            PrivateEventFilter(self.accessMode, isowner),
+        ]:
+            component = data_filter.filter(component)
+        returnValue(component.getTextWithTimezones(includeTimezones=includeTimezones, format=format))
+
 
 class StorageTransportAddress(object):
     """
@@ -58,6 +58,7 @@ from txdav.common.datastore.sql_tables import _ABO_KIND_PERSON, \
     _BIND_MODE_OWN, _BIND_MODE_WRITE, _BIND_STATUS_ACCEPTED, \
     _BIND_STATUS_INVITED, _BIND_MODE_INDIRECT, _BIND_STATUS_DECLINED
 from txdav.common.datastore.sql_sharing import SharingInvitation
+from txdav.common.datastore.sql_util import namesAfter
 from txdav.common.icommondatastore import InternalDataStoreError, \
     InvalidUIDError, UIDExistsError, ObjectResourceTooBigError, \
     InvalidObjectResourceError, InvalidComponentForStoreError, \
@@ -238,6 +239,17 @@ class AddressBookHome(CommonHome):
         ownerName = ownerHome.addressbook().name()
         returnValue((ownerHome, ownerName))
 
+    @inlineCallbacks
+    def ownerHomesAndChildNamesForChildIDs(self, resourceIDs):
+        """
+        Get the owner home and the owner's name for each of a set of shared child IDs.
+        Group shares mean these cannot be looked up via the bind table alone.
+        """
+        results = {}
+        for resourceID in resourceIDs:
+            results[resourceID] = yield self.ownerHomeAndChildNameForChildID(resourceID)
+        returnValue(results)
+
     @classproperty
     def _syncTokenQuery(cls):  # @NoSelf
         """
@@ -604,6 +616,7 @@ class AddressBook(AddressBookSharingMixIn, CommonHomeChild):
                         self._txn, homeID=self.ownerHome()._resourceID,
                         resourceID=self._resourceID, name=name)
                 )[0][0]
+        self._invalidateSyncTokenCache()
         self._maybeNotify()
         returnValue(self._syncTokenRevision)
 
@@ -639,6 +652,18 @@ class AddressBook(AddressBookSharingMixIn, CommonHomeChild):
         invalid = [item[lenpath:] for item in sharedChildInvalid if item.startswith(selfPath) and item != selfPath]
         returnValue((changed, deleted, invalid))
 
+    @classmethod
+    @inlineCallbacks
+    def sharedChildrenResourceNamesSinceRevision(cls, shares, revision, depth):
+        """
+        Shared address books need per-share group processing, so check each one in turn
+        rather than doing a batched revision scan.
+        """
+        results = {}
+        for share in shares:
+            results[share.name()] = yield share.sharedChildResourceNamesSinceRevision(revision, depth)
+        returnValue(results)
+
     @inlineCallbacks
     def sharedChildResourceNamesSinceRevision(self, revision, depth):
         """
@@ -908,6 +933,15 @@ class AddressBook(AddressBookSharingMixIn, CommonHomeChild):
 
         returnValue(self._objectNames)
 
+    @inlineCallbacks
+    def listObjectResourcesAfter(self, after, limit=None):
+        if self.owned():
+            names = yield super(AddressBook, self).listObjectResourcesAfter(after, limit)
+        else:
+            # Shared address books have names that do not come from their own child rows
+            names = namesAfter((yield self.listObjectResources()), after, limit)
+        returnValue(names)
+
     @inlineCallbacks
     def countObjectResources(self):
         if self._objectNames is None:
@@ -1134,7 +1168,10 @@ END:VCARD
             # Get property stores for all these child resources (if any found)
             addressbookPropertyStoreIDs = [ownerHomeItem._addressbookPropertyStoreID for ownerHomeItem in ownerHomeToDataRowMap]
             propertyStores = yield PropertyStore.forMultipleResourcesWithResourceIDs(
-                home.uid(), None, home.authzuid(), home._txn, addressbookPropertyStoreIDs
+                home.uid(), None, home.authzuid(), home._txn, addressbookPropertyStoreIDs,
+                defaultUsers=dict([
+                    (ownerHomeItem._addressbookPropertyStoreID, ownerHomeItem.uid()) for ownerHomeItem in ownerHomeToDataRowMap
+                ]),
             )
 
             addressbookResourceIDs = [ownerHomeItem.addressbook()._resourceID for ownerHomeItem in ownerHomeToDataRowMap]
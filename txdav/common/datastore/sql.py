@@ -2149,6 +2149,18 @@ class CommonHome(SharingHomeMixIn):
         self._childrenLoaded = True
         returnValue(results)
 
+    @inlineCallbacks
+    def loadSnapshot(self):
+        """
+        Call L{loadChildren} unless that has already been done in this transaction. That
+        loads every child of this home, with their bind, metadata, property store and sync
+        token data, using a small fixed number of queries, so later lookups of children by
+        name or resource-id are served from the loaded children. It is only worth doing
+        when most of the children are going to be used, as it reads all of them.
+        """
+        if not self._childrenLoaded:
+            yield self.loadChildren()
+
     @inlineCallbacks
     def listChildren(self, onlyInTrash=False):
         """
@@ -2491,16 +2503,15 @@ class CommonHome(SharingHomeMixIn):
                 if name and depth != "1":
                     changed.add("%s/%s" % (path, name,))
 
-        # Now deal with existing shared collections
-        # TODO: think about whether this can be done in one query rather than looping over each share
-        for share in (yield self.children()):
-            if not share.owned():
-                sharedChanged, sharedDeleted, sharedInvalid = yield share.sharedChildResourceNamesSinceRevision(revision, depth)
-                changed |= sharedChanged
-                changed -= sharedInvalid
-                deleted |= sharedDeleted
-                deleted -= sharedInvalid
-                invalid |= sharedInvalid
+        # Now deal with existing shared collections - all done in one query
+        shares = [share for share in (yield self.children()) if not share.owned()]
+        sharedResults = yield self._childClass.sharedChildrenResourceNamesSinceRevision(shares, revision, depth)
+        for sharedChanged, sharedDeleted, sharedInvalid in sharedResults.values():
+            changed |= sharedChanged
+            changed -= sharedInvalid
+            deleted |= sharedDeleted
+            deleted -= sharedInvalid
+            invalid |= sharedInvalid
 
         changed = sorted(changed)
         deleted = sorted(deleted)
@@ -2832,6 +2843,29 @@ class CommonHome(SharingHomeMixIn):
         else:
             returnValue((None, None))
 
+    @inlineCallbacks
+    def ownerHomesAndChildNamesForChildIDs(self, resourceIDs):
+        """
+        Get the owner home and the owner's name for each of a set of shared child IDs,
+        using a single query. Subclasses that override L{ownerHomeAndChildNameForChildID}
+        should also override this.
+
+        @param resourceIDs: the resource IDs of the shared children
+        @type resourceIDs: C{list} of C{int}
+
+        @return: a mapping of resource ID to (owner home, owner name)
+        @rtype: C{dict}
+        """
+        results = {}
+        if resourceIDs:
+            rows = yield self._childClass._ownerHomesWithResourceIDs(len(resourceIDs)).on(
+                self._txn, resourceIDs=resourceIDs
+            )
+            for resourceID, ownerHomeID, ownerName in rows:
+                ownerHome = yield self._txn.homeWithResourceID(self._homeType, ownerHomeID)
+                results[resourceID] = (ownerHome, ownerName)
+        returnValue(results)
+
     @inlineCallbacks
     def emptyTrash(self, days=0, verbose=False):
         trash = yield self.getTrash()
@@ -3000,9 +3034,11 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
 
     _childType = _CHILD_TYPE_NORMAL
 
+    BATCH_LOAD_SIZE = 50
+
     @classmethod
     @inlineCallbacks
-    def makeClass(cls, home, bindData, additionalBindData, metadataData, propstore=None, ownerHome=None):
+    def makeClass(cls, home, bindData, additionalBindData, metadataData, propstore=None, ownerHome=None, ownerName=None):
         """
         Given the various database rows, build the actual class.
 
@@ -3018,6 +3054,8 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
         @type propstore: L{PropertyStore}
         @param ownerHome: the home of the owner, or C{None} to figure it out automatically
         @type ownerHome: L{CommonHome}
+        @param ownerName: the owner's name for the child, when L{ownerHome} is given
+        @type ownerName: C{str}
 
         @return: the constructed child class
         @rtype: L{CommonHomeChild}
@@ -3031,8 +3069,6 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
                 ownerName = name
             else:
                 ownerHome, ownerName = yield home.ownerHomeAndChildNameForChildID(resourceID)
-        else:
-            ownerName = None
 
         c = cls._externalClass if ownerHome and ownerHome.externalClass() else cls
         child = c(
@@ -3201,8 +3237,18 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
             # Get property stores
             childResourceIDs = [dataRow[resourceID_index] for dataRow in dataRows]
 
+            # Get owners of shared children
+            bindMode_index = cls.bindColumns().index(cls._bindSchema.BIND_MODE)
+            owners = yield home.ownerHomesAndChildNamesForChildIDs([
+                dataRow[resourceID_index] for dataRow in dataRows if dataRow[bindMode_index] != _BIND_MODE_OWN
+            ])
+
+            # Shared children read the owner's properties as the default
             propertyStores = yield PropertyStore.forMultipleResourcesWithResourceIDs(
-                home.uid(), None, home.authzuid(), home._txn, childResourceIDs
+                home.uid(), None, home.authzuid(), home._txn, childResourceIDs,
+                defaultUsers=dict([
+                    (resourceID, ownerHome.uid()) for resourceID, (ownerHome, _ignore_name) in owners.items() if ownerHome is not None
+                ]),
             )
 
             # Get revisions
@@ -3215,8 +3261,9 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
             additionalBindData = dataRow[cls.bindColumnCount:cls.bindColumnCount + len(cls.additionalBindColumns())]
             metadataData = dataRow[cls.bindColumnCount + len(cls.additionalBindColumns()):]
             propstore = propertyStores.get(resourceID, None)
+            ownerHome, ownerName = owners.get(resourceID, (None, None))
 
-            child = yield cls.makeClass(home, bindData, additionalBindData, metadataData, propstore)
+            child = yield cls.makeClass(home, bindData, additionalBindData, metadataData, propstore, ownerHome, ownerName)
             child._syncTokenRevision = revisions.get(resourceID, None)
             results.append(child)
 
@@ -3651,6 +3698,20 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
                 bind.BIND_MODE == _BIND_MODE_OWN)
         )
 
+    @classmethod
+    def _ownerHomesWithResourceIDs(cls, count):
+        """
+        DAL query to retrieve the home resource ID and resource name of the owner for each of a
+        set of bound home-child IDs.
+        """
+        bind = cls._bindSchema
+        return Select(
+            [bind.RESOURCE_ID, bind.HOME_RESOURCE_ID, bind.RESOURCE_NAME, ],
+            From=bind,
+            Where=(bind.RESOURCE_ID.In(Parameter("resourceIDs", count))).And(
+                bind.BIND_MODE == _BIND_MODE_OWN)
+        )
+
     @inlineCallbacks
     def objectResources(self):
         """
@@ -3677,6 +3738,16 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
         self._objectNames = sorted([result.name() for result in results])
         returnValue(results)
 
+    def loadObjectResourcesText(self, objects):
+        """
+        Load the text for the specified child objects using batched queries, so
+        that reading the data of each one does not need a separate query.
+
+        @param objects: the child objects to load text for
+        @type objects: L{list} of L{CommonObjectResource}
+        """
+        return self._objectResourceClass.loadAllText(objects)
+
     @inlineCallbacks
     def listObjectResources(self):
         """
@@ -3686,6 +3757,22 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
             self._objectNames = yield self._objectResourceClass.listObjects(self)
         returnValue(self._objectNames)
 
+    def listObjectResourcesAfter(self, after, limit=None):
+        """
+        Returns a sorted list of names of object resources in this collection that sort after
+        the specified name, used to page through very large collections.
+
+        @param after: only names that sort after this one are returned, or an empty
+            string for the first page
+        @type after: C{str}
+        @param limit: maximum number of names to return, or C{None} for all
+        @type limit: C{int}
+        """
+        # Always page using the database ordering, even when all the names are already
+        # loaded, since that can differ from a Python sort for non-ASCII or mixed case
+        # names and each page must continue in the same order as the previous one
+        return self._objectResourceClass.listObjectsAfter(self, after, limit)
+
     @inlineCallbacks
     def countObjectResources(self):
         if self._objectNames is None:
@@ -4023,58 +4110,92 @@ class CommonHomeChild(FancyEqMixin, Memoizable, _SharedSyncLogic, HomeChildBase,
         @param depth: depth for determine what changed
         @type depth: C{str}
         """
-        changed = set()
-        deleted = set()
-        invalid = set()
-        if self.external():
-            if depth == "1":
-                pass
-            else:
-                invalid.add(self.name() + "/")
-        else:
-            # If revision is prior to when the share was created, then treat as a full sync of the share
-            if revision != 0 and revision < self._bindRevision:
+        results = yield self._sharedChildrenResourceNamesSinceRevision([self], revision, depth)
+        returnValue(results[self.name()])
+
+    @classmethod
+    def _sharedChangesQuery(cls, count):
+        rev = cls._revisionsSchema
+        return Select(
+            [rev.RESOURCE_ID, rev.RESOURCE_NAME, rev.DELETED],
+            From=rev,
+            Where=(rev.REVISION > Parameter("revision")).And(
+                rev.RESOURCE_ID.In(Parameter("resourceIDs", count)))
+        )
+
+    @classmethod
+    def sharedChildrenResourceNamesSinceRevision(cls, shares, revision, depth):
+        """
+        Batched version of L{sharedChildResourceNamesSinceRevision} for a set of shared collections
+        bound into the same home. The revision table is scanned for all of the shares with a single
+        query (per L{BATCH_LOAD_SIZE} shares) rather than one query per share. Sub-classes that need
+        share-specific processing override this.
+
+        @param shares: the shared collections to check
+        @type shares: C{list} of L{CommonHomeChild}
+        @param revision: the sync revision to compare to
+        @type revision: C{str}
+        @param depth: depth for determine what changed
+        @type depth: C{str}
+
+        @return: the changed, deleted and invalid sets for each share
+        @rtype: C{dict} of C{str} (share name) to C{tuple} of (C{set}, C{set}, C{set})
+        """
+        return cls._sharedChildrenResourceNamesSinceRevision(shares, revision, depth)
+
+    @classmethod
+    @inlineCallbacks
+    def _sharedChildrenResourceNamesSinceRevision(cls, shares, revision, depth):
+        results = {}
+        scan = {}
+        for share in shares:
+            changed = set()
+            deleted = set()
+            invalid = set()
+            if share.external():
+                if depth != "1":
+                    invalid.add(share.name() + "/")
+            elif revision != 0 and revision < share._bindRevision:
+                # If revision is prior to when the share was created, then treat as a full sync of the share
                 if depth != "1":
                     # This should never happen unless the client the share existed, was removed and then
                     # re-added and the client has a token from before the remove. In that case the token is no
                     # longer valid - a full sync has to be done.
                     raise SyncTokenValidException
                 else:
-                    results = yield self.sharedChildResourceNamesSinceRevisionZero(depth)
-                    returnValue(results)
-
-            rev = self._revisionsSchema
-            results = [
-                (
-                    self.name(),
-                    name if name else "",
-                    wasdeleted
+                    results[share.name()] = yield share.sharedChildResourceNamesSinceRevisionZero(depth)
+                    continue
+            else:
+                scan[share._resourceID] = share.name()
+            results[share.name()] = (changed, deleted, invalid,)
+
+        if scan:
+            resourceIDs = scan.keys()
+            txn = shares[0]._txn
+            for i in range(0, len(resourceIDs), cls.BATCH_LOAD_SIZE):
+                batch = resourceIDs[i:i + cls.BATCH_LOAD_SIZE]
+                rows = yield cls._sharedChangesQuery(len(batch)).on(
+                    txn, revision=revision, resourceIDs=batch
                 )
-                for name, wasdeleted in
-                (yield Select(
-                    [rev.RESOURCE_NAME, rev.DELETED],
-                    From=rev,
-                    Where=(rev.REVISION > revision).And(
-                        rev.RESOURCE_ID == self._resourceID)
-                ).on(self._txn))
-                if name
-            ]
-
-            for path, name, wasdeleted in results:
-                if wasdeleted:
-                    if depth == "1":
-                        changed.add("%s/" % (path,))
-                    else:
-                        deleted.add("%s/%s" % (path, name,))
-
-                # Always report collection as changed
-                changed.add("%s/" % (path,))
-
-                # Resource changed - for depth "infinity" report resource as changed
-                if name and depth != "1":
-                    changed.add("%s/%s" % (path, name,))
+                for resourceID, name, wasdeleted in rows:
+                    if not name:
+                        continue
+                    path = scan[resourceID]
+                    changed, deleted, _ignore_invalid = results[path]
+                    if wasdeleted:
+                        if depth == "1":
+                            changed.add("%s/" % (path,))
+                        else:
+                            deleted.add("%s/%s" % (path, name,))
+
+                    # Always report collection as changed
+                    changed.add("%s/" % (path,))
+
+                    # Resource changed - for depth "infinity" report resource as changed
+                    if depth != "1":
+                        changed.add("%s/%s" % (path, name,))
 
-        returnValue((changed, deleted, invalid,))
+        returnValue(results)
 
     @inlineCallbacks
     def sharedChildResourceNamesSinceRevisionZero(self, depth):
@@ -4469,6 +4590,30 @@ class CommonObjectResource(FancyEqMixin, object):
         ).on(parent._txn, parentID=parent.id())
         returnValue(sorted([row[0] for row in rows]))
 
+    @classmethod
+    @inlineCallbacks
+    def listObjectsAfter(cls, parent, after, limit=None):
+        """
+        Query to load the object resource names for a home child that sort after a given
+        name, using the name index so that only one page of names is read. An empty
+        C{after} returns the first page (Oracle treats an empty string as C{NULL}, which
+        no name sorts after).
+        """
+        obj = cls._objectSchema
+        where = obj.PARENT_RESOURCE_ID == Parameter('parentID')
+        kwargs = {"parentID": parent.id()}
+        if after:
+            where = where.And(obj.RESOURCE_NAME > Parameter('after'))
+            kwargs["after"] = after
+        rows = yield Select(
+            [obj.RESOURCE_NAME],
+            From=obj,
+            Where=where,
+            OrderBy=obj.RESOURCE_NAME,
+            Limit=limit,
+        ).on(parent._txn, **kwargs)
+        returnValue([row[0] for row in rows])
+
     @classmethod
     @inlineCallbacks
     def countObjects(cls, parent):
@@ -5014,6 +5159,43 @@ class CommonObjectResource(FancyEqMixin, object):
         return Select([obj.TEXT], From=obj,
                       Where=obj.RESOURCE_ID == Parameter("resourceID"))
 
+    @classmethod
+    def _textByIDsQuery(cls, count):
+        """
+        DAL query to load iCalendar/vCard text for a set of resource IDs.
+        """
+        obj = cls._objectSchema
+        return Select([obj.RESOURCE_ID, obj.TEXT], From=obj,
+                      Where=obj.RESOURCE_ID.In(Parameter("resourceIDs", count)))
+
+    @classmethod
+    @inlineCallbacks
+    def loadAllText(cls, objects):
+        """
+        Load the iCalendar/vCard text for all the specified objects that have not already loaded it,
+        doing so in batches (because we need to match using SQL "resource_id in (...)" where there
+        might be a character length limit on the number of items in the set). This is an optimization
+        for reports that return the data for many objects.
+
+        @param objects: the objects to load text for
+        @type objects: L{list} of L{CommonObjectResource}
+        """
+        pending = dict([
+            (obj._resourceID, obj,) for obj in objects
+            if obj._textData is None and obj._cachedComponent is None
+        ])
+        if not pending:
+            returnValue(None)
+
+        txn = pending.values()[0]._txn
+        resourceIDs = tuple(pending.keys())
+        while(len(resourceIDs)):
+            batch = resourceIDs[:cls.BATCH_LOAD_SIZE]
+            rows = (yield cls._textByIDsQuery(len(batch)).on(txn, resourceIDs=batch))
+            for resourceID, text in rows:
+                pending[resourceID]._textData = text
+            resourceIDs = resourceIDs[cls.BATCH_LOAD_SIZE:]
+
     @inlineCallbacks
     def _text(self):
         if self._textData is None:
@@ -28,6 +28,7 @@ from txdav.common.datastore.sql import CommonHome, CommonHomeChild, \
 from txdav.common.datastore.sql_notification import NotificationCollection, \
     NotificationObjectRecord
 from txdav.common.datastore.sql_tables import _HOME_STATUS_EXTERNAL
+from txdav.common.datastore.sql_util import namesAfter
 from txdav.common.icommondatastore import NonExistentExternalShare, \
     ExternalShareFailed
 from txdav.idav import ChangeCategory
@@ -336,7 +337,7 @@ class CommonHomeChildExternal(CommonHomeChild):
         returnValue(result)
 
     @inlineCallbacks
-    def syncTokenRevision(self):
+    def syncTokenRevision(self, cached=True):
         if self._syncTokenRevision is None:
             try:
                 revision = yield self._txn.store().conduit.send_homechild_synctokenrevision(self)
@@ -408,6 +409,12 @@ class CommonObjectResourceExternal(CommonObjectResource):
     def listObjects(cls, parent):
         return parent._txn.store().conduit.send_objectresource_listobjects(parent)
 
+    @classmethod
+    @inlineCallbacks
+    def listObjectsAfter(cls, parent, after, limit=None):
+        names = yield cls.listObjects(parent)
+        returnValue(namesAfter(sorted(names), after, limit))
+
     @classmethod
     def countObjects(cls, parent):
         return parent._txn.store().conduit.send_objectresource_countobjects(parent)
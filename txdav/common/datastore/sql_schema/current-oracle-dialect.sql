@@ -259,6 +259,21 @@ create table PERUSER (
 );
 
 
+create table CALENDAR_BUSY_TIMELINE (
+    "CALENDAR_RESOURCE_ID" integer not null references CALENDAR on delete cascade,
+    "FBTYPE" integer not null,
+    "START_DATE" timestamp not null,
+    "END_DATE" timestamp not null
+);
+
+create table CALENDAR_BUSY_TIMELINE_STATE (
+    "CALENDAR_RESOURCE_ID" integer primary key references CALENDAR on delete cascade,
+    "REVISION" integer not null,
+    "START_DATE" timestamp not null,
+    "END_DATE" timestamp not null
+);
+
+
 create table CALENDAR_OBJECT_MIGRATION (
     "CALENDAR_HOME_RESOURCE_ID" integer references CALENDAR_HOME on delete cascade,
     "REMOTE_RESOURCE_ID" integer not null,
@@ -612,6 +627,20 @@ create table CALENDAR_OBJECT_UPGRADE_WORK (
 );
 
 
+create table CALENDAR_BUSY_TIMELINE_WORK (
+    "WORK_ID" integer primary key,
+    "JOB_ID" integer not null references JOB,
+    "HOME_RESOURCE_ID" integer not null references CALENDAR_HOME on delete cascade,
+    "CALENDAR_RESOURCE_ID" integer not null references CALENDAR on delete cascade
+);
+
+
+create table INDEX_EXPANSION_WORK (
+    "WORK_ID" integer primary key,
+    "JOB_ID" integer not null references JOB
+);
+
+
 create table FIND_MIN_VALID_REVISION_WORK (
     "WORK_ID" integer primary key,
     "JOB_ID" integer not null references JOB
@@ -707,7 +736,8 @@ create table SCHEDULE_ORGANIZER_SEND_WORK (
     "RESOURCE_ID" integer,
     "ATTENDEE" nvarchar2(255),
     "ITIP_MSG" nclob,
-    "NO_REFRESH" integer
+    "NO_REFRESH" integer,
+    "OTHER_ATTENDEES" nclob
 );
 
 
@@ -772,7 +802,7 @@ create table CALENDARSERVER (
     "VALUE" nvarchar2(255)
 );
 
-insert into CALENDARSERVER (NAME, VALUE) values ('VERSION', '66');
+insert into CALENDARSERVER (NAME, VALUE) values ('VERSION', '69');
 insert into CALENDARSERVER (NAME, VALUE) values ('CALENDAR-DATAVERSION', '6');
 insert into CALENDARSERVER (NAME, VALUE) values ('ADDRESSBOOK-DATAVERSION', '2');
 insert into CALENDARSERVER (NAME, VALUE) values ('NOTIFICATION-DATAVERSION', '1');
@@ -852,6 +882,10 @@ create index CALENDAR_OBJECT_ORIGI_53447b73 on CALENDAR_OBJECT (
     "TRASHED"
 );
 
+create index CALENDAR_OBJECT_RECUR_6ccd6d3b on CALENDAR_OBJECT (
+    "RECURRANCE_MAX"
+);
+
 create index TIME_RANGE_CALENDAR_R_beb6e7eb on TIME_RANGE (
     "CALENDAR_RESOURCE_ID"
 );
@@ -860,6 +894,11 @@ create index TIME_RANGE_CALENDAR_O_acf37bd1 on TIME_RANGE (
     "CALENDAR_OBJECT_RESOURCE_ID"
 );
 
+create index CALENDAR_BUSY_TIMELIN_85042d45 on CALENDAR_BUSY_TIMELINE (
+    "CALENDAR_RESOURCE_ID",
+    "START_DATE"
+);
+
 create index CALENDAR_OBJECT_MIGRA_0502cbef on CALENDAR_OBJECT_MIGRATION (
     "CALENDAR_HOME_RESOURCE_ID",
     "LOCAL_RESOURCE_ID"
@@ -1078,6 +1117,22 @@ create index CALENDAR_OBJECT_UPGRA_39d6f8f9 on CALENDAR_OBJECT_UPGRADE_WORK (
     "JOB_ID"
 );
 
+create index CALENDAR_BUSY_TIMELIN_88fc4ca1 on CALENDAR_BUSY_TIMELINE_WORK (
+    "HOME_RESOURCE_ID"
+);
+
+create index CALENDAR_BUSY_TIMELIN_9b55d612 on CALENDAR_BUSY_TIMELINE_WORK (
+    "CALENDAR_RESOURCE_ID"
+);
+
+create index CALENDAR_BUSY_TIMELIN_45434812 on CALENDAR_BUSY_TIMELINE_WORK (
+    "JOB_ID"
+);
+
+create index INDEX_EXPANSION_WORK__cc02497c on INDEX_EXPANSION_WORK (
+    "JOB_ID"
+);
+
 create index FIND_MIN_VALID_REVISI_78d17400 on FIND_MIN_VALID_REVISION_WORK (
     "JOB_ID"
 );
@@ -320,6 +320,9 @@ create index CALENDAR_OBJECT_DROPBOX_ID on
 create index CALENDAR_OBJECT_ORIGINAL_COLLECTION_AND_TRASHED on
   CALENDAR_OBJECT(ORIGINAL_COLLECTION, TRASHED);
 
+create index CALENDAR_OBJECT_RECURRANCE_MAX on
+  CALENDAR_OBJECT(RECURRANCE_MAX);
+
 -- Enumeration of attachment modes
 
 create table CALENDAR_OBJ_ATTACHMENTS_MODE (
@@ -403,6 +406,32 @@ create table PERUSER (
 );
 
 
+----------------------------
+-- Calendar Busy Timeline --
+----------------------------
+
+-- Pre-merged busy time of the calendar owner, maintained by CALENDAR_BUSY_TIMELINE_WORK
+
+create table CALENDAR_BUSY_TIMELINE (
+  CALENDAR_RESOURCE_ID        bigint       not null references CALENDAR on delete cascade,
+  FBTYPE                      integer      not null,
+  START_DATE                  timestamp    not null,
+  END_DATE                    timestamp    not null
+);
+
+create index CALENDAR_BUSY_TIMELINE_CALENDAR_RESOURCE_ID_START_DATE on
+  CALENDAR_BUSY_TIMELINE(CALENDAR_RESOURCE_ID, START_DATE);
+
+-- Calendar revision and time range the timeline was built for
+
+create table CALENDAR_BUSY_TIMELINE_STATE (
+  CALENDAR_RESOURCE_ID        bigint       primary key references CALENDAR on delete cascade, -- implicit index
+  REVISION                    bigint       not null,
+  START_DATE                  timestamp    not null,
+  END_DATE                    timestamp    not null
+);
+
+
 -------------------------------
 -- Calendar Object Migration --
 -------------------------------
@@ -1030,6 +1059,36 @@ create index CALENDAR_OBJECT_UPGRADE_WORK_RESOURCE_ID on
 create index CALENDAR_OBJECT_UPGRADE_WORK_JOB_ID on
   CALENDAR_OBJECT_UPGRADE_WORK(JOB_ID);
 
+------------------------
+-- Busy Timeline Work --
+------------------------
+
+create table CALENDAR_BUSY_TIMELINE_WORK (
+  WORK_ID                       bigint       primary key default nextval('WORKITEM_SEQ'), -- implicit index
+  JOB_ID                        bigint       references JOB not null,
+  HOME_RESOURCE_ID              bigint       not null references CALENDAR_HOME on delete cascade,
+  CALENDAR_RESOURCE_ID          bigint       not null references CALENDAR on delete cascade
+);
+
+create index CALENDAR_BUSY_TIMELINE_WORK_HOME_RESOURCE_ID on
+  CALENDAR_BUSY_TIMELINE_WORK(HOME_RESOURCE_ID);
+create index CALENDAR_BUSY_TIMELINE_WORK_CALENDAR_RESOURCE_ID on
+  CALENDAR_BUSY_TIMELINE_WORK(CALENDAR_RESOURCE_ID);
+create index CALENDAR_BUSY_TIMELINE_WORK_JOB_ID on
+  CALENDAR_BUSY_TIMELINE_WORK(JOB_ID);
+
+--------------------------
+-- Index Expansion Work --
+--------------------------
+
+create table INDEX_EXPANSION_WORK (
+  WORK_ID                       bigint       primary key default nextval('WORKITEM_SEQ'), -- implicit index
+  JOB_ID                        bigint       references JOB not null
+);
+
+create index INDEX_EXPANSION_WORK_JOB_ID on
+  INDEX_EXPANSION_WORK(JOB_ID);
+
 ---------------------------
 -- Revision Cleanup Work --
 ---------------------------
@@ -1181,7 +1240,8 @@ create table SCHEDULE_ORGANIZER_SEND_WORK (
   RESOURCE_ID                   bigint,      -- this references a possibly non-existent CALENDAR_OBJECT
   ATTENDEE                      varchar(255) not null,
   ITIP_MSG                      text,
-  NO_REFRESH                    boolean
+  NO_REFRESH                    boolean,
+  OTHER_ATTENDEES               text         -- additional attendees receiving the same message, one per line
 );
 
 create index SCHEDULE_ORGANIZER_SEND_WORK_HOME_RESOURCE_ID on
@@ -1314,7 +1374,7 @@ create table CALENDARSERVER (
   VALUE                         varchar(255)
 );
 
-insert into CALENDARSERVER values ('VERSION', '66');
+insert into CALENDARSERVER values ('VERSION', '69');
 insert into CALENDARSERVER values ('CALENDAR-DATAVERSION', '6');
 insert into CALENDARSERVER values ('ADDRESSBOOK-DATAVERSION', '2');
 insert into CALENDARSERVER values ('NOTIFICATION-DATAVERSION', '1');
@@ -0,0 +1,61 @@
+----
+-- Copyright (c) 2012-2018 Apple Inc. All rights reserved.
+--
+-- Licensed under the Apache License, Version 2.0 (the "License");
+-- you may not use this file except in compliance with the License.
+-- You may obtain a copy of the License at
+--
+-- http://www.apache.org/licenses/LICENSE-2.0
+--
+-- Unless required by applicable law or agreed to in writing, software
+-- distributed under the License is distributed on an "AS IS" BASIS,
+-- WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+-- See the License for the specific language governing permissions and
+-- limitations under the License.
+----
+
+---------------------------------------------------
+-- Upgrade database schema from VERSION 66 to 67 --
+---------------------------------------------------
+
+-- Calendar busy timeline
+create table CALENDAR_BUSY_TIMELINE (
+    "CALENDAR_RESOURCE_ID" integer not null references CALENDAR on delete cascade,
+    "FBTYPE" integer not null,
+    "START_DATE" timestamp not null,
+    "END_DATE" timestamp not null
+);
+
+create index CALENDAR_BUSY_TIMELIN_85042d45 on CALENDAR_BUSY_TIMELINE (
+    "CALENDAR_RESOURCE_ID",
+    "START_DATE"
+);
+
+create table CALENDAR_BUSY_TIMELINE_STATE (
+    "CALENDAR_RESOURCE_ID" integer primary key references CALENDAR on delete cascade,
+    "REVISION" integer not null,
+    "START_DATE" timestamp not null,
+    "END_DATE" timestamp not null
+);
+
+create table CALENDAR_BUSY_TIMELINE_WORK (
+    "WORK_ID" integer primary key,
+    "JOB_ID" integer not null references JOB,
+    "HOME_RESOURCE_ID" integer not null references CALENDAR_HOME on delete cascade,
+    "CALENDAR_RESOURCE_ID" integer not null references CALENDAR on delete cascade
+);
+
+create index CALENDAR_BUSY_TIMELIN_88fc4ca1 on CALENDAR_BUSY_TIMELINE_WORK (
+    "HOME_RESOURCE_ID"
+);
+
+create index CALENDAR_BUSY_TIMELIN_9b55d612 on CALENDAR_BUSY_TIMELINE_WORK (
+    "CALENDAR_RESOURCE_ID"
+);
+
+create index CALENDAR_BUSY_TIMELIN_45434812 on CALENDAR_BUSY_TIMELINE_WORK (
+    "JOB_ID"
+);
+
+-- update the version
+update CALENDARSERVER set VALUE = '67' where NAME = 'VERSION';
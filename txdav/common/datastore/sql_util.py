@@ -16,14 +16,19 @@
 ##
 
 from twext.enterprise.dal.syntax import Max, Select, Parameter, Delete, Insert, \
-    Update, ColumnSyntax, TableSyntax, Upper, utcNowSQL
+    Update, ColumnSyntax, TableSyntax, Upper, utcNowSQL, QueryGenerator, \
+    FixedPlaceholder, NumericPlaceholder
+from twext.enterprise.ienterprise import ORACLE_DIALECT
 from twext.python.clsprop import classproperty
 from twext.python.log import Logger
 from twisted.internet.defer import succeed, inlineCallbacks, returnValue
+from twistedcaldav.config import config
+from twistedcaldav.memcacher import Memcacher
 from txdav.base.datastore.util import normalizeUUIDOrNot
 from txdav.common.datastore.sql_tables import schema
 from txdav.common.icommondatastore import SyncTokenValidException, \
     ENOTIFICATIONTYPE, ECALENDARTYPE, EADDRESSBOOKTYPE
+from bisect import bisect_right
 import time
 from uuid import UUID
 
@@ -90,12 +95,82 @@ class _SharedSyncLogic(object):
         returnValue(("%s_%s" % (self._resourceID, self._syncTokenRevision,)))
 
     @inlineCallbacks
-    def syncTokenRevision(self):
+    def syncTokenRevision(self, cached=True):
+        """
+        Get the current revision of this collection.
+
+        @param cached: whether a revision cached in memcache may be used
+        @type cached: C{bool}
+        """
+        # Idle clients mostly poll with an unchanged sync token, so the revision high-water
+        # mark is cached in memcache and updated whenever a revision changes
+        if config.SyncTokenCache.Enabled and cached:
+            revision = yield self._syncTokenCacher.get(self._syncTokenCacheKey())
+            if revision is not None:
+                returnValue(int(revision))
+
         revision = (yield self._childSyncTokenQuery.on(self._txn, resourceID=self._resourceID))[0][0]
         if revision is None:
             revision = int((yield self._txn.calendarserverValue("MIN-VALID-REVISION")))
+
+        # Only add the value if there is none, so that a revision read before another
+        # transaction committed a change cannot replace the value that transaction wrote
+        if config.SyncTokenCache.Enabled and not self._syncTokenCacheInvalidated:
+            yield self._syncTokenCacher.add(
+                self._syncTokenCacheKey(), str(revision),
+                expireTime=config.SyncTokenCache.ExpireSeconds
+            )
         returnValue(revision)
 
+    @inlineCallbacks
+    def refreshSyncToken(self):
+        """
+        Get the sync token from the current revision in the database, not from any cached
+        revision. Used when a client has a newer token than the cached revision.
+        """
+        self._syncTokenRevision = yield self.syncTokenRevision(cached=False)
+        returnValue(("%s_%s" % (self._resourceID, self._syncTokenRevision,)))
+
+    _syncTokenCacher = Memcacher("SyncTokenRevision")
+    _syncTokenCacheInvalidated = False
+
+    def _syncTokenCacheKey(self):
+        return "{}:{}".format(self._revisionsSchema.model.name, self._resourceID)
+
+    def _invalidateSyncTokenCache(self):
+        """
+        The revision for this collection has changed, so update any cached value once the
+        transaction commits (doing it earlier would allow another transaction to see the
+        uncommitted value). Only needs to be done once per transaction.
+        """
+        if config.SyncTokenCache.Enabled and not self._syncTokenCacheInvalidated:
+            self._syncTokenCacheInvalidated = True
+            self._txn.preCommit(self._readSyncTokenCacheRevision)
+
+    @inlineCallbacks
+    def _readSyncTokenCacheRevision(self):
+        """
+        Read the revision this transaction is about to commit, and update the cached
+        value with it after the commit.
+        """
+        revision = yield self.syncTokenRevision(cached=False)
+        key = self._syncTokenCacheKey()
+        self._txn.postCommit(lambda: self._updateSyncTokenCache(key, revision))
+
+    @inlineCallbacks
+    def _updateSyncTokenCache(self, key, revision):
+        """
+        Cache a newly committed revision, unless another transaction that committed at the
+        same time has already cached a later one. Revisions only increase, so a lower cached
+        value is always out of date.
+        """
+        cached = yield self._syncTokenCacher.get(key)
+        if cached is None or int(cached) < revision:
+            yield self._syncTokenCacher.set(
+                key, str(revision),
+                expireTime=config.SyncTokenCache.ExpireSeconds
+            )
+
     @classmethod
     @inlineCallbacks
     def childSyncTokenRevisions(cls, home, childResourceIDs):
@@ -207,6 +282,7 @@ class _SharedSyncLogic(object):
                                     resourceID=self._resourceID,
                                     collectionName=self._name)))[0][0]
         self._txn.bumpRevisionForObject(self)
+        self._invalidateSyncTokenCache()
 
     @classproperty
     def _renameSyncTokenQuery(cls):
@@ -233,6 +309,7 @@ class _SharedSyncLogic(object):
         if rows:
             self._syncTokenRevision = rows[0][0]
             self._txn.bumpRevisionForObject(self)
+            self._invalidateSyncTokenCache()
         else:
             yield self._initSyncToken()
 
@@ -262,6 +339,7 @@ class _SharedSyncLogic(object):
                 resourceID=self._resourceID,
             )
             self._syncTokenRevision = None
+            self._invalidateSyncTokenCache()
 
     @classproperty
     def _deleteSyncTokenQuery(cls):
@@ -339,6 +417,7 @@ class _SharedSyncLogic(object):
             yield self._unsharedRemovalQuery.on(self._txn,
                                                 resourceID=self._resourceID)
         self._syncTokenRevision = None
+        self._invalidateSyncTokenCache()
 
     def _insertRevision(self, name):
         return self._changeRevision("insert", name)
@@ -480,6 +559,7 @@ class _SharedSyncLogic(object):
                         self._txn, homeID=self.ownerHome()._resourceID,
                         resourceID=self._resourceID, name=name)
                 )[0][0]
+        self._invalidateSyncTokenCache()
         yield self._maybeNotify()
         returnValue(self._syncTokenRevision)
 
@@ -530,6 +610,127 @@ def determineNewest(uid, homeType):
     )
 
 
+def namesAfter(names, after, limit=None):
+    """
+    Select the names that sort after a given name from a sorted list of names.
+
+    @param names: sorted resource names
+    @type names: C{list} of C{str}
+    @param after: only names that sort after this one are returned
+    @type after: C{str}
+    @param limit: maximum number of names to return, or C{None} for all
+    @type limit: C{int}
+
+    @rtype: C{list} of C{str}
+    """
+    start = bisect_right(names, after)
+    return names[start:start + limit] if limit is not None else names[start:]
+
+
+def _placeholder(paramstyle):
+    """
+    Create a DAL placeholder generator for the given DB-API paramstyle.
+
+    @param paramstyle: the DB-API paramstyle of the underlying connection.
+    @type paramstyle: C{str}
+    """
+    if paramstyle == "numeric":
+        return NumericPlaceholder()
+    elif paramstyle == "qmark":
+        return FixedPlaceholder("?")
+    else:
+        return FixedPlaceholder("%s")
+
+
+def bulkInsertSQL(dbtype, table, columns, rows):
+    """
+    Generate a single statement that inserts multiple rows into a table. Each
+    row is rendered by the DAL as an L{Insert}, sharing one L{QueryGenerator}
+    so that identifier quoting and parameter numbering are handled as for any
+    other statement. Postgres uses a multi-row C{VALUES} list, Oracle uses
+    C{INSERT ALL ... SELECT * FROM DUAL} since it has no multi-row C{VALUES}.
+
+    Note that on Oracle any sequence used in an C{INSERT ALL} is only evaluated
+    once for the entire statement, so callers must supply explicit values for
+    columns that would otherwise default to a sequence value.
+
+    @param dbtype: the database type of the underlying connection.
+    @type dbtype: L{DatabaseType}
+    @param table: the table to insert into.
+    @type table: L{TableSyntax}
+    @param columns: the columns being inserted (same for each row).
+    @type columns: C{list} of L{ColumnSyntax}
+    @param rows: the values to insert, each row in C{columns} order.
+    @type rows: C{list} of C{tuple}
+
+    @return: the SQL statement text and its parameters
+    @rtype: C{tuple} of (C{str}, C{list})
+    """
+    qgen = QueryGenerator(dbtype, _placeholder(dbtype.paramstyle))
+    fragments = [
+        Insert(dict(zip(columns, row))).toSQL(qgen)
+        for row in rows
+    ]
+    if dbtype.dialect == ORACLE_DIALECT:
+        text = "insert all {} select * from dual".format(
+            " ".join([fragment.text[len("insert "):] for fragment in fragments])
+        )
+    else:
+        text = ", ".join(
+            [fragments[0].text] +
+            [fragment.text.split(" values ", 1)[1] for fragment in fragments[1:]]
+        )
+    parameters = [value for fragment in fragments for value in fragment.parameters]
+    return text, parameters
+
+
+@inlineCallbacks
+def bulkInsert(txn, table, columns, rows, batchSize=100):
+    """
+    Insert a set of rows into a table using as few statements as possible.
+
+    @param txn: the transaction to use.
+    @type txn: L{CommonStoreTransaction}
+    @param table: the table to insert into.
+    @type table: L{TableSyntax}
+    @param columns: the columns being inserted.
+    @type columns: C{list} of L{ColumnSyntax}
+    @param rows: the values to insert, each row in C{columns} order.
+    @type rows: C{list} of C{tuple}
+    @param batchSize: maximum number of rows in a single statement.
+    @type batchSize: C{int}
+    """
+    for offset in range(0, len(rows), batchSize):
+        sql, parameters = bulkInsertSQL(txn.dbtype, table, columns, rows[offset:offset + batchSize])
+        yield txn.execSQL(sql, parameters)
+
+
+@inlineCallbacks
+def allocateSequenceValues(txn, sequenceName, count):
+    """
+    Allocate a set of values from a sequence in one query, so that rows can be
+    bulk inserted with known primary keys.
+
+    @param txn: the transaction to use.
+    @type txn: L{CommonStoreTransaction}
+    @param sequenceName: name of the sequence.
+    @type sequenceName: C{str}
+    @param count: number of values to allocate.
+    @type count: C{int}
+
+    @return: the allocated values
+    @rtype: C{list} of C{int}
+    """
+    if count == 0:
+        returnValue([])
+    if txn.dbtype.dialect == ORACLE_DIALECT:
+        sql = "select {}.nextval from dual connect by level <= {:d}".format(sequenceName, count)
+    else:
+        sql = "select nextval('{}') from generate_series(1, {:d})".format(sequenceName, count)
+    rows = yield txn.execSQL(sql, [])
+    returnValue([row[0] for row in rows])
+
+
 @inlineCallbacks
 def mergeHomes(sqlTxn, one, other, homeType):
     """
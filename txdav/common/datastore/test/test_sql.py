@@ -22,6 +22,8 @@ from uuid import UUID
 
 from twext.enterprise.dal.syntax import Insert
 from twext.enterprise.dal.syntax import Select
+from twext.enterprise.ienterprise import POSTGRES_DIALECT, ORACLE_DIALECT, \
+    DatabaseType
 from twisted.internet.defer import Deferred
 from twisted.internet.defer import inlineCallbacks, returnValue, succeed
 from twisted.internet.task import Clock
@@ -33,7 +35,7 @@ from txdav.common.datastore.sql import (
 )
 from txdav.common.datastore.sql_tables import schema
 from txdav.common.datastore.sql_util import _normalizeColumnUUIDs, \
-    fixUUIDNormalization
+    fixUUIDNormalization, bulkInsert, bulkInsertSQL, allocateSequenceValues
 from txdav.common.datastore.test.util import CommonCommonTests
 from txdav.common.icommondatastore import AllRetriesFailed
 from txdav.xml import element as davxml
@@ -474,6 +476,56 @@ class CommonSQLStoreTests(CommonCommonTests, TestCase):
         self.assertEquals(self.txn.action, "aborted")
         self.assertEquals(self.txn.label, "bad")
 
+    def test_bulkInsertSQL(self):
+        """
+        L{bulkInsertSQL} generates a multi-row insert for each dialect.
+        """
+        cs = schema.CALENDARSERVER
+        rows = [("A", "1"), ("B", "2")]
+        self.assertEqual(
+            bulkInsertSQL(DatabaseType(POSTGRES_DIALECT, "pyformat"), cs, [cs.NAME, cs.VALUE], rows),
+            (
+                "insert into CALENDARSERVER (NAME, VALUE) values (%s, %s), (%s, %s)",
+                ["A", "1", "B", "2"],
+            ),
+        )
+        sql, parameters = bulkInsertSQL(DatabaseType(ORACLE_DIALECT, "numeric"), cs, [cs.NAME, cs.VALUE], rows)
+        self.assertTrue(sql.startswith("insert all into CALENDARSERVER "))
+        self.assertTrue(sql.endswith(" values (:3, :4) select * from dual"))
+        self.assertEqual(sql.count(" into CALENDARSERVER "), 2)
+        self.assertEqual(parameters, ["A", "1", "B", "2"])
+
+    @inlineCallbacks
+    def test_bulkInsert(self):
+        """
+        L{bulkInsert} writes all rows, across multiple statements when the
+        batch size is exceeded.
+        """
+        txn = self.transactionUnderTest()
+        cs = schema.CALENDARSERVER
+        rows = [("BULK-{}".format(i), str(i)) for i in range(5)]
+        yield bulkInsert(txn, cs, [cs.NAME, cs.VALUE], rows, batchSize=2)
+        results = (yield Select(
+            [cs.NAME, cs.VALUE],
+            From=cs,
+            Where=cs.NAME.StartsWith("BULK-"),
+            OrderBy=cs.NAME,
+        ).on(txn))
+        self.assertEqual(map(tuple, results), rows)
+
+    @inlineCallbacks
+    def test_allocateSequenceValues(self):
+        """
+        L{allocateSequenceValues} returns the requested number of unique values.
+        """
+        txn = self.transactionUnderTest()
+        values = yield allocateSequenceValues(txn, "INSTANCE_ID_SEQ", 10)
+        self.assertEqual(len(values), 10)
+        self.assertEqual(len(set(values)), 10)
+
+        values = yield allocateSequenceValues(txn, "INSTANCE_ID_SEQ", 0)
+        self.assertEqual(values, [])
+
 
 class StubTransaction(object):
 
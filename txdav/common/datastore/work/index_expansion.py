@@ -0,0 +1,184 @@
+# -*- test-case-name: txdav.common.datastore.work.test.test_index_expansion -*-
+##
+# Copyright (c) 2018 Apple Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+
+"""
+Extend the time-range index of recurring events ahead of time
+"""
+
+from pycalendar.datetime import DateTime
+from pycalendar.duration import Duration
+from pycalendar.timezone import Timezone
+from twext.enterprise.dal.record import fromTable
+from twext.enterprise.dal.syntax import Select, Parameter
+from twext.enterprise.jobs.workitem import RegeneratingWorkItem
+from twext.python.log import Logger
+from twisted.internet.defer import inlineCallbacks, returnValue, succeed
+from twistedcaldav.config import config
+from twistedcaldav.dateops import normalizeForIndex, pyCalendarToSQLTimestamp, \
+    parseSQLTimestampToPyCalendar
+from txdav.common.datastore.sql_tables import schema, _BIND_MODE_OWN
+
+log = Logger()
+
+
+class IndexExpansionWork(RegeneratingWorkItem, fromTable(schema.INDEX_EXPANSION_WORK)):
+    """
+    Re-expand recurring events whose time-range index ends before the
+    FreeBusyIndexExpandAheadDays horizon, so that time-range queries within the
+    horizon do not need to re-expand them while the client waits. Each resource
+    is expanded LeadDays past the horizon, so that it is only done again once
+    the horizon has moved on by that much.
+    """
+
+    group = "index_expansion"
+
+    @classmethod
+    def initialSchedule(cls, store, seconds):
+        def _enqueue(txn):
+            return IndexExpansionWork.reschedule(txn, seconds)
+
+        if config.FreeBusyIndexExpansion.Enabled:
+            return store.inTransaction("IndexExpansionWork.initialSchedule", _enqueue)
+        else:
+            return succeed(None)
+
+    def regenerateInterval(self):
+        """
+        Return the interval in seconds between regenerating instances.
+        """
+        return float(config.FreeBusyIndexExpansion.PeriodSeconds)
+
+    # Recurring resources that are deliberately not indexed, such as inbox items, have
+    # this RECURRANCE_MAX
+    _unexpandedMax = DateTime(1900, 1, 1, 0, 0, 0, tzid=Timezone.UTCTimezone)
+
+    # Name of the CALENDARSERVER value holding the RECURRANCE_MAX and RESOURCE_ID of
+    # the last resource looked at, so that the next run carries on after it
+    _cursorName = "INDEX-EXPANSION-CURSOR"
+
+    @classmethod
+    def _notExpandedBeforeQuery(cls, limit, after):
+        """
+        Query to find the owner's home, calendar and name of the resources whose
+        expansion ends earliest before a given date, ordered by RECURRANCE_MAX and
+        RESOURCE_ID. Inbox items are never expanded, so are skipped.
+
+        @param after: whether to only find resources after the cursor
+        @type after: C{bool}
+        """
+        co = schema.CALENDAR_OBJECT
+        cb = schema.CALENDAR_BIND
+        where = (co.RECURRANCE_MAX < Parameter("maxDate")).And(
+            co.RECURRANCE_MAX > Parameter("unexpandedMax")).And(
+            co.TRASHED == None).And(
+            cb.CALENDAR_RESOURCE_NAME != "inbox")
+        if after:
+            where = where.And(
+                (co.RECURRANCE_MAX > Parameter("afterMax")).Or(
+                    (co.RECURRANCE_MAX == Parameter("afterMax")).And(co.RESOURCE_ID > Parameter("afterID"))
+                )
+            )
+        return Select(
+            [cb.CALENDAR_HOME_RESOURCE_ID, co.CALENDAR_RESOURCE_ID, co.RESOURCE_NAME, co.RECURRANCE_MAX, co.RESOURCE_ID],
+            From=co.join(
+                cb,
+                (co.CALENDAR_RESOURCE_ID == cb.CALENDAR_RESOURCE_ID).And(cb.BIND_MODE == _BIND_MODE_OWN)
+            ),
+            Where=where,
+            OrderBy=(co.RECURRANCE_MAX, co.RESOURCE_ID,),
+            Limit=limit,
+        )
+
+    @inlineCallbacks
+    def _readCursor(self):
+        """
+        Get the RECURRANCE_MAX and RESOURCE_ID of the last resource looked at by the
+        previous run.
+
+        @return: a tuple of the L{DateTime} and resource id, or C{None} to start at the
+            beginning
+        @rtype: C{tuple}
+        """
+        value = yield self.transaction.calendarserverValue(self._cursorName, raiseIfMissing=False)
+        if not value or value == "-":
+            returnValue(None)
+        recurrenceMax, resourceID = value.split("|")
+        returnValue((DateTime.parseText(recurrenceMax), int(resourceID),))
+
+    @inlineCallbacks
+    def _writeCursor(self, cursor):
+        """
+        Record where the next run is to carry on from.
+
+        @param cursor: a tuple of the L{DateTime} and resource id, or C{None} to start at
+            the beginning
+        @type cursor: C{tuple}
+        """
+        # Not an empty string, as Oracle stores that as NULL
+        value = "{}|{}".format(cursor[0].getText(), cursor[1]) if cursor is not None else "-"
+        existing = yield self.transaction.calendarserverValue(self._cursorName, raiseIfMissing=False)
+        if existing is None:
+            yield self.transaction.setCalendarserverValue(self._cursorName, value)
+        elif existing != value:
+            yield self.transaction.updateCalendarserverValue(self._cursorName, value)
+
+    @inlineCallbacks
+    def doWork(self):
+
+        today = DateTime.getToday()
+        horizon = today + Duration(days=config.FreeBusyIndexExpandAheadDays)
+        expandUntil = min(
+            horizon + Duration(days=config.FreeBusyIndexExpansion.LeadDays),
+            today + Duration(days=config.FreeBusyIndexExpandMaxDays),
+        )
+
+        # Each run carries on after the last resource the previous run looked at, so
+        # that resources that cannot be expanded do not hold up the others. They are
+        # tried again once the end has been reached and the next run starts over.
+        cursor = yield self._readCursor()
+        batchSize = config.FreeBusyIndexExpansion.BatchSize
+        kwargs = {
+            "maxDate": pyCalendarToSQLTimestamp(normalizeForIndex(horizon)),
+            "unexpandedMax": pyCalendarToSQLTimestamp(self._unexpandedMax),
+        }
+        if cursor is not None:
+            kwargs["afterMax"] = pyCalendarToSQLTimestamp(cursor[0])
+            kwargs["afterID"] = cursor[1]
+        rows = yield self._notExpandedBeforeQuery(batchSize, cursor is not None).on(self.transaction, **kwargs)
+        if rows:
+            log.debug("Index expansion work: re-expanding {count} resources until {until}", count=len(rows), until=expandUntil)
+
+        calendars = {}
+        for homeID, calendarID, name, _ignore_recurrenceMax, _ignore_resourceID in rows:
+            if calendarID not in calendars:
+                home = yield self.transaction.calendarHomeWithResourceID(homeID)
+                calendars[calendarID] = (yield home.childWithID(calendarID)) if home is not None else None
+            calendar = calendars[calendarID]
+            if calendar is None:
+                continue
+
+            # One bad resource must not stop the others being expanded
+            try:
+                yield calendar.reExpandResource(name, None, expandUntil)
+            except Exception as e:
+                log.error("Index expansion work: unable to re-expand {name} in calendar {id}: {ex}", name=name, id=calendarID, ex=e)
+
+        if batchSize and len(rows) >= batchSize:
+            cursor = (parseSQLTimestampToPyCalendar(rows[-1][3]), rows[-1][4],)
+        else:
+            cursor = None
+        yield self._writeCursor(cursor)
@@ -0,0 +1,209 @@
+##
+# Copyright (c) 2018 Apple Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+
+from pycalendar.datetime import DateTime
+from pycalendar.duration import Duration
+
+from twext.enterprise.dal.syntax import Update
+from twext.enterprise.jobs.jobitem import JobItem
+from twext.python.clsprop import classproperty
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.trial.unittest import TestCase
+from twistedcaldav.config import config
+from twistedcaldav.dateops import normalizeForIndex, pyCalendarToSQLTimestamp
+from twistedcaldav.instance import TooManyInstancesError
+from txdav.caldav.datastore.sql import Calendar
+from txdav.common.datastore.sql_tables import schema
+from txdav.common.datastore.test.util import CommonCommonTests, populateCalendarsFrom
+from txdav.common.datastore.work.index_expansion import IndexExpansionWork
+
+
+class IndexExpansionTests(CommonCommonTests, TestCase):
+    """
+    Test L{IndexExpansionWork}.
+    """
+
+    @inlineCallbacks
+    def setUp(self):
+        yield super(IndexExpansionTests, self).setUp()
+        yield self.buildStoreAndDirectory()
+        yield self.populate()
+
+    @inlineCallbacks
+    def populate(self):
+        calendarRequirements = self.requirements["calendar"]
+        yield populateCalendarsFrom(calendarRequirements, self.storeUnderTest())
+
+        self.notifierFactory.reset()
+
+    cal1 = """BEGIN:VCALENDAR
+VERSION:2.0
+CALSCALE:GREGORIAN
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:uid1
+DTSTART:20131122T140000Z
+DURATION:PT1H
+RRULE:FREQ=WEEKLY
+CREATED:20060102T190000Z
+DTSTAMP:20051222T210507Z
+SUMMARY:event 1
+END:VEVENT
+END:VCALENDAR
+"""
+
+    cal2 = """BEGIN:VCALENDAR
+VERSION:2.0
+CALSCALE:GREGORIAN
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:uid2
+DTSTART:20131122T140000Z
+DURATION:PT1H
+CREATED:20060102T190000Z
+DTSTAMP:20051222T210507Z
+SUMMARY:event 2
+END:VEVENT
+END:VCALENDAR
+"""
+
+    cal3 = """BEGIN:VCALENDAR
+VERSION:2.0
+CALSCALE:GREGORIAN
+PRODID:-//CALENDARSERVER.ORG//NONSGML Version 1//EN
+BEGIN:VEVENT
+UID:uid3
+DTSTART:20131122T160000Z
+DURATION:PT1H
+RRULE:FREQ=DAILY
+CREATED:20060102T190000Z
+DTSTAMP:20051222T210507Z
+SUMMARY:event 3
+END:VEVENT
+END:VCALENDAR
+"""
+
+    @classproperty(cache=False)
+    def requirements(cls):  # @NoSelf
+        return {
+            "calendar": {
+                "user01": {
+                    "calendar": {
+                        "cal1.ics": (cls.cal1, None,),
+                        "cal2.ics": (cls.cal2, None,),
+                        "cal3.ics": (cls.cal3, None,),
+                    },
+                    "inbox": {
+                        "inbox1.ics": (cls.cal1, None,),
+                    },
+                },
+            }
+        }
+
+    @inlineCallbacks
+    def test_expandAhead(self):
+        """
+        Verify that a recurring event whose expansion ends before the horizon is
+        expanded past it, and that non-recurring events are left alone.
+        """
+        self.patch(config.FreeBusyIndexExpansion, "PeriodSeconds", -1)
+
+        # Pretend the recurring event was indexed a long time ago
+        today = DateTime.getToday()
+        oldMax = today + Duration(days=30)
+        co = schema.CALENDAR_OBJECT
+        yield Update(
+            {co.RECURRANCE_MAX: pyCalendarToSQLTimestamp(normalizeForIndex(oldMax))},
+            Where=co.RESOURCE_NAME == "cal1.ics",
+        ).on(self.transactionUnderTest())
+
+        yield IndexExpansionWork.reschedule(self.transactionUnderTest(), 0)
+        yield self.commit()
+        yield JobItem.waitEmpty(self.storeUnderTest().newTransaction, reactor, 60)
+
+        cobj = yield self.calendarObjectUnderTest(name="cal1.ics", calendar_name="calendar", home="user01")
+        _ignore_rmin, rmax = yield cobj.recurrenceMinMax()
+        self.assertTrue(rmax >= today + Duration(days=config.FreeBusyIndexExpandAheadDays))
+
+        cobj = yield self.calendarObjectUnderTest(name="cal2.ics", calendar_name="calendar", home="user01")
+        _ignore_rmin, rmax = yield cobj.recurrenceMinMax()
+        self.assertTrue(rmax is None)
+
+    @inlineCallbacks
+    def _setRecurrenceMax(self, name, days):
+        """
+        Pretend that a resource was indexed a long time ago.
+        """
+        co = schema.CALENDAR_OBJECT
+        yield Update(
+            {co.RECURRANCE_MAX: pyCalendarToSQLTimestamp(normalizeForIndex(DateTime.getToday() + Duration(days=days)))},
+            Where=co.RESOURCE_NAME == name,
+        ).on(self.transactionUnderTest())
+
+    @inlineCallbacks
+    def test_skipInbox(self):
+        """
+        Verify that inbox items, which are deliberately not indexed, are not selected.
+        """
+        yield self._setRecurrenceMax("cal1.ics", 30)
+
+        horizon = DateTime.getToday() + Duration(days=config.FreeBusyIndexExpandAheadDays)
+        rows = yield IndexExpansionWork._notExpandedBeforeQuery(10, False).on(
+            self.transactionUnderTest(),
+            maxDate=pyCalendarToSQLTimestamp(normalizeForIndex(horizon)),
+            unexpandedMax=pyCalendarToSQLTimestamp(IndexExpansionWork._unexpandedMax),
+        )
+        names = [row[2] for row in rows]
+        self.assertTrue("cal1.ics" in names)
+        self.assertTrue("inbox1.ics" not in names)
+        yield self.commit()
+
+    @inlineCallbacks
+    def test_failureDoesNotBlock(self):
+        """
+        Verify that a resource that cannot be expanded does not stop later runs expanding
+        the resources after it.
+        """
+        self.patch(config.FreeBusyIndexExpansion, "PeriodSeconds", -1)
+        self.patch(config.FreeBusyIndexExpansion, "BatchSize", 1)
+
+        yield self._setRecurrenceMax("cal1.ics", 20)
+        yield self._setRecurrenceMax("cal3.ics", 30)
+        yield self.commit()
+
+        original = Calendar.reExpandResource
+
+        def _reExpandResource(calendar, name, *args, **kwargs):
+            if name == "cal1.ics":
+                raise TooManyInstancesError()
+            return original(calendar, name, *args, **kwargs)
+        self.patch(Calendar, "reExpandResource", _reExpandResource)
+
+        for _ignore in range(2):
+            yield IndexExpansionWork.reschedule(self.transactionUnderTest(), 0)
+            yield self.commit()
+            yield JobItem.waitEmpty(self.storeUnderTest().newTransaction, reactor, 60)
+
+        horizon = DateTime.getToday() + Duration(days=config.FreeBusyIndexExpandAheadDays)
+        cobj = yield self.calendarObjectUnderTest(name="cal3.ics", calendar_name="calendar", home="user01")
+        _ignore_rmin, rmax = yield cobj.recurrenceMinMax()
+        self.assertTrue(rmax >= horizon)
+
+        cobj = yield self.calendarObjectUnderTest(name="cal1.ics", calendar_name="calendar", home="user01")
+        _ignore_rmin, rmax = yield cobj.recurrenceMinMax()
+        self.assertTrue(rmax < horizon)
+        yield self.commit()
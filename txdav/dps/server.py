@@ -823,6 +823,8 @@ class DirectoryProxyServiceMaker(object):
         memcachepool.installPools(
             config.Memcached.Pools,
             config.Memcached.MaxClients,
+            pipelineDepth=config.Memcached.PipelineDepth,
+            sharding=config.Memcached.Sharding,
         )
 
         log.info("Created directory service")
@@ -23,16 +23,15 @@ __all__ = [
     "CachingDirectoryService",
 ]
 
-import base64
 import time
 import uuid
 
 from zope.interface import implementer
 
-from twistedcaldav.memcacheclient import ClientFactory, MemcacheError
 from twistedcaldav.config import config
+from twistedcaldav.memcacher import Memcacher
 
-from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.defer import inlineCallbacks, returnValue, gatherResults, succeed
 from twext.python.log import Logger
 from twext.who.directory import DirectoryService as BaseDirectoryService
 from twext.who.idirectory import (
@@ -69,43 +68,23 @@ class DirectoryMemcacheError(DirectoryServiceError):
     """
 
 
-class DirectoryMemcacher(object):
+class DirectoryMemcacher(Memcacher):
     """
     Provide a cache of directory records in memcached so that worker processes
     and the DPS processes across multiple app servers can share a cache and thus
-    reduce load on the directory server.
+    reduce load on the directory server. This uses the asynchronous memcache pool
+    so that a slow memcached does not block the reactor.
     """
 
-    KEY_VERSION = 1
+    KEY_VERSION = 2
 
     def __init__(self, cacheTimeout, recordService, realmName, keyModifier):
+        Memcacher.__init__(self, "DirectoryRecords", pickle=True)
         self._cacheTimeout = cacheTimeout
         self._recordService = recordService
         self._realmName = realmName
         self._keyVersion = "%d%s" % (DirectoryMemcacher.KEY_VERSION, keyModifier,)
 
-    def _getMemcacheClient(self, refresh=False):
-        """
-        Get the memcache client instance to use for caching.
-
-        @param refresh: whether or not to create a new memcache client
-        @type refresh: L{bool}
-
-        @return: the client to use
-        @rtype: L{memcacheclient.Client}
-        """
-        if refresh or not hasattr(self, "memcacheClient"):
-
-            if config.Memcached.Pools.Default.MemcacheSocket:
-                client_addr = "unix:{}".format(config.Memcached.Pools.Default.MemcacheSocket)
-            else:
-                client_addr = "{}:{}".format(
-                    config.Memcached.Pools.Default.BindAddress,
-                    config.Memcached.Pools.Default.Port,
-                )
-            self.memcacheClient = ClientFactory.getClient([client_addr], debug=0, pickleProtocol=2)
-        return self.memcacheClient
-
     def pickleRecord(self, record):
         fields = {}
         for field, value in record.fields.iteritems():
@@ -169,8 +148,9 @@ class DirectoryMemcacher(object):
         @raise: L{DirectoryMemcacheError} if failure to store in memcache
         """
 
-        self.memcacheSet(key, self.pickleRecord(record))
+        return self.memcacheSet(key, self.pickleRecord(record))
 
+    @inlineCallbacks
     def memcacheSet(self, key, value):
         """
         Store a value in memcache.
@@ -183,17 +163,15 @@ class DirectoryMemcacher(object):
         @raise: L{DirectoryMemcacheError} if failure to store in memcache
         """
 
-        key = base64.b64encode(key)
-        if not self._getMemcacheClient().set(key, value, time=self._cacheTimeout):
-            log.error("Could not write to memcache, retrying")
-            if not self._getMemcacheClient(refresh=True).set(
-                key, value,
-                time=self._cacheTimeout
-            ):
-                log.error("Could not write to memcache again, giving up")
-                del self.memcacheClient
-                raise DirectoryMemcacheError("Failed to write to memcache")
+        try:
+            result = (yield self.set(key, value, expireTime=self._cacheTimeout))
+        except Exception, e:
+            log.error("Could not write to memcache: {ex}", ex=e)
+            result = False
+        if not result:
+            raise DirectoryMemcacheError("Failed to write to memcache")
 
+    @inlineCallbacks
     def memcacheGetRecord(self, key):
         """
         Try to get a record from memcache.
@@ -207,9 +185,10 @@ class DirectoryMemcacher(object):
         @raise: L{DirectoryMemcacheError} if failure to read from memcache
         """
 
-        pickled = self.memcacheGet(key)
-        return self.unpickleRecord(pickled) if pickled is not None else None
+        pickled = (yield self.memcacheGet(key))
+        returnValue(self.unpickleRecord(pickled) if pickled is not None else None)
 
+    @inlineCallbacks
     def memcacheGet(self, key):
         """
         Try to get a record from memcache.
@@ -223,18 +202,29 @@ class DirectoryMemcacher(object):
         @raise: L{DirectoryMemcacheError} if failure to read from memcache
         """
 
-        key = base64.b64encode(key)
+        values = (yield self.memcacheGetMultiple((key,)))
+        returnValue(values[key])
+
+    @inlineCallbacks
+    def memcacheGetMultiple(self, keys):
+        """
+        Try to get a set of values from memcache using a single request.
+
+        @param keys: the memcache keys to use
+        @type keys: L{list} of L{str}
+
+        @return: a L{dict} mapping each key to any value found or L{None}
+        @rtype: L{dict}
+
+        @raise: L{DirectoryMemcacheError} if failure to read from memcache
+        """
+
         try:
-            value = self._getMemcacheClient().get(key)
-        except MemcacheError:
-            log.error("Could not read from memcache, retrying")
-            try:
-                value = self._getMemcacheClient(refresh=True).get(key)
-            except MemcacheError:
-                log.error("Could not read from memcache again, giving up")
-                del self.memcacheClient
-                raise DirectoryMemcacheError("Failed to read from memcache")
-        return value
+            values = (yield self.getMultiple(keys))
+        except Exception, e:
+            log.error("Could not read from memcache: {ex}", ex=e)
+            raise DirectoryMemcacheError("Failed to read from memcache")
+        returnValue(values)
 
     def generateMemcacheKey(self, indexType, indexKey):
         """
@@ -271,7 +261,7 @@ class DirectoryMemcacher(object):
         Flush all records from memcache. Note this is only for testing and must not be
         called in a production setup because it flushes everything from memcache
         """
-        self._getMemcacheClient().flush_all()
+        return self.flushAll()
 
 
 @implementer(IDirectoryService, IStoreDirectoryService)
@@ -386,6 +376,9 @@ class CachingDirectoryService(
 
         @param record: the directory record
         @param indexTypes: an iterable of L{IndexType}
+
+        @return: a L{Deferred} that fires when any memcache updates are done
+        @rtype: L{Deferred}
         """
 
         if hasattr(self, "_test_time"):
@@ -421,15 +414,28 @@ class CachingDirectoryService(
                 pass
 
         if addToMemcache and self._memcacher is not None:
-            for indexType, key in cached:
-                memcachekey = self._memcacher.generateMemcacheKey(indexType, key)
-                log.debug("Memcache: storing %s" % (memcachekey,))
-                try:
-                    self._memcacher.memcacheSetRecord(memcachekey, record)
-                except DirectoryMemcacheError:
-                    log.error("Memcache: failed to store %s" % (memcachekey,))
-                    pass
+            # Store each index entry in parallel
+            return gatherResults([self._memcacheStoreRecord(indexType, key, record) for indexType, key in cached])
+        else:
+            return succeed(None)
 
+    @inlineCallbacks
+    def _memcacheStoreRecord(self, indexType, key, record):
+        """
+        Store a record in memcache for one index, logging any failure.
+
+        @param indexType: an L{IndexType}
+        @param key: the key being indexed
+        @param record: the directory record
+        """
+        memcachekey = self._memcacher.generateMemcacheKey(indexType, key)
+        log.debug("Memcache: storing %s" % (memcachekey,))
+        try:
+            yield self._memcacher.memcacheSetRecord(memcachekey, record)
+        except DirectoryMemcacheError:
+            log.error("Memcache: failed to store %s" % (memcachekey,))
+
+    @inlineCallbacks
     def negativeCacheRecord(self, indexType, key):
         """
         Store a record in the negative cache, within the specified indexes
@@ -453,10 +459,9 @@ class CachingDirectoryService(
             # one recordType, so using recordTypes[0] here is always safe:
             memcachekey = self._memcacher.generateMemcacheKey(indexType, key)
             try:
-                self._memcacher.memcacheSet("-%s" % (memcachekey,), timestamp)
+                yield self._memcacher.memcacheSet("-%s" % (memcachekey,), timestamp)
             except DirectoryMemcacheError:
                 log.error("Memcache: failed to store -%s" % (memcachekey,))
-                pass
 
         log.debug(
             "Directory negative cache: {index} {key}",
@@ -510,6 +515,7 @@ class CachingDirectoryService(
                 if now - self._expireSeconds > cachedTime:
                     del self._cache[indexType][key]
 
+    @inlineCallbacks
     def lookupRecord(self, indexType, key, name):
         """
         Looks for a record in the specified index, under the specified key.
@@ -522,9 +528,10 @@ class CachingDirectoryService(
         @param key: the key to look up in the specified index
         @type key: any valid type that can be used as a dictionary key
 
-        @return: tuple of (the cached L{DirectoryRecord}, or L{None}) and a L{bool}
-            indicating whether a query will be required (not required if a negative cache hit)
-        @rtype: L{tuple}
+        @return: a L{Deferred} firing with a tuple of (the cached L{DirectoryRecord},
+            or L{None}) and a L{bool} indicating whether a query will be required (not
+            required if a negative cache hit)
+        @rtype: L{Deferred}
         """
 
         if self._purgingEnabled:
@@ -564,7 +571,7 @@ class CachingDirectoryService(
                 )
                 self._hitCount += 1
                 self._addTiming("{}-hit".format(name), 0)
-                return (record, False,)
+                returnValue((record, False,))
 
         # Check negative cache (take cache entry timeout into account)
         if self.negativeCaching:
@@ -577,7 +584,7 @@ class CachingDirectoryService(
                         key=key
                     )
                     self._addTiming("{}-neg-hit".format(name), 0)
-                    return (None, False,)
+                    returnValue((None, False,))
                 else:
                     del self._negativeCache[indexType][key]
             except KeyError:
@@ -593,10 +600,17 @@ class CachingDirectoryService(
 
             log.debug("Memcache: checking %s" % (memcachekey,))
 
+            # Fetch the record and negative entries in one request
+            keys = [memcachekey]
+            if self.negativeCaching:
+                keys.append("-%s" % (memcachekey,))
             try:
-                record = self._memcacher.memcacheGetRecord(memcachekey)
+                values = (yield self._memcacher.memcacheGetMultiple(keys))
+                pickled = values[memcachekey]
+                record = self._memcacher.unpickleRecord(pickled) if pickled is not None else None
             except DirectoryMemcacheError:
                 log.error("Memcache: failed to get %s" % (memcachekey,))
+                values = {}
                 record = None
 
             if record is None:
@@ -604,19 +618,15 @@ class CachingDirectoryService(
             else:
                 log.debug("Memcache: hit %s" % (memcachekey,))
                 self.cacheRecord(record, (IndexType.uid, IndexType.guid, IndexType.shortName,), addToMemcache=False)
-                return (record, False,)
+                returnValue((record, False,))
 
             # Check negative memcache
             if self.negativeCaching:
-                try:
-                    val = self._memcacher.memcacheGet("-%s" % (memcachekey,))
-                except DirectoryMemcacheError:
-                    log.error("Memcache: failed to get -%s" % (memcachekey,))
-                    val = None
+                val = values.get("-%s" % (memcachekey,))
                 if val == 1:
                     log.debug("Memcache: negative hit %s" % (memcachekey,))
                     self._negativeCache[indexType][key] = now
-                    return (None, False,)
+                    returnValue((None, False,))
 
         log.debug(
             "Directory cache miss: {index} {key}",
@@ -625,7 +635,7 @@ class CachingDirectoryService(
         )
 
         self._addTiming("{}-miss".format(name), 0)
-        return (None, True,)
+        returnValue((None, True,))
 
     # Cached methods:
 
@@ -633,19 +643,19 @@ class CachingDirectoryService(
     def recordWithUID(self, uid, timeoutSeconds=None):
 
         # First check our cache
-        record, doQuery = self.lookupRecord(IndexType.uid, uid, "recordWithUID")
+        record, doQuery = yield self.lookupRecord(IndexType.uid, uid, "recordWithUID")
         if record is None and doQuery:
             record = yield self._directory._wrapped_recordWithUID(
                 uid, timeoutSeconds=timeoutSeconds
             )
             if record is not None:
                 # Note we do not index on email address; see below.
-                self.cacheRecord(
+                yield self.cacheRecord(
                     record,
                     (IndexType.uid, IndexType.guid, IndexType.shortName)
                 )
             else:
-                self.negativeCacheRecord(IndexType.uid, uid)
+                yield self.negativeCacheRecord(IndexType.uid, uid)
 
         returnValue(record)
 
@@ -653,19 +663,19 @@ class CachingDirectoryService(
     def recordWithGUID(self, guid, timeoutSeconds=None):
 
         # First check our cache
-        record, doQuery = self.lookupRecord(IndexType.guid, guid, "recordWithGUID")
+        record, doQuery = yield self.lookupRecord(IndexType.guid, guid, "recordWithGUID")
         if record is None and doQuery:
             record = yield self._directory._wrapped_recordWithGUID(
                 guid, timeoutSeconds=timeoutSeconds
             )
             if record is not None:
                 # Note we do not index on email address; see below.
-                self.cacheRecord(
+                yield self.cacheRecord(
                     record,
                     (IndexType.uid, IndexType.guid, IndexType.shortName)
                 )
             else:
-                self.negativeCacheRecord(IndexType.guid, guid)
+                yield self.negativeCacheRecord(IndexType.guid, guid)
 
         returnValue(record)
 
@@ -673,7 +683,7 @@ class CachingDirectoryService(
     def recordWithShortName(self, recordType, shortName, timeoutSeconds=None):
 
         # First check our cache
-        record, doQuery = self.lookupRecord(
+        record, doQuery = yield self.lookupRecord(
             IndexType.shortName,
             (recordType.name, shortName),
             "recordWithShortName"
@@ -684,12 +694,12 @@ class CachingDirectoryService(
             )
             if record is not None:
                 # Note we do not index on email address; see below.
-                self.cacheRecord(
+                yield self.cacheRecord(
                     record,
                     (IndexType.uid, IndexType.guid, IndexType.shortName)
                 )
             else:
-                self.negativeCacheRecord(IndexType.shortName, (recordType.name, shortName))
+                yield self.negativeCacheRecord(IndexType.shortName, (recordType.name, shortName))
 
         returnValue(record)
 
@@ -699,7 +709,7 @@ class CachingDirectoryService(
     ):
 
         # First check our cache
-        record, doQuery = self.lookupRecord(
+        record, doQuery = yield self.lookupRecord(
             IndexType.emailAddress,
             emailAddress,
             "recordsWithEmailAddress"
@@ -719,7 +729,7 @@ class CachingDirectoryService(
                 # the next lookup by email address would only get that record,
                 # but there might be others in the directory service with that
                 # same email address.
-                self.cacheRecord(
+                yield self.cacheRecord(
                     list(records)[0],
                     (
                         IndexType.uid, IndexType.guid,
@@ -727,7 +737,7 @@ class CachingDirectoryService(
                     )
                 )
             elif len(records) == 0:
-                self.negativeCacheRecord(IndexType.emailAddress, emailAddress)
+                yield self.negativeCacheRecord(IndexType.emailAddress, emailAddress)
         else:
             records = [record]
 
@@ -812,7 +822,7 @@ class CachingDirectoryService(
     @inlineCallbacks
     def flush(self):
         if self._memcacher is not None:
-            self._memcacher.flush()
+            yield self._memcacher.flush()
         self.resetCache()
         yield self._directory.flush()
 
@@ -21,11 +21,12 @@ Caching service tests
 from twisted.internet.defer import inlineCallbacks
 
 from twistedcaldav.config import config
+from twistedcaldav.memcacher import Memcacher
 from twistedcaldav.test.util import StoreTestCase
 
 from txdav.dps.client import DirectoryService as DPSClientDirectoryService
 from txdav.who.cache import (
-    CachingDirectoryService, IndexType
+    CachingDirectoryService, DirectoryMemcacher, IndexType
 )
 from twext.who.idirectory import (
     RecordType
@@ -345,6 +346,38 @@ class CacheTest(StoreTestCase):
         self.assertEquals(len(dir._negativeCache[IndexType.guid]), 0)
         self.assertEquals(len(dir._negativeCache[IndexType.shortName]), 0)
 
+    @inlineCallbacks
+    def test_memcacheHit(self):
+        """
+        Verify records stored in memcache are found with a single multi-get once
+        the in-memory cache has been reset.
+        """
+        dir = self.cachingDirectory
+        memcacher = DirectoryMemcacher(10, self.directory, self.directory.realmName, "b")
+        memcacher._memcacheProtocol = Memcacher.memoryCacher(pickle=True)
+        dir._memcacher = memcacher
+
+        record = yield dir.recordWithUID(u"cache-uid-1")
+        self.assertEquals(record.uid, u"cache-uid-1")
+
+        calls = []
+        original = memcacher.getMultiple
+
+        def _getMultiple(keys):
+            calls.append(keys)
+            return original(keys)
+        self.patch(memcacher, "getMultiple", _getMultiple)
+
+        dir.resetCache()
+        dir._memcacher = memcacher
+        record = yield dir.recordWithShortName(RecordType.user, u"cache-name-1")
+        self.assertEquals(record.uid, u"cache-uid-1")
+        self.assertEquals(dir._hitCount, 0)
+
+        # One request for both the record and the negative cache entry
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(len(calls[0]), 2)
+
     def test_differentCacheKeys(self):
         """
         Verify records are purged from cache after a certain amount of requests
@@ -246,6 +246,17 @@ class WebDAVElement (object):
     def __str__(self):
         return self.sname()
 
+    def duplicate(self):
+        """
+        Return a copy of this element, and of its child elements, that can be
+        changed without affecting this one. This is much cheaper than parsing
+        the XML again.
+        """
+        return self.__class__(*[
+            child.duplicate() if isinstance(child, WebDAVElement) else child
+            for child in self.children
+        ], **self.attributes)
+
     def __repr__(self):
         if hasattr(self, "attributes") and hasattr(self, "children"):
             return "<%s %r: %r>" % (self.sname(), self.attributes, self.children)
@@ -548,6 +559,12 @@ class WebDAVUnknownElement (WebDAVElement):
         child.name = name
         return child
 
+    def duplicate(self):
+        child = super(WebDAVUnknownElement, self).duplicate()
+        child.namespace = self.namespace
+        child.name = self.name
+        return child
+
     def qname(self):
         return (self.namespace, self.name)
 
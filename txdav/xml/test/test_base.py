@@ -92,6 +92,17 @@ class WebDAVElementTestsMixin:
             document,
             WebDAVDocument.fromString(document.toxml()))
 
+    def test_duplicate(self):
+        """
+        L{WebDAVElement.duplicate} returns an equal element which does not
+        share its children or attributes with the original.
+        """
+        duplicate = self.element.duplicate()
+        self.assertEquals(duplicate, self.element)
+        self.assertEquals(duplicate.toxml(), self.element.toxml())
+        self.assertIsNot(duplicate, self.element)
+        self.assertIsNot(duplicate.attributes, self.element.attributes)
+
 
 class WebDAVUnknownElementTests(WebDAVElementTestsMixin, TestCase):
     """
@@ -67,3 +67,19 @@ class XML_3744(unittest.TestCase):
                 pb.isAggregateOf(pa, davPrivilegeSet),
                 "%s does not contain %s" % (b.sname(), a.sname())
             )
+
+    def test_ACE_duplicate(self):
+        """
+        A duplicated ACE has its own principal and privileges, taken from
+        its duplicated children.
+        """
+        ace = davxml.ACE(
+            davxml.Principal(davxml.HRef("/principals/users/user01/")),
+            davxml.Grant(davxml.Privilege(davxml.Read())),
+        )
+        duplicate = ace.duplicate()
+
+        self.assertEquals(duplicate, ace)
+        self.assertIs(duplicate.principal, duplicate.children[0])
+        self.assertIsNot(duplicate.principal, ace.principal)
+        self.assertIsNot(duplicate.privileges[0], ace.privileges[0])
@@ -28,6 +28,7 @@ __all__ = [
     "ErrorResponse",
     "NeedPrivilegesResponse",
     "MultiStatusResponse",
+    "IncrementalMultiStatusResponse",
     "ResponseQueue",
     "PropertyStatusResponseQueue",
     "statusForFailure",
@@ -36,6 +37,7 @@ __all__ = [
 ]
 
 import errno
+import StringIO
 
 from twisted.python.failure import Failure
 from twisted.python.filepath import InsecurePath
@@ -45,6 +47,7 @@ from txweb2 import responsecode
 from txweb2.iweb import IResponse
 from txweb2.http import Response, HTTPError, StatusResponse
 from txweb2.http_headers import MimeType
+from txweb2.stream import CompoundStream
 from txweb2.dav.util import joinURL
 from txdav.xml import element
 
@@ -143,6 +146,65 @@ class MultiStatusResponse(Response):
         self.headers.setHeader("content-type", MimeType("text", "xml"))
 
 
+class IncrementalMultiStatusResponse(Response):
+    """
+    Multi-status L{Response} object that serializes each child element as it
+    is appended, rather than building a complete DAV:multi-status element tree
+    and serializing that in one go. It can be used in place of the C{list} of
+    element.Response objects normally passed to L{MultiStatusResponse}, so
+    that for large results only the serialized data, in chunks of about
+    C{chunkSize} bytes, is held in memory rather than the element tree as
+    well. The response is not streamed: the whole serialized document is held
+    until the response is sent, so memory use still grows with the number of
+    results. L{finish} must be called once all the responses have been
+    appended.
+    """
+
+    chunkSize = 64 * 1024
+
+    def __init__(self):
+        Response.__init__(self, code=responsecode.MULTI_STATUS,
+                          stream=CompoundStream())
+
+        self.headers.setHeader("content-type", MimeType("text", "xml"))
+
+        self._count = 0
+        self._output = StringIO.StringIO()
+        self._output.write("<?xml version='1.0' encoding='UTF-8'?>\n<multistatus xmlns='%s'>\r\n" % (element.dav_namespace,))
+
+    def __len__(self):
+        return self._count
+
+    def append(self, xml_response):
+        """
+        Serialize another child of the DAV:multi-status element.
+
+        @param xml_response: the element to add
+        @type xml_response: L{element.Response}
+        """
+        xml_response._writeToStream(self._output, element.dav_namespace, 1, True)
+        self._count += 1
+        if self._output.tell() >= self.chunkSize:
+            self._flush()
+
+    def _flush(self):
+        data = str(self._output.getvalue())
+        self._output = StringIO.StringIO()
+        if data:
+            self.stream.addStream(data)
+
+    def finish(self):
+        """
+        Close off the DAV:multi-status element.
+
+        @return: this response
+        @rtype: L{IncrementalMultiStatusResponse}
+        """
+        self._output.write("</multistatus>")
+        self._flush()
+        return self
+
+
 class ResponseQueue(object):
     """
     Stores a list of (typically error) responses for use in a
@@ -1335,6 +1335,69 @@ class DAVResource (DAVPropertyMixIn, StaticRenderMixin):
 
         return False
 
+    def compileACL(self, request, acl, aclKey, privileges, supportedPrivileges):
+        """
+        Compile an ACL for checking a list of privileges: for each ACE, a
+        bitmask of the privileges it applies to, where bit N is set for
+        C{privileges[N]}. Compiled ACLs are remembered for the rest of the
+        request, so resources with the same ACL only need compiling once.
+
+        @param request: the request being processed.
+        @param acl: the L{element.ACL} to compile.
+        @param aclKey: a C{str} uniquely identifying C{acl}.
+        @param privileges: a C{list} of L{WebDAVElement} elements denoting
+            access control privileges.
+        @param supportedPrivileges: a L{element.SupportedPrivilegeSet}.
+        @return: a C{tuple} of (L{element.ACE}, C{int}) C{tuple}s, one for each
+            ACE in C{acl}.
+        """
+        if not hasattr(request, "compiledACLs"):
+            request.compiledACLs = {}
+
+        key = (
+            aclKey,
+            tuple([privilege.qname() for privilege in privileges]),
+            id(supportedPrivileges),
+        )
+        compiled = request.compiledACLs.get(key)
+        if compiled is None:
+            compiled = []
+            for ace in acl.children:
+                mask = 0
+                for bit, privilege in enumerate(privileges):
+                    if self.matchPrivilege(
+                        element.Privilege(privilege),
+                        ace.privileges, supportedPrivileges
+                    ):
+                        mask |= 1 << bit
+                compiled.append((ace, mask))
+            compiled = tuple(compiled)
+            request.compiledACLs[key] = compiled
+
+        return compiled
+
+    # A cache of which ACE principals in an ACL match a principal, that lasts
+    # across requests, or C{None} for no such cache. It needs C{get} and C{set}
+    # methods, and is only used for keys returned by principalMatchCacheKey.
+    principalMatchCache = None
+
+    def principalMatchCacheKey(self, request, principal, acl, aclKey):
+        """
+        Return a key for L{principalMatchCache} that identifies which of the
+        ACE principals in C{acl} match C{principal}, or C{None} if that must
+        not be cached. The key has to change whenever the result of
+        L{matchPrincipal} could change, e.g. a change in group membership.
+
+        This implementation returns C{None}.
+
+        @param request: the request being processed.
+        @param principal: the L{element.Principal} being checked.
+        @param acl: the L{element.ACL} being checked.
+        @param aclKey: a C{str} uniquely identifying C{acl}.
+        @return: a L{Deferred} that fires with a hashable key or C{None}.
+        """
+        return succeed(None)
+
     @inlineCallbacks
     def checkPrivileges(
         self, request, privileges, recurse=False,
@@ -1370,6 +1433,7 @@ class DAVResource (DAVPropertyMixIn, StaticRenderMixin):
             "Principal is not an actor: %r" % (principal,)
         )
 
+        privileges = list(privileges)
         errors = []
 
         resources = [(self, None)]
@@ -1393,37 +1457,65 @@ class DAVResource (DAVPropertyMixIn, StaticRenderMixin):
                 errors.append((uri, list(privileges)))
                 continue
 
-            pending = list(privileges)
-            denied = []
+            aclKey = repr(acl)
+            compiled = self.compileACL(
+                request, acl, aclKey, privileges, supportedPrivs
+            )
 
-            for ace in acl.children:
-                for privilege in tuple(pending):
-                    if not self.matchPrivilege(
-                        element.Privilege(privilege),
-                        ace.privileges, supportedPrivs
-                    ):
-                        continue
+            # Which ACE principals match may be known from an earlier request
+            matches = None
+            cacheKey = None
+            if self.principalMatchCache is not None:
+                cacheKey = (
+                    yield self.principalMatchCacheKey(
+                        request, principal, acl, aclKey
+                    )
+                )
+                if cacheKey is not None:
+                    matches = self.principalMatchCache.get(cacheKey)
+                    if matches is None:
+                        matches = []
+                        for ace in acl.children:
+                            match = (
+                                yield self.matchPrincipal(
+                                    principal, ace.principal, request
+                                )
+                            )
+                            matches.append(bool(match))
+                        matches = tuple(matches)
+                        self.principalMatchCache.set(cacheKey, matches)
+
+            # Each privilege is a bit in these masks
+            pending = (1 << len(privileges)) - 1
+            denied = 0
+
+            for index, (ace, mask) in enumerate(compiled):
+                mask &= pending
+                if not mask:
+                    continue
 
+                if matches is not None:
+                    match = matches[index]
+                else:
                     match = (
                         yield self.matchPrincipal(principal, ace.principal, request)
                     )
 
-                    if match:
-                        if ace.invert:
-                            continue
-                    else:
-                        if not ace.invert:
-                            continue
+                if bool(match) == bool(ace.invert):
+                    continue
 
-                    pending.remove(privilege)
+                pending &= ~mask
 
-                    if not ace.allow:
-                        denied.append(privilege)
+                if not ace.allow:
+                    denied |= mask
 
-            denied += pending  # If no matching ACE, then denied
+            denied |= pending  # If no matching ACE, then denied
 
             if denied:
-                errors.append((uri, denied))
+                errors.append((uri, [
+                    privilege for bit, privilege in enumerate(privileges)
+                    if denied & (1 << bit)
+                ]))
 
         if errors:
             raise AccessDeniedError(errors,)
@@ -24,10 +24,14 @@
 
 import errno
 
+from twisted.internet.defer import inlineCallbacks
 from twisted.python.failure import Failure
 from txweb2 import responsecode
 from txweb2.http import HTTPError
-from txweb2.dav.http import ErrorResponse, statusForFailure
+from txweb2.dav.http import ErrorResponse, statusForFailure, \
+    IncrementalMultiStatusResponse
+from txweb2.dav.util import allDataFromStream
+from txdav.xml import element as davxml
 import txweb2.dav.test.util
 
 
@@ -76,6 +80,32 @@ class HTTP(txweb2.dav.test.util.TestCase):
         else:
             self.fail("Unknown exception should have re-raised.")
 
+    @inlineCallbacks
+    def test_incrementalMultiStatus(self):
+        """
+        IncrementalMultiStatusResponse generates the same document as a
+        DAV:multistatus element with all the responses.
+        """
+        xml_responses = [
+            davxml.StatusResponse(
+                davxml.HRef("/calendars/%d.ics" % (i,)),
+                davxml.Status.fromResponseCode(responsecode.NOT_FOUND),
+            ) for i in range(10)
+        ]
+
+        response = IncrementalMultiStatusResponse()
+        response.chunkSize = 200
+        for xml_response in xml_responses:
+            response.append(xml_response)
+        self.assertEqual(len(response), 10)
+        response.finish()
+
+        expected = davxml.MultiStatus(*xml_responses).toxml()
+        self.assertEqual(response.code, responsecode.MULTI_STATUS)
+        self.assertEqual(response.stream.length, len(expected))
+        data = yield allDataFromStream(response.stream)
+        self.assertEqual(data, expected)
+
     def _check_exception(self, exception, result):
         try:
             raise exception
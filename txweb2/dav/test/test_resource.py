@@ -312,6 +312,46 @@ class AccessTests(TestCase):
 
         return DeferredList(ds)
 
+    def test_checkPrivilegesMatchCache(self):
+        """
+        DAVResource.checkPrivileges() uses principalMatchCache for which ACE
+        principals match, instead of calling matchPrincipal.
+        """
+        matchCalls = []
+
+        class _Cache(dict):
+            def set(self, key, value):
+                self[key] = value
+
+        class CachingAuthAllResource(AuthAllResource):
+            principalMatchCache = _Cache()
+
+            def principalMatchCacheKey(self, request, principal, acl, aclKey):
+                return succeed((str(principal), aclKey,))
+
+            def matchPrincipal(self, principal1, principal2, request):
+                matchCalls.append(principal2)
+                return super(CachingAuthAllResource, self).matchPrincipal(
+                    principal1, principal2, request
+                )
+
+        resource = CachingAuthAllResource()
+        site = Site(resource)
+
+        def _checkPrivileges(_ignore):
+            request = SimpleRequest(site, "GET", "/")
+            request.authzUser = request.authnUser = self.rootresource.principalForUser("gooduser")
+            d = request.locateResource("/")
+            d.addCallback(lambda resource: resource.checkPrivileges(request, (davxml.Read(), davxml.Write(),)))
+            return d
+
+        d = _checkPrivileges(None)
+        d.addCallback(lambda _: self.assertEquals(len(matchCalls), 1))
+        d.addCallback(_checkPrivileges)
+        d.addCallback(lambda _: self.assertEquals(len(matchCalls), 1))
+        d.addCallback(lambda _: self.assertEquals(resource.principalMatchCache.values(), [(True,)]))
+        return d
+
     def test_authorize(self):
         """
         Authorizing a known user with the correct password will not raise an